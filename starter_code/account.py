@@ -0,0 +1,157 @@
+from bisect import bisect_left, bisect_right
+
+class Account:
+    """
+    Record of everything the level 4 banking system keeps about one account
+
+    All state of an account lives in one object, so an operation looks the account up once and reads every
+    field from it. __slots__ keeps the record to a fixed set of fields without a per-instance __dict__.
+
+    The history of the account is kept as two parallel columns, the sorted timestamps of its transactions and
+    the cumulative balance at each of them, transactions at the same timestamp share a row. The history only
+    holds transactions that have happened, cashback that is not due yet is kept by the banking system, so the
+    last cumulative balance is always the running balance of the account.
+
+    Attributes
+    ----------
+    timestamps : list
+        Stores the sorted timestamps of the transactions of the account
+    balances : list
+        Stores the cumulative balance at every timestamp in timestamps
+    total_spend : int
+        Stores the total spend to date of the account
+    merged_at : int
+        Stores the timestamp the account was merged into another account at, or None if it was not merged away
+    """
+
+    __slots__ = ('timestamps', 'balances', 'total_spend', 'merged_at')
+
+    def __init__(self, timestamp: int):
+        self.timestamps = [timestamp]
+        self.balances = [0]
+        self.total_spend = 0
+        self.merged_at = None
+
+    def record(self, timestamp: int, amount: int):
+        '''
+        adds amount to the account history at timestamp
+
+        Parameters:
+        ----------
+        timestamp (int): time of the transaction
+        amount (int): signed amount of money added to the account
+        '''
+        timestamps, balances = self.timestamps, self.balances
+
+        # transactions almost always arrive in order, so appending to the index is the common case
+        if timestamp > timestamps[-1]:
+            timestamps.append(timestamp)
+            balances.append(balances[-1] + amount)
+            return
+
+        position = bisect_left(timestamps, timestamp)
+        if timestamps[position] != timestamp:
+            timestamps.insert(position, timestamp)
+            balances.insert(position, balances[position - 1] if position else 0)
+
+        # every cumulative balance from timestamp onwards includes the new transaction
+        for i in range(position, len(balances)):
+            balances[i] += amount
+
+    def latest_balance(self, timestamp: int) -> int | None:
+        '''
+        returns the balance of an account that has not been merged away at the current timestamp
+
+        Parameters:
+        ----------
+        timestamp (int): the timestamp of where you want to check balance
+
+        Returns:
+        ---------
+        (int): total money in the account at timestamp
+        '''
+        # the running balance is the last cumulative balance, backdated timestamps are looked up in the balance index
+        if timestamp >= self.timestamps[-1]:
+            return self.balances[-1]
+        return self.balance_at(timestamp)
+
+    def balance_at(self, time_at: int) -> int | None:
+        '''
+        returns the balance of the account at time_at from the balance index
+
+        Parameters:
+        ----------
+        time_at (int): the timestamp of where you want to check balance
+
+        Returns:
+        ---------
+        (int): total money in the account at time_at
+        None: the account was not open yet at time_at, or it had been merged away by then
+        '''
+        timestamps = self.timestamps
+
+        # most queries ask for the current balance, which is the last entry
+        if timestamps[-1] <= time_at:
+            position = len(timestamps) - 1
+        else:
+            position = bisect_right(timestamps, time_at) - 1
+
+        if position < 0:
+            return None
+
+        # if user is trying to access balance data of a merged account after merge time, return None
+        if self.merged_at is not None and time_at >= self.merged_at:
+            return None
+
+        return self.balances[position]
+
+class ColdAccount:
+    """
+    Stub left in place of an account whose history was evicted to a cold store, see coldstore
+
+    The stub keeps what is needed to answer the common calls without reading the history back: the current
+    balance, the total spend and whether the account was merged away. The balance doesn't change until the
+    account is used again, paying out cashback it is owed also reads it back.
+
+    Attributes
+    ----------
+    last_entry : int
+        Stores the timestamp of the last transaction of the account, its balance is known from then on
+    balance : int
+        Stores the balance of the account from last_entry onwards
+    total_spend : int
+        Stores the total spend to date of the account
+    merged_at : int
+        Stores the timestamp the account was merged into another account at, or None if it was not merged away
+    offset : int
+        Stores the position of the evicted record in the cold store file
+    length : int
+        Stores the size of the evicted record in bytes
+    """
+
+    __slots__ = ('last_entry', 'balance', 'total_spend', 'merged_at', 'offset', 'length')
+
+    def __init__(self, account: Account, offset: int, length: int):
+        self.last_entry = account.timestamps[-1]
+        self.balance = account.balances[-1]
+        self.total_spend = account.total_spend
+        self.merged_at = account.merged_at
+        self.offset = offset
+        self.length = length
+
+    def balance_at(self, time_at: int) -> int | None:
+        '''
+        returns the balance of the account at a time_at that is not earlier than last_entry
+
+        Parameters:
+        ----------
+        time_at (int): the timestamp of where you want to check balance, at least last_entry
+
+        Returns:
+        ---------
+        (int): total money in the account at time_at
+        None: the account had been merged away by time_at
+        '''
+        if self.merged_at is not None and time_at >= self.merged_at:
+            return None
+        return self.balance
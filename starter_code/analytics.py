@@ -0,0 +1,207 @@
+'''
+vectorized reporting over the ledgers of the columnar banking system, see LedgerFrame
+
+Only the columnar engine (banking_system_impl_columnar and the engines built on it) can be exported. Its ledgers
+record the amount and kind of every transaction. The level 4 account histories keep one cumulative balance per
+timestamp, so the transactions behind a row, their kinds and the payment amounts can't be recovered from them,
+and LedgerFrame.from_system rejects other engines with a TypeError.
+'''
+from banking_system_impl_columnar import BankingSystemImpl
+from ledger import KINDS, PAYMENT
+import numpy as np
+import sys
+
+# length of a day in milliseconds, the unit of every timestamp
+DAY = 86400000
+
+# flow every kind of event counts towards in daily_flows: 0 inflow, 1 outflow, 2 cashback, 3 only the net change
+_FLOWS = np.array([3, 0, 1, 0, 1, 2, 3], dtype=np.int64) # indexed by OPENED, DEPOSIT, TRANSFER_OUT, TRANSFER_IN, PAYMENT, CASHBACK, MERGE
+
+def _group_sums(keys: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    '''
+    returns the sum of values for every key from 0 to size - 1, in exact int64 arithmetic
+
+    Parameters:
+    ----------
+    keys (ndarray): group of every value, in any order
+    values (ndarray): int64 values to add up
+    size (int): number of groups
+
+    Returns:
+    ---------
+    (ndarray): [sum of the values of group i]
+    '''
+    # np.bincount adds up float64 weights, which is exact as long as no partial sum can reach 2 ** 53
+    if not len(values) or int(np.abs(values).max()) * len(values) < 1 << 53:
+        return np.bincount(keys, weights=values, minlength=size).astype(np.int64)
+
+    sums = np.zeros(size, dtype=np.int64)
+    if len(keys):
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        sums[keys[starts]] = np.add.reduceat(values[order], starts)
+    return sums
+
+class LedgerFrame:
+    """
+    Every ledger row of a columnar banking system exported into numpy columns, for vectorized reporting
+
+    Rows are stored node by node in ascending order of node and, within a node, in timestamp order, so rows of
+    the same account and day are always next to each other and are added up with a single np.add.reduceat.
+    Accounts that were merged away keep their rows up to the merge, which moved their balance into the account
+    they were merged into with a MERGE row.
+
+    Attributes
+    ----------
+    account_ids : list
+        Stores the account_id of every node
+    merged_at : ndarray
+        Stores the timestamp at which every node was merged into another account, or NOT_MERGED
+    nodes : ndarray
+        Stores the node of the account of every row
+    timestamps : ndarray
+        Stores the timestamp of every row
+    amounts : ndarray
+        Stores the signed amount of every row
+    kinds : ndarray
+        Stores the kind of event of every row, an index into ledger.KINDS
+    pending_nodes : ndarray
+        Stores the node of the account every cashback refund that is not due yet will be paid to
+    pending_due : ndarray
+        Stores the timestamp every cashback refund that is not due yet will be paid at
+    pending_amounts : ndarray
+        Stores the amount of every cashback refund that is not due yet
+    """
+
+    def __init__(self, account_ids, merged_at, nodes, timestamps, amounts, kinds, pending_nodes, pending_due, pending_amounts):
+        self.account_ids = account_ids
+        self.merged_at = merged_at
+        self.nodes = nodes
+        self.timestamps = timestamps
+        self.amounts = amounts
+        self.kinds = kinds
+        self.pending_nodes = pending_nodes
+        self.pending_due = pending_due
+        self.pending_amounts = pending_amounts
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @classmethod
+    def from_system(cls, system, timestamp: int) -> 'LedgerFrame':
+        '''
+        exports every ledger of a columnar banking system, ledgers still in a snapshot are read without being decoded
+
+        Parameters:
+        ----------
+        system (BankingSystemImpl): columnar banking system, see banking_system_impl_columnar
+        timestamp (int): the current time, cashback due by then is paid out before the export
+
+        Returns:
+        ---------
+        (LedgerFrame): the exported rows
+
+        Raises:
+        ---------
+        TypeError: system is not a columnar banking system
+        '''
+        if not isinstance(system, BankingSystemImpl):
+            raise TypeError(f"only columnar banking systems can be exported, not {type(system).__name__}")
+
+        system._process_cashback(timestamp)
+        node_count = len(system.node_accounts)
+
+        # nodes of accounts that were replaced before a snapshot was loaded have no ledger and no rows
+        empty = (b'', b'', b'')
+        if sys.byteorder == 'little':
+            # columns still in a snapshot are little endian, like the arrays, so they are joined without being decoded
+            columns = [empty if ledger is None else ledger.columns() for ledger in system.ledgers]
+        else:
+            columns = [empty if ledger is None else (ledger.timestamps, ledger.amounts, ledger.kinds) for ledger in system.ledgers]
+        timestamps = np.frombuffer(b''.join(column[0] for column in columns), dtype=np.int64)
+        amounts = np.frombuffer(b''.join(column[1] for column in columns), dtype=np.int64)
+        kinds = np.frombuffer(b''.join(column[2] for column in columns), dtype=np.uint8)
+        lengths = np.fromiter((len(column[2]) for column in columns), dtype=np.int64, count=node_count)
+        nodes = np.repeat(np.arange(node_count, dtype=np.int64), lengths)
+
+        # owners of pending refunds are found by jumping along the alias table until every node points at itself
+        due, ordinals, refunds = system.cashback.columns()
+        parents = np.array(system.node_parents, dtype=np.int64)
+        while True:
+            grandparents = parents[parents]
+            if np.array_equal(grandparents, parents):
+                break
+            parents = grandparents
+        payment_nodes = np.frombuffer(system.payments.nodes, dtype=np.int64)
+        pending_nodes = parents[payment_nodes[np.frombuffer(ordinals, dtype=np.int64) - 1]]
+
+        return cls(list(system.node_accounts), np.array(system.merged_at, dtype=np.int64), nodes, timestamps, amounts, kinds,
+                   pending_nodes, np.frombuffer(due, dtype=np.int64), np.frombuffer(refunds, dtype=np.int64))
+
+    def totals_by_kind(self) -> np.ndarray:
+        '''
+        returns the total amount of every kind of event of every account
+
+        Returns:
+        ---------
+        (ndarray): int64 array of shape (number of nodes, len(KINDS)), [node, kind] is the signed sum of the amounts
+        '''
+        width = len(KINDS)
+        sums = _group_sums(self.nodes * width + self.kinds, self.amounts, len(self.account_ids) * width)
+        return sums.reshape(len(self.account_ids), width)
+
+    def daily_flows(self, day: int = DAY) -> dict[str, np.ndarray]:
+        '''
+        returns the money that went into and out of every account on every day it had transactions
+
+        Parameters:
+        ----------
+        day (int): length of a day in the unit of the timestamps
+
+        Returns:
+        ---------
+        (dict): {'nodes', 'days', 'inflow', 'outflow', 'cashback', 'net'} columns with one row per (node, day)
+            inflow: deposits and incoming transfers
+            outflow: outgoing transfers and payments, as a positive amount
+            cashback: cashback refunds received
+            net: change of the balance over the day, including balances moved in by merges
+        '''
+        days = self.timestamps // day
+        nodes = self.nodes
+        if not len(days):
+            empty = np.zeros(0, dtype=np.int64)
+            return {'nodes': empty, 'days': empty, 'inflow': empty, 'outflow': empty, 'cashback': empty, 'net': empty}
+
+        # rows are ordered by node and timestamp, so every (node, day) group starts where either of them changes
+        starts = np.empty(len(days), dtype=bool)
+        starts[0] = True
+        np.not_equal(nodes[1:], nodes[:-1], out=starts[1:])
+        starts[1:] |= days[1:] != days[:-1]
+        groups = np.cumsum(starts) - 1
+        count = int(groups[-1]) + 1
+
+        # one pass adds up every row into the (group, flow) it counts towards
+        sums = _group_sums(groups * 4 + _FLOWS[self.kinds], self.amounts, count * 4).reshape(count, 4)
+        starts = np.flatnonzero(starts)
+        return {'nodes': nodes[starts], 'days': days[starts], 'inflow': sums[:, 0], 'outflow': -sums[:, 1], 'cashback': sums[:, 2], 'net': sums.sum(axis=1)}
+
+    def payment_histogram(self, bins=10) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        returns a histogram of the amounts of every payment, see np.histogram for bins
+
+        Returns:
+        ---------
+        (tuple): (counts, bin edges)
+        '''
+        return np.histogram(-self.amounts[self.kinds == PAYMENT], bins=bins)
+
+    def cashback_liabilities(self) -> np.ndarray:
+        '''
+        returns the cashback every account is still owed for payments whose refund is not due yet
+
+        Returns:
+        ---------
+        (ndarray): int64 array with the owed amount of every node, accounts merged away owe nothing
+        '''
+        return _group_sums(self.pending_nodes, self.pending_amounts, len(self.account_ids))
@@ -0,0 +1,262 @@
+import threading
+from banking_system_impl_columnar import BankingSystemImpl
+from cashback import CashbackScheduler
+from leaderboard import SpendLeaderboard
+from ledger import CASHBACK
+from operations import BatchError, apply
+from payments import PaymentRegistry
+
+class _LockedLeaderboard(SpendLeaderboard):
+    """
+    Leaderboard shared by every account, guarded by its own lock
+    """
+
+    def __init__(self, load: int = 1000):
+        super().__init__(load)
+        self._lock = threading.Lock()
+
+    def insert(self, account_id: str, total_spend: int):
+        with self._lock:
+            super().insert(account_id, total_spend)
+
+    def remove(self, account_id: str, total_spend: int):
+        with self._lock:
+            super().remove(account_id, total_spend)
+
+    def update(self, account_id: str, old_total_spend: int, new_total_spend: int):
+        with self._lock:
+            super().update(account_id, old_total_spend, new_total_spend)
+
+    def top(self, n: int) -> list[str]:
+        with self._lock:
+            return super().top(n)
+
+    def frozen(self) -> SpendLeaderboard:
+        with self._lock:
+            return super().frozen()
+
+class _LockedPaymentRegistry(PaymentRegistry):
+    """
+    Payment registry shared by every account, guarded by its own lock so payment ordinals are handed out once
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+
+    def add(self, timestamp: int, node: int) -> int:
+        with self._lock:
+            return super().add(timestamp, node)
+
+    def ordinal(self, payment: str) -> int | None:
+        with self._lock:
+            return super().ordinal(payment)
+
+    def status(self, ordinal: int, timestamp: int) -> str:
+        with self._lock:
+            return super().status(ordinal, timestamp)
+
+    def node_payments(self, node: int, since: int, until: int):
+        with self._lock:
+            return super().node_payments(node, since, until)
+
+class _LockedCashbackScheduler(CashbackScheduler):
+    """
+    Cashback heap shared by every account, guarded by its own lock
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+
+    def schedule(self, due_timestamp: int, ordinal: int, amount: int):
+        with self._lock:
+            super().schedule(due_timestamp, ordinal, amount)
+
+    def pop_due(self, timestamp: int) -> list[tuple[int, int, int]]:
+        with self._lock:
+            return super().pop_due(timestamp)
+
+    def columns(self):
+        with self._lock:
+            return super().columns()
+
+class ConcurrentBankingSystemImpl(BankingSystemImpl):
+    """
+    Thread-safe columnar banking system using a fixed pool of striped locks keyed by account_id
+
+    Every call locks the stripes of the accounts it touches, so calls on unrelated accounts run side by side
+    and only calls whose accounts share a stripe wait for each other. transfer and merge_accounts lock both
+    stripes in ascending stripe order, so two calls can never wait on each other. Structures shared by all
+    accounts (leaderboard, payments, cashback heap and the merge alias table) have their own locks, which
+    are only taken for the update itself and never held while waiting for a stripe. Payments are numbered in
+    the order they take the payments lock, so while a write-ahead log is attached pay also holds the lock of
+    the merge alias table, which makes the order of the log the order of the payment ordinals.
+
+    Cashback that is due is paid out before a call takes its stripes. Refunds are recorded one at a time
+    under the stripe of the account owning the payment, behind a lock that makes other calls wait until
+    every refund due at their timestamp has been recorded. Calls that find no refund due only read a
+    watermark and don't take that lock at all.
+
+    Attributes
+    ----------
+    stripes : list
+        Stores the striped locks, an account is guarded by stripes[hash(account_id) % len(stripes)]
+    """
+
+    def __init__(self, stripes: int = 64):
+        super().__init__()
+        self.stripes = [threading.Lock() for _ in range(stripes)]
+        self.leaderboard = _LockedLeaderboard()
+        self.payments = _LockedPaymentRegistry()
+        self.cashback = _LockedCashbackScheduler()
+        self._nodes_lock = threading.RLock() # guards account_nodes, node_parents, node_accounts, node_children and the appends of create_account
+        self._cashback_lock = threading.Lock() # held while due refunds are recorded
+        self._settled = -1 << 63 # every refund due at or before this timestamp has been recorded
+
+    def create_account(self, timestamp: int, account_id: str) -> bool:
+        with self._stripe(account_id), self._nodes_lock:
+            return super().create_account(timestamp, account_id)
+
+    def deposit(self, timestamp: int, account_id: str, amount: int) -> int | None:
+        self._settle(timestamp)
+        with self._stripe(account_id):
+            return super().deposit(timestamp, account_id, amount)
+
+    def transfer(self, timestamp: int, source_account_id: str, target_account_id: str, amount: int) -> int | None:
+        self._settle(timestamp)
+        first, second = self._stripes(source_account_id, target_account_id)
+        with first, second:
+            return super().transfer(timestamp, source_account_id, target_account_id, amount)
+
+    def pay(self, timestamp: int, account_id: str, amount: int) -> str | None:
+        self._settle(timestamp)
+        # with a log attached, logging the payment and handing out its ordinal happen under one lock, so
+        # replaying the log numbers the payments the same way
+        with self._stripe(account_id), (_NO_LOCK if self.log is None else self._nodes_lock):
+            return super().pay(timestamp, account_id, amount)
+
+    def get_payment_status(self, timestamp: int, account_id: str, payment: str) -> str | None:
+        with self._nodes_lock:
+            return super().get_payment_status(timestamp, account_id, payment)
+
+    def list_payments(self, account_id: str, since: int, until: int) -> list[str] | None:
+        with self._nodes_lock:
+            return super().list_payments(account_id, since, until)
+
+    def get_balance(self, timestamp: int, account_id: str, time_at: int) -> int | None:
+        # only writers to the same stripe are waited for, their columns are updated in several steps
+        self._settle(timestamp)
+        with self._stripe(account_id):
+            return super().get_balance(timestamp, account_id, time_at)
+
+    def get_balances(self, account_ids: list[str], times: list[int]) -> list[list[int | None]]:
+        # refunds that are not due yet are added to the rows without being recorded, see the columnar engine, the
+        # cashback lock keeps them from being recorded by another call between reading them and reading the ledgers
+        query = self._time_query(times)
+        with self._cashback_lock:
+            pending = self._pending_refunds(max(times)) if times else {}
+            rows = []
+            for account_id in account_ids:
+                with self._stripe(account_id):
+                    rows.append(self._balance_row(account_id, times, query, pending))
+        return rows
+
+    def merge_accounts(self, timestamp: int, account_id_1: str, account_id_2: str) -> bool:
+        self._settle(timestamp)
+        first, second = self._stripes(account_id_1, account_id_2)
+        with first, second, self._nodes_lock:
+            return super().merge_accounts(timestamp, account_id_1, account_id_2)
+
+    def snapshot(self, timestamp: int):
+        '''
+        returns a read view of the system, taken while no call is half way through its writes
+        '''
+        self._settle(timestamp)
+        # every stripe is taken in order, like transfer does for two of them, so calls in progress finish first
+        for stripe in self.stripes:
+            stripe.acquire()
+        try:
+            with self._nodes_lock:
+                return super().snapshot(timestamp)
+        finally:
+            for stripe in self.stripes:
+                stripe.release()
+
+    def execute_batch(self, operations: list) -> list:
+        '''
+        applies a batch of operations in timestamp order, each operation locks only its own accounts, raises
+        BatchError like the columnar engine
+        '''
+        order = sorted(range(len(operations)), key=lambda i: operations[i].timestamp)
+        results = [None] * len(operations)
+        try:
+            for i in order:
+                results[i] = apply(self, operations[i])
+        except Exception as error:
+            raise BatchError(results, i) from error
+        return results
+
+    def _stripe(self, account_id: str) -> threading.Lock:
+        '''
+        returns the lock guarding account_id
+        '''
+        return self.stripes[hash(account_id) % len(self.stripes)]
+
+    def _stripes(self, account_id_1: str, account_id_2: str) -> tuple:
+        '''
+        returns the locks guarding two accounts in the order they have to be acquired, a stripe shared by both
+        accounts is only returned once, with a lock that does nothing in its place
+        '''
+        stripe_1 = hash(account_id_1) % len(self.stripes)
+        stripe_2 = hash(account_id_2) % len(self.stripes)
+        if stripe_1 == stripe_2:
+            return self.stripes[stripe_1], _NO_LOCK
+        return self.stripes[min(stripe_1, stripe_2)], self.stripes[max(stripe_1, stripe_2)]
+
+    def _process_cashback(self, timestamp: int):
+        # due refunds are settled before any stripe is taken, see _settle
+        pass
+
+    def _pending_refunds(self, until: int) -> dict:
+        with self._nodes_lock:
+            return super()._pending_refunds(until)
+
+    def _settle(self, timestamp: int):
+        '''
+        records every cashback refund that is due at or before timestamp, must be called without holding any lock
+        '''
+        if timestamp <= self._settled:
+            return
+
+        with self._cashback_lock:
+            if timestamp <= self._settled:
+                return
+            for due_timestamp, ordinal, amount in self.cashback.pop_due(timestamp):
+                # the owner can change while its stripe is awaited, so it is checked again once the stripe is held
+                while True:
+                    with self._nodes_lock:
+                        node = self._find(self.payments.nodes[ordinal - 1])
+                    with self._stripe(self.node_accounts[node]):
+                        with self._nodes_lock:
+                            if self._find(self.payments.nodes[ordinal - 1]) != node:
+                                continue
+                        ledger = self.ledgers[node]
+                        if self._views:
+                            self._preserve_ledger(ledger, due_timestamp)
+                        ledger.record(due_timestamp, amount, CASHBACK)
+                        break
+            self._settled = timestamp
+
+class _NoLock:
+    """
+    Stand-in for the second lock when both accounts of a call share a stripe
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NO_LOCK = _NoLock()
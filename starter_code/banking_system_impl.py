@@ -8,11 +8,14 @@ class BankingSystemImpl(BankingSystem):
     ----------
     accounts : dict
         Stores accounts and a record of their balance at given timestamps 
+    balances : dict
+        Stores the running balance of each account so writes don't have to look it up in the history
     """
 
     def __init__(self):
         super(BankingSystem, self).__init__
         self.accounts = {} # account_id: {timestamp : balance}
+        self.balances = {} # account_id: latest balance
 
     def create_account(self, timestamp: int, account_id: str) -> bool:
         '''
@@ -32,6 +35,7 @@ class BankingSystemImpl(BankingSystem):
             return False
         else:
             self.accounts[account_id] = {timestamp: 0}
+            self.balances[account_id] = 0
             return True
 
     def deposit(self, timestamp: int, account_id: str, amount: int) -> int | None:
@@ -52,12 +56,9 @@ class BankingSystemImpl(BankingSystem):
         if account_id not in self.accounts.keys(): # Account already exists
             return None
         else:
-            # Get balance from most recent timestamp
-            last_key = list(self.accounts[account_id].keys())[-1]
-            last_balance = self.accounts[account_id][last_key]
-
-            # Update balance with deposit amount at current timestamp
-            new_balance = last_balance + amount
+            # Update running balance with deposit amount at current timestamp
+            new_balance = self.balances[account_id] + amount
+            self.balances[account_id] = new_balance
             self.accounts[account_id].update({timestamp: new_balance})
             return new_balance
     
@@ -86,20 +87,20 @@ class BankingSystemImpl(BankingSystem):
             return None
         
         # Get most recent balance for source and target accounts 
-        last_source_key = list(self.accounts[source_account_id].keys())[-1]
-        last_source_balance = self.accounts[source_account_id][last_source_key]
+        last_source_balance = self.balances[source_account_id]
         if last_source_balance < amount: # Balance less than requested transfer amount
             return None
         
-        last_target_key = list(self.accounts[target_account_id].keys())[-1]
-        last_target_balance = self.accounts[target_account_id][last_target_key]
+        last_target_balance = self.balances[target_account_id]
 
         # Update source account balance
         source_balance = last_source_balance - amount
+        self.balances[source_account_id] = source_balance
         self.accounts[source_account_id].update({timestamp: source_balance})
         
         # Update target account balance
         target_balance = last_target_balance + amount
+        self.balances[target_account_id] = target_balance
         self.accounts[target_account_id].update({timestamp: target_balance})
 
         return source_balance
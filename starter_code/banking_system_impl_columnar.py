@@ -0,0 +1,771 @@
+from array import array
+from banking_system import BankingSystem
+from cashback import CashbackScheduler
+from leaderboard import SpendLeaderboard
+from ledger import Ledger, MappedLedger, DEPOSIT, TRANSFER_OUT, TRANSFER_IN, PAYMENT, CASHBACK, MERGE
+from operations import CreateAccount, Deposit, Transfer, Pay, MergeAccounts, METHODS, BatchError
+from payments import PaymentRegistry
+from snapshot import MappedSnapshot, NOT_MERGED, write_snapshot
+from views import MISSING, ReadView
+from wal import CODE_OF
+import heapq
+import math
+import weakref
+
+try:
+    import numpy as np
+except ImportError: # numpy is optional, get_balances falls back to bisecting every ledger
+    np = None
+
+# codes of the mutating operations in the write-ahead log
+_CREATE_ACCOUNT, _DEPOSIT, _TRANSFER, _PAY, _MERGE_ACCOUNTS = (CODE_OF[operation] for operation in (CreateAccount, Deposit, Transfer, Pay, MergeAccounts))
+
+class BankingSystemImpl(BankingSystem):
+    """
+    Banking system implementation storing account histories in columnar ledgers
+
+    Every created account is interned as a node, a dense integer handle, and all account state is stored in
+    columns indexed by node. A call looks its account_id up once in account_nodes and works on the node from
+    then on, account_id strings are only kept for the API and for the alphabetical tie-break of the leaderboard.
+
+    Attributes
+    ----------
+    account_nodes: dict
+        Stores the node of the current account with a given account_id, every created account gets a new node
+    node_accounts: list
+        Stores the account_id of every node
+    ledgers : list
+        Stores the ledger of transactions of every node
+    total_spend: array
+        Stores the total spend to date of every node, 0 once the account was merged away
+    merged_at: array
+        Stores the timestamp at which every node was merged into another account, or NOT_MERGED
+    leaderboard: SpendLeaderboard
+        Stores every account ordered by total spend, or alphabetically by account_id for ties
+    payments: PaymentRegistry
+        Stores a record of every payment and the account node that made it
+    node_parents: array
+        Stores the node every node was merged into, or the node itself if it was not merged, so the account that
+        owns a payment now is found through the alias table instead of rewriting payment records on every merge
+    node_children: dict
+        Stores the nodes that were merged directly into a node, so all payments of an account can be listed
+    cashback: CashbackScheduler
+        Stores the cashback refunds that are not due yet, account ledgers only contain settled transactions
+    log: WriteAheadLog
+        Stores the write-ahead log every call that changes the system is appended to, or None if the system is not
+        durable, see wal.recover
+    """
+
+    def __init__(self):
+        super(BankingSystem, self).__init__
+        self.account_nodes = {} # account_id : node
+        self.node_accounts = [] # node : account_id
+        self.ledgers = [] # node : Ledger
+        self.total_spend = array('q') # node : total spend
+        self.merged_at = array('q') # node : merge timestamp
+        self.leaderboard = SpendLeaderboard()
+        self.payments = PaymentRegistry()
+        self.node_parents = array('q') # node : node it was merged into
+        self.node_children = {} # node : [nodes merged into it]
+        self.cashback = CashbackScheduler()
+        self.log = None
+        self._views = [] # weak references to the open read views, see snapshot
+
+    def create_account(self, timestamp: int, account_id: str) -> bool:
+        '''
+        create_account function creates a new account if the account id dooes not already exist
+
+        Parameters:
+        ----------
+        timestamp (int): time creation is occurring
+        account_id (str): unique account identifier
+
+        Returns:
+        --------
+        True (boolean): account is created
+        False(boolean): account is not created because it already exists
+        '''
+        # ids of previously merged accounts can be reused, the new account gets a new node and the old one is left behind
+        if self._live_node(account_id) is not None:
+            return False
+
+        if self.log is not None:
+            self.log.append((_CREATE_ACCOUNT, timestamp, account_id))
+
+        if self._views:
+            self._preserve('account_nodes', account_id, self.account_nodes.get(account_id, MISSING))
+
+        # the columns of the node are filled in before the node is handed out
+        node = len(self.node_accounts)
+        self.node_accounts.append(account_id)
+        self.ledgers.append(Ledger(timestamp))
+        self.total_spend.append(0)
+        self.merged_at.append(NOT_MERGED)
+        self.node_parents.append(node)
+        self.account_nodes[account_id] = node
+        self.leaderboard.insert(account_id, 0)
+        return True
+
+    def deposit(self, timestamp: int, account_id: str, amount: int) -> int | None:
+        '''
+        deposit function adds given amount of money into specified account and returns the new balance
+
+        Parameters:
+        ----------
+        timestamp (int): time of transaction
+        account_id (str): unique account identifier
+        amount (int): amount of money to add to account
+
+        Returns:
+        -------
+        (int): updated balance after deposit
+
+        '''
+        node = self._live_node(account_id)
+        if node is None:
+            return None
+
+        if self.log is not None:
+            self.log.append((_DEPOSIT, timestamp, account_id, amount))
+        return self._deposit(timestamp, node, amount)
+
+    def transfer(self, timestamp: int, source_account_id: str, target_account_id: str, amount: int) -> int | None:
+        '''
+        transfer function moves amount from source_account_id and deposits it into target_account_id
+
+        Parameters:
+        ----------
+        timestamp (int): time of transaction
+        source_account_id (): unique identifier for account that funds are removed from
+        target_account_id (): unique identifier for the account that receives funds
+        amount (int): amount of money to be transferred
+
+        Returns:
+        -------
+        (int) new balance of the source_account_id
+        '''
+        if source_account_id == target_account_id:
+            return None
+
+        source_node = self._live_node(source_account_id)
+        if source_node is None:
+            return None
+
+        target_node = self._live_node(target_account_id)
+        if target_node is None:
+            return None
+
+        if self.log is not None:
+            self.log.append((_TRANSFER, timestamp, source_account_id, target_account_id, amount))
+        return self._transfer(timestamp, source_node, target_node, amount)
+
+    def top_spenders(self, timestamp: int, n: int) -> list[str]:
+        '''
+        top_spenders function returns the identifiers of the top n accounts with the highest
+        outgoing transactions (total amount of money either transferred out of or paid/withdrawn)
+
+        Parameters:
+        ----------
+        timestamp (int): time top_spenders is accessed
+        n (int): the number of accounts you want returned
+
+        Returns:
+        --------
+        (list): [account_id_1(total_outgoing),account_id_n(total_outgoing)]
+        '''
+        # the leaderboard is already in order of total transaction amount, or alphabetical of account_id for tie breaker
+        return self.leaderboard.top(n)
+
+    def pay(self, timestamp: int, account_id: str, amount: int) -> str | None:
+        '''
+        withdraws the specified amount of money from the specified account, providing a 2% cashback of the withdrawn amount to the account after 24 hours.
+
+        Parameters:
+        ----------
+        timestamp (int): time pay is occuring
+        account_id (str): unique account identifier
+        amount (int): the amount to be taken out of the account
+
+        Returns:
+        ---------
+        (str): payment(n) where n is the number of payments the account has made
+
+        '''
+        node = self._live_node(account_id)
+        if node is None:
+            return None
+
+        if self.log is not None:
+            self.log.append((_PAY, timestamp, account_id, amount))
+        return self._pay(timestamp, node, amount)
+
+    def get_payment_status(self, timestamp: int, account_id: str, payment: str) -> str | None:
+        '''
+        returns the status of the payment transaction
+
+        Parameters:
+        ----------
+        timestamp (int): time pay is occuring
+        account_id (str): unique account identifier
+        payment (str): the payment number you want to check status of (example: payment3)
+
+        Returns:
+        ---------
+        (str): "IN_PROGRESS" if the cashback has not been received
+        (str): "CASHBACK_RECEIVED" if the cashback has been received
+
+        '''
+        # Account ID doesnt exist
+        node = self.account_nodes.get(account_id)
+        if node is None:
+            return None
+
+        # check if payment exists for specified account, payments of merged accounts belong to the account they were merged into
+        ordinal = self.payments.ordinal(payment)
+        if ordinal is None or self._find(self.payments.nodes[ordinal - 1]) != node:
+            return None
+
+        # check payment status
+        return self.payments.status(ordinal, timestamp)
+
+    def list_payments(self, account_id: str, since: int, until: int) -> list[str] | None:
+        '''
+        returns the payments of an account between two timestamps, including payments of accounts merged into it
+
+        Parameters:
+        ----------
+        account_id (str): unique account identifier
+        since (int): earliest timestamp of a returned payment
+        until (int): latest timestamp of a returned payment
+
+        Returns:
+        ---------
+        (list): [payment ids] in the order the payments were made
+        None: the account doesn't exist
+        '''
+        node = self._live_node(account_id)
+        if node is None:
+            return None
+
+        # collect the node of the account and every node merged into it, directly or through other merges
+        nodes = [node]
+        for node in nodes:
+            nodes.extend(self.node_children.get(node, ()))
+
+        ordinals = heapq.merge(*(self.payments.node_payments(node, since, until) for node in nodes))
+        return [f"payment{ordinal}" for ordinal in ordinals]
+
+    def get_balance(self, timestamp: int, account_id: str, time_at: int) -> int | None:
+        '''
+        returns the total amount of money in the account account_id at given timestamp time_at
+
+        Parameters:
+        ----------
+        timestamp (int): time when balance retrieval is occuring
+        account_id (str): unique account identifier
+        time_at (int): the timestamp of where you want to check balance
+
+        Returns:
+        ---------
+        (int): total money in the account_id at timestamp time_at
+        '''
+        node = self.account_nodes.get(account_id)
+        if node is None:
+            return None
+
+        # if user is trying to access balance data of a merged account after merge time, return None
+        merged_at = self.merged_at[node]
+        if merged_at != NOT_MERGED and time_at >= merged_at:
+            return None
+
+        self._process_cashback(timestamp)
+        return self.ledgers[node].balance_at(time_at)
+
+    def get_balances(self, account_ids: list[str], times: list[int]) -> list[list[int | None]]:
+        '''
+        returns the balance of every account in account_ids at every timestamp in times, with the same
+        results as calling get_balance for each (account_id, time_at) pair
+
+        Parameters:
+        ----------
+        account_ids (list): unique account identifiers, one row of the result per account
+        times (list): the timestamps of where you want to check balances, one column of the result per timestamp
+
+        Returns:
+        ---------
+        (list): [[balance of account_ids[i] at times[j]]], None where the account did not exist at that time
+        '''
+        # get_balances has no current time to pay cashback out at, refunds that are not due yet are added to the
+        # balances at times after they are due without being recorded, so later merges still move them
+        pending = self._pending_refunds(max(times)) if times else {}
+        query = self._time_query(times)
+        return [self._balance_row(account_id, times, query, pending) for account_id in account_ids]
+
+    def merge_accounts(self, timestamp: int, account_id_1: str, account_id_2: str) -> bool:
+        '''
+        merges account_id_2 into account_id_1, account_id_2 is removed from the system afterwards
+
+        Parameters:
+        ----------
+        timestamp (int): time the merge is occuring
+        account_id_1 (str): unique identifier of the account that is kept
+        account_id_2 (str): unique identifier of the account that is merged away
+
+        Returns:
+        ---------
+        True (boolean): accounts were merged
+        False (boolean): accounts were not merged
+        '''
+        if account_id_1 == account_id_2:
+            return False
+
+        # check that both accounts exist and neither has already been merged
+        node_1 = self._live_node(account_id_1)
+        node_2 = self._live_node(account_id_2)
+        if node_1 is None or node_2 is None:
+            return False
+
+        if self.log is not None:
+            self.log.append((_MERGE_ACCOUNTS, timestamp, account_id_1, account_id_2))
+
+        # merge account data by adding the balance of account_id_2 into account_id_1 data, cashback that is
+        # not due yet follows the payment history to account_id_1
+        self._process_cashback(timestamp)
+        if self._views:
+            self._preserve_ledger(self.ledgers[node_1], timestamp)
+            self._preserve('merged_at', node_2, NOT_MERGED)
+            self._preserve('node_parents', node_2, node_2)
+            self._preserve('node_children', node_1, len(self.node_children.get(node_1, ())))
+            self._preserve('total_spend', node_1, self.total_spend[node_1])
+            self._preserve('total_spend', node_2, self.total_spend[node_2])
+        self.ledgers[node_1].record(timestamp, self.ledgers[node_2].balance_at(timestamp), MERGE)
+
+        # account_id_2 keeps its history up to the merge so earlier balances can still be checked
+        self.merged_at[node_2] = timestamp
+
+        # payments of account_id_2 now resolve to account_id_1 through the alias table
+        self.node_parents[node_2] = node_1
+        self.node_children.setdefault(node_1, []).append(node_2)
+
+        # add account_id_2 total spend to the total spend of account_id_1
+        total_spend_1, total_spend_2 = self.total_spend[node_1], self.total_spend[node_2]
+        self.leaderboard.remove(account_id_2, total_spend_2)
+        self.leaderboard.update(account_id_1, total_spend_1, total_spend_1 + total_spend_2)
+        self.total_spend[node_1] = total_spend_1 + total_spend_2
+        self.total_spend[node_2] = 0
+
+        return True
+
+    def execute_batch(self, operations: list) -> list:
+        '''
+        applies a batch of operations in timestamp order, with the same results as calling the methods one by one
+
+        Every account in the batch is looked up and validated once, deposit, transfer and pay then work on the
+        looked up nodes directly. That saves little next to the ledger appends every write makes, a batch of
+        mixed deposits, transfers and payments runs at most about 1.2 times as fast as the same calls made one
+        by one. The point of a batch is one call for many operations, e.g. for the server or replaying a log.
+
+        Parameters:
+        ----------
+        operations (list): operations from the operations module, e.g. [Deposit(1, 'account1', 100)]
+
+        Returns:
+        ---------
+        (list): the result of every operation, in the order the operations were given
+
+        Raises:
+        ---------
+        BatchError: an operation raised, the operations after it in timestamp order were not applied
+        '''
+        # sorting is stable, so operations at the same timestamp keep their order
+        order = sorted(range(len(operations)), key=lambda i: operations[i].timestamp)
+        results = [None] * len(operations)
+        live = {} # account_id : node, or None if the account doesn't exist or was merged away
+        log = self.log
+
+        try:
+            for i in order:
+                operation = operations[i]
+                kind = type(operation)
+
+                if kind is Deposit:
+                    timestamp, account_id, amount = operation
+                    try:
+                        node = live[account_id]
+                    except KeyError:
+                        node = live[account_id] = self._live_node(account_id)
+                    if node is not None:
+                        if log is not None:
+                            log.append((_DEPOSIT, timestamp, account_id, amount))
+                        results[i] = self._deposit(timestamp, node, amount)
+
+                elif kind is Transfer:
+                    timestamp, source_account_id, target_account_id, amount = operation
+                    try:
+                        source_node = live[source_account_id]
+                    except KeyError:
+                        source_node = live[source_account_id] = self._live_node(source_account_id)
+                    try:
+                        target_node = live[target_account_id]
+                    except KeyError:
+                        target_node = live[target_account_id] = self._live_node(target_account_id)
+                    if source_account_id != target_account_id and source_node is not None and target_node is not None:
+                        if log is not None:
+                            log.append((_TRANSFER, timestamp, source_account_id, target_account_id, amount))
+                        results[i] = self._transfer(timestamp, source_node, target_node, amount)
+
+                elif kind is Pay:
+                    timestamp, account_id, amount = operation
+                    try:
+                        node = live[account_id]
+                    except KeyError:
+                        node = live[account_id] = self._live_node(account_id)
+                    if node is not None:
+                        if log is not None:
+                            log.append((_PAY, timestamp, account_id, amount))
+                        results[i] = self._pay(timestamp, node, amount)
+
+                else:
+                    results[i] = getattr(self, METHODS[kind])(*operation)
+
+                    # creating and merging accounts changes which nodes are live
+                    if results[i] and kind is CreateAccount:
+                        live.pop(operation.account_id, None)
+                    elif results[i] and kind is MergeAccounts:
+                        live.pop(operation.account_id_2, None)
+        except Exception as error:
+            # operations before i were applied and the ones after it were not, see BatchError
+            raise BatchError(results, i) from error
+
+        return results
+
+    def save_snapshot(self, path: str):
+        '''
+        saves the whole state of the system to a binary snapshot file, see the snapshot module for the format
+
+        Ledgers of accounts that were loaded from a snapshot and not used since are copied over without being decoded.
+
+        Parameters:
+        ----------
+        path (str): path of the snapshot file, an existing file is replaced
+        '''
+        if any('\0' in account_id for account_id in self.account_nodes):
+            raise ValueError("account ids containing NUL characters can't be saved in a snapshot")
+
+        # every account_id is stored once, under the node of its current account
+        account_nodes = array('q', sorted(self.account_nodes.values()))
+        account_ids = [self.node_accounts[node] for node in account_nodes]
+        index = {account_id: i for i, account_id in enumerate(account_ids)}
+        columns = [self.ledgers[node].columns() for node in account_nodes]
+
+        row_starts = array('q', [0])
+        # columns of ledgers that are still mapped are byte buffers, so rows are counted in bytes
+        for timestamps, amounts, kinds in columns:
+            row_starts.append(row_starts[-1] + len(timestamps) * timestamps.itemsize // 8)
+
+        node_children = array('q')
+        for parent, children in self.node_children.items():
+            for child in children:
+                node_children.extend((parent, child))
+
+        payment_columns = self.payments.columns(len(self.node_accounts))
+        cashback_columns = self.cashback.columns()
+        write_snapshot(path, {
+            'node_ids': ['\0'.join(self.node_accounts).encode()],
+            'node_parents': [self.node_parents],
+            'node_children': [node_children],
+            'account_nodes': [account_nodes],
+            'row_starts': [row_starts],
+            'total_spend': [array('q', map(self.total_spend.__getitem__, account_nodes))],
+            'merged_at': [array('q', map(self.merged_at.__getitem__, account_nodes))],
+            'timestamps': [timestamps for timestamps, amounts, kinds in columns],
+            'amounts': [amounts for timestamps, amounts, kinds in columns],
+            'kinds': [kinds for timestamps, amounts, kinds in columns],
+            'leaderboard': [array('q', (index[account_id] for account_id, total_spend in self.leaderboard))],
+            'payment_timestamps': [payment_columns[0]],
+            'payment_nodes': [payment_columns[1]],
+            'payment_offsets': [payment_columns[2]],
+            'payment_ordinals': [payment_columns[3]],
+            'cashback_due': [cashback_columns[0]],
+            'cashback_ordinals': [cashback_columns[1]],
+            'cashback_amounts': [cashback_columns[2]],
+        })
+
+    def load_snapshot(self, path: str):
+        '''
+        replaces the state of the system with a snapshot saved by save_snapshot
+
+        The snapshot is memory mapped and account ledgers are only decoded when an account is used, so loading
+        costs one pass over the account table and doesn't read any transaction history.
+
+        Parameters:
+        ----------
+        path (str): path of the snapshot file
+
+        Raises:
+        ---------
+        ValueError: the file is not a snapshot or has an unsupported version
+        '''
+        snapshot = MappedSnapshot(path)
+
+        # open read views keep the structures that are replaced, nothing writes to those anymore
+        self._views = []
+        self.node_parents = snapshot.column('node_parents')
+        self.node_accounts = snapshot.strings('node_ids', len(self.node_parents))
+        self.node_children = {}
+        node_children = snapshot.column('node_children')
+        for parent, child in zip(node_children[::2], node_children[1::2]):
+            self.node_children.setdefault(parent, []).append(child)
+
+        account_nodes = snapshot.column('account_nodes')
+        account_ids = list(map(self.node_accounts.__getitem__, account_nodes))
+        self.account_nodes = dict(zip(account_ids, account_nodes))
+
+        # only the current account of every account_id is saved, nodes of accounts that were replaced by a new
+        # account with the same id after a merge are never looked up again and are left empty
+        node_count = len(self.node_parents)
+        merged_at = snapshot.column('merged_at')
+        total_spend = snapshot.column('total_spend')
+        self.ledgers = [None] * node_count
+        self.total_spend = array('q', bytes(8 * node_count))
+        self.merged_at = array('q', [NOT_MERGED]) * node_count
+        for i, node in enumerate(account_nodes):
+            self.ledgers[node] = MappedLedger(snapshot, i)
+            self.total_spend[node] = total_spend[i]
+            self.merged_at[node] = merged_at[i]
+        self.leaderboard = type(self.leaderboard).from_sorted((account_ids[i], total_spend[i]) for i in snapshot.column('leaderboard'))
+
+        self.payments = type(self.payments).from_columns(*(snapshot.column(name) for name in ('payment_timestamps', 'payment_nodes', 'payment_offsets', 'payment_ordinals')))
+        self.cashback = type(self.cashback).from_columns(*(snapshot.column(name) for name in ('cashback_due', 'cashback_ordinals', 'cashback_amounts')))
+
+    def snapshot(self, timestamp: int) -> ReadView:
+        '''
+        returns an immutable read view of accounts, total spend and payments as they are now, in O(1)
+
+        The view shares every structure with the system, calls that change the system afterwards save the entries
+        they overwrite into the view first, so reporting queries on the view never block or see later writes.
+        Every open view adds that cost to writes, a view stops costing anything once it is dropped.
+
+        Parameters:
+        ----------
+        timestamp (int): the current time, cashback due by then is paid out before the view is taken
+
+        Returns:
+        ---------
+        (ReadView): the view, see the views module
+        '''
+        self._process_cashback(timestamp)
+        view = ReadView(self, timestamp)
+        self._views.append(weakref.ref(view, self._views.remove))
+        return view
+
+    def _preserve(self, name: str, key, value):
+        '''
+        saves the value of an entry of a versioned mapping into every open read view before it is written, see ReadView.preserve
+        '''
+        for reference in tuple(self._views):
+            view = reference()
+            if view is not None:
+                view.preserve(name, key, value)
+
+    def _preserve_ledger(self, ledger: Ledger, timestamp: int):
+        '''
+        saves the version of a ledger into every open read view before a transaction at timestamp is recorded in it
+        '''
+        for reference in tuple(self._views):
+            view = reference()
+            if view is not None:
+                view.preserve_ledger(ledger, timestamp)
+
+    def _process_cashback(self, timestamp: int):
+        '''
+        pays out every cashback refund that is due at or before timestamp, before any other transaction at timestamp
+
+        Parameters:
+        ----------
+        timestamp (int): the current time
+        '''
+        for due_timestamp, ordinal, amount in self.cashback.pop_due(timestamp):
+            # refunds of merged accounts go to the account that owns the payment now
+            ledger = self.ledgers[self._find(self.payments.nodes[ordinal - 1])]
+            if self._views:
+                self._preserve_ledger(ledger, due_timestamp)
+            ledger.record(due_timestamp, amount, CASHBACK)
+
+    def _pending_refunds(self, until: int) -> dict:
+        '''
+        returns the cashback refunds that are scheduled at or before until, by the node of the account they will be paid to
+
+        Returns:
+        ---------
+        (dict): {node : [(due_timestamp, amount)]}
+        '''
+        pending = {}
+        for due_timestamp, ordinal, amount in zip(*self.cashback.columns()):
+            if due_timestamp <= until:
+                pending.setdefault(self._find(self.payments.nodes[ordinal - 1]), []).append((due_timestamp, amount))
+        return pending
+
+    @staticmethod
+    def _time_query(times: list[int]):
+        '''
+        returns times as an int64 array for _balance_row, None without numpy
+        '''
+        return None if np is None else np.asarray(times, dtype=np.int64)
+
+    def _balance_row(self, account_id: str, times: list[int], query, pending: dict) -> list[int | None]:
+        '''
+        returns the balance of an account at every timestamp in times for get_balances
+
+        Parameters:
+        ----------
+        account_id (str): unique account identifier
+        times (list): the timestamps of where you want to check balances
+        query (ndarray): times as returned by _time_query
+        pending (dict): refunds that are not recorded yet, see _pending_refunds
+
+        Returns:
+        ---------
+        (list): the balance at every timestamp, None where the account did not exist at that time
+        '''
+        node = self.account_nodes.get(account_id)
+        if node is None:
+            return [None] * len(times)
+
+        ledger = self.ledgers[node]
+        if query is None:
+            row = [ledger.balance_at(time_at) for time_at in times]
+        else:
+            # the ledger columns are already sorted, so one searchsorted resolves every timestamp of the account
+            positions = np.searchsorted(np.frombuffer(ledger.timestamps, dtype=np.int64), query, side='right')
+            found = np.frombuffer(ledger.balances, dtype=np.int64)[positions - 1].tolist()
+            row = [balance if position else None for position, balance in zip(positions.tolist(), found)]
+
+        refunds = pending.get(node)
+        if refunds:
+            row = [None if balance is None else balance + sum(amount for due_timestamp, amount in refunds if due_timestamp <= time_at) for time_at, balance in zip(times, row)]
+
+        # if user is trying to access balance data of a merged account after merge time, return None
+        merged_at = self.merged_at[node]
+        if merged_at != NOT_MERGED:
+            row = [None if time_at >= merged_at else balance for time_at, balance in zip(times, row)]
+        return row
+
+    def _find(self, node: int) -> int:
+        '''
+        returns the node of the account that node has been merged into, following merges of merged accounts
+
+        Parameters:
+        ----------
+        node (int): node of the account that made a payment
+
+        Returns:
+        ---------
+        (int): node of the account that has not been merged away
+        '''
+        parents = self.node_parents
+        root = node
+        while parents[root] != root:
+            root = parents[root]
+
+        # path compression, point every node on the way straight at the root
+        while parents[node] != root:
+            if self._views:
+                self._preserve('node_parents', node, parents[node])
+            parents[node], node = root, parents[node]
+
+        return root
+
+    def _live_node(self, account_id: str) -> int | None:
+        '''
+        returns the node of an account, or None if the account doesn't exist or was merged away
+        '''
+        node = self.account_nodes.get(account_id)
+        if node is None or self.merged_at[node] != NOT_MERGED:
+            return None
+        return node
+
+    def _deposit(self, timestamp: int, node: int, amount: int, kind: int = DEPOSIT) -> int:
+        '''
+        deposits amount into the ledger of an existing account and returns the new balance, kind is the ledger event kind of the row
+        '''
+        self._process_cashback(timestamp)
+        ledger = self.ledgers[node]
+        if self._views:
+            self._preserve_ledger(ledger, timestamp)
+        return ledger.record(timestamp, amount, kind)
+
+    def _transfer(self, timestamp: int, source_node: int, target_node: int, amount: int) -> int | None:
+        '''
+        moves amount between two different existing accounts and returns the new source balance
+        '''
+        # the target is checked first, so a transfer it can't take doesn't leave the source debited
+        self.ledgers[target_node].check(timestamp, amount)
+        source_balance = self._withdraw(timestamp, source_node, amount)
+        if source_balance is not None:
+            target_ledger = self.ledgers[target_node]
+            if self._views:
+                self._preserve_ledger(target_ledger, timestamp)
+            target_ledger.record(timestamp, amount, TRANSFER_IN)
+        return source_balance
+
+    def _withdraw(self, timestamp: int, source_node: int, amount: int) -> int | None:
+        '''
+        takes the outgoing side of a transfer out of the ledger of an existing account and returns the new balance
+        '''
+        self._process_cashback(timestamp)
+        source_ledger = self.ledgers[source_node]
+        last_source_balance = source_ledger.balance_at(timestamp)
+        if not last_source_balance:
+            return None
+
+        if last_source_balance < amount:
+            return None
+
+        # update source account balance
+        total_spend = self.total_spend[source_node]
+        if self._views:
+            self._preserve_ledger(source_ledger, timestamp)
+            self._preserve('total_spend', source_node, total_spend)
+        source_balance = source_ledger.record(timestamp, -amount, TRANSFER_OUT)
+
+        # update spending record of source account
+        self.leaderboard.update(self.node_accounts[source_node], total_spend, total_spend + amount)
+        self.total_spend[source_node] = total_spend + amount
+
+        return source_balance
+
+    def _pay(self, timestamp: int, node: int, amount: int) -> str | None:
+        '''
+        withdraws amount from the ledger of an existing account and returns the payment id
+        '''
+        # Insufficient funds
+        self._process_cashback(timestamp)
+        ledger = self.ledgers[node]
+        account_balance = ledger.balance_at(timestamp)
+        if not account_balance:
+            return None
+        if account_balance < amount:
+            return None
+
+        # withdraw amount from account
+        total_spend = self.total_spend[node]
+        if self._views:
+            self._preserve_ledger(ledger, timestamp)
+            self._preserve('total_spend', node, total_spend)
+        ledger.record(timestamp, -amount, PAYMENT)
+
+        # Update total spend for account
+        self.leaderboard.update(self.node_accounts[node], total_spend, total_spend + amount)
+        self.total_spend[node] = total_spend + amount
+
+        # update payment history
+        ordinal = self.payments.add(timestamp, node)
+        payment_id = f"payment{ordinal}"
+
+        # Schedule cash back
+        cashback = math.floor(0.02*amount)
+        if cashback > 0:
+            self.cashback.schedule(timestamp + 86400000, ordinal, cashback)
+
+        return payment_id
@@ -1,4 +1,5 @@
 from banking_system import BankingSystem
+from leaderboard import SpendLeaderboard
 
 class BankingSystemImpl(BankingSystem):
     """
@@ -10,12 +11,18 @@ class BankingSystemImpl(BankingSystem):
         Stores accounts and a record of their balance at given timestamps
     total_spend: dict
         Stores information about the total spend to date for each account
+    leaderboard: SpendLeaderboard
+        Stores every account ordered by total spend, or alphabetically by account_id for ties
+    balances : dict
+        Stores the running balance of each account so writes don't have to look it up in the history
     """
 
     def __init__(self):
         super(BankingSystem, self).__init__
-        self.accounts = {} # account_id : {timestamp : transaction_amount}
+        self.accounts = {} # account_id : {timestamp : balance}
         self.total_spend = {} # account_id : total_spent
+        self.leaderboard = SpendLeaderboard()
+        self.balances = {} # account_id : latest balance
 
     def create_account(self, timestamp: int, account_id: str) -> bool:
         '''
@@ -36,6 +43,8 @@ class BankingSystemImpl(BankingSystem):
         else:
             self.accounts[account_id] = {timestamp: 0}
             self.total_spend[account_id] = 0
+            self.leaderboard.insert(account_id, 0)
+            self.balances[account_id] = 0
             return True
 
     def deposit(self, timestamp: int, account_id: str, amount: int) -> int | None:
@@ -56,9 +65,8 @@ class BankingSystemImpl(BankingSystem):
         if account_id not in self.accounts.keys(): #account already exists
             return None
         else:
-            last_key = list(self.accounts[account_id].keys())[-1]
-            last_balance = self.accounts[account_id][last_key]
-            new_balance = last_balance + amount
+            new_balance = self.balances[account_id] + amount
+            self.balances[account_id] = new_balance
             self.accounts[account_id].update({timestamp: new_balance})
             return new_balance
     
@@ -86,23 +94,24 @@ class BankingSystemImpl(BankingSystem):
         if target_account_id not in self.accounts.keys():
             return None
         
-        last_source_key = list(self.accounts[source_account_id].keys())[-1]
-        last_source_balance = self.accounts[source_account_id][last_source_key]
+        last_source_balance = self.balances[source_account_id]
         if last_source_balance < amount:
             return None
         
-        last_target_key = list(self.accounts[target_account_id].keys())[-1]
-        last_target_balance = self.accounts[target_account_id][last_target_key]
+        last_target_balance = self.balances[target_account_id]
 
         # update source account balance
         source_balance = last_source_balance - amount
+        self.balances[source_account_id] = source_balance
         self.accounts[source_account_id].update({timestamp: source_balance})
         
         # update target account balance
         target_balance = last_target_balance + amount
+        self.balances[target_account_id] = target_balance
         self.accounts[target_account_id].update({timestamp: target_balance})
 
         # update spending record of source account
+        self.leaderboard.update(source_account_id, self.total_spend[source_account_id], self.total_spend[source_account_id] + amount)
         self.total_spend[source_account_id] += amount
 
         return source_balance
@@ -121,13 +130,5 @@ class BankingSystemImpl(BankingSystem):
         --------
         (list): [account_id_1(total_outgoing),account_id_n(total_outgoing)]
         '''
-        # Sort in order of total transaction amount, or alphabetical of account_id for tie breaker
-        sorted_spending = sorted(
-            self.total_spend.items(),
-            key=lambda item: (-item[1], item[0])
-        )
-
-        if len(self.total_spend) < n:
-            return [f"{key}({val})" for key, val in sorted_spending]
-
-        return [f"{key}({val})" for key, val in sorted_spending[:n]]
\ No newline at end of file
+        # the leaderboard is already in order of total transaction amount, or alphabetical of account_id for tie breaker
+        return self.leaderboard.top(n)
\ No newline at end of file
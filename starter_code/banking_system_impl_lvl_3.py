@@ -1,4 +1,6 @@
 from banking_system import BankingSystem
+from leaderboard import SpendLeaderboard
+import heapq
 import math
 
 class BankingSystemImpl(BankingSystem):
@@ -13,13 +15,22 @@ class BankingSystemImpl(BankingSystem):
         Stores information about the total spend to date for each account
     payment_history: dict
         Stores a record of every payment for each account 
+    leaderboard: SpendLeaderboard
+        Stores every account ordered by total spend, or alphabetically by account_id for ties
+    latest: dict
+        Stores the running balance of each account up to the last timestamp it was read or written at
+    pending: dict
+        Stores the timestamps of transactions that are later than the running balance, i.e. cashback not yet received
     """
 
     def __init__(self):
         super(BankingSystem, self).__init__
         self.accounts = {} # account_id : {timestamp : transaction_amount}
         self.total_spend = {} # account_id : total_spent
+        self.leaderboard = SpendLeaderboard()
         self.payment_history = {} # payment_id : (timestamp, account_id)
+        self.latest = {} # account_id : [last_timestamp, balance]
+        self.pending = {} # account_id : heap of timestamps later than last_timestamp
 
     def create_account(self, timestamp: int, account_id: str) -> bool:
         '''
@@ -40,6 +51,9 @@ class BankingSystemImpl(BankingSystem):
         else:
             self.accounts[account_id] = {timestamp: 0}
             self.total_spend[account_id] = 0
+            self.leaderboard.insert(account_id, 0)
+            self.latest[account_id] = [timestamp, 0]
+            self.pending[account_id] = []
             return True
 
     def deposit(self, timestamp: int, account_id: str, amount: int) -> int | None:
@@ -60,12 +74,10 @@ class BankingSystemImpl(BankingSystem):
         if account_id not in self.accounts.keys(): #account already exists
             return None
         
-        #process pending cashback if this timestamp matches
-        if timestamp in self.accounts[account_id]:
-            amount += self.accounts[account_id][timestamp]
-
-        self.accounts[account_id].update({timestamp: amount})
-        return self._get_latest_balance(account_id, timestamp)
+        # pending cashback at this timestamp is processed before the deposit is added
+        balance = self._get_latest_balance(account_id, timestamp)
+        self._record_transaction(account_id, timestamp, amount)
+        return balance + amount
     
     def transfer(self, timestamp: int, source_account_id: str, target_account_id: str, amount: int) -> int | None:
         '''
@@ -98,12 +110,13 @@ class BankingSystemImpl(BankingSystem):
         last_target_balance = self._get_latest_balance(target_account_id, timestamp)
 
         # update source account balance
-        self.accounts[source_account_id].update({timestamp: -amount})
+        self._record_transaction(source_account_id, timestamp, -amount)
         
         # update target account balance
-        self.accounts[target_account_id].update({timestamp: amount})
+        self._record_transaction(target_account_id, timestamp, amount)
 
         # update spending record of source account
+        self.leaderboard.update(source_account_id, self.total_spend[source_account_id], self.total_spend[source_account_id] + amount)
         self.total_spend[source_account_id] += amount
 
         return self._get_latest_balance(source_account_id, timestamp)
@@ -122,16 +135,8 @@ class BankingSystemImpl(BankingSystem):
         --------
         (list): [account_id_1(total_outgoing),account_id_n(total_outgoing)]
         '''
-        # Sort in order of total transaction amount, or alphabetical of account_id for tie breaker
-        sorted_spending = sorted(
-            self.total_spend.items(),
-            key=lambda item: (-item[1], item[0])
-        )
-
-        if len(self.total_spend) < n:
-            return [f"{key}({val})" for key, val in sorted_spending]
-
-        return [f"{key}({val})" for key, val in sorted_spending[:n]]
+        # the leaderboard is already in order of total transaction amount, or alphabetical of account_id for tie breaker
+        return self.leaderboard.top(n)
     
     def pay(self, timestamp: int, account_id: str, amount: int) -> str | None:
         '''
@@ -158,17 +163,17 @@ class BankingSystemImpl(BankingSystem):
             return None
         
         # withdraw amount from account
-        self.accounts[account_id][timestamp] = self.accounts[account_id].get(timestamp, 0) - amount
+        self._record_transaction(account_id, timestamp, -amount)
 
         # Update total spend for account
+        self.leaderboard.update(account_id, self.total_spend[account_id], self.total_spend[account_id] + amount)
         self.total_spend[account_id] += amount
 
         # Process cash back
         cashback = math.floor(0.02*amount)
         cashback_timestamp = timestamp + 86400000
         if cashback > 0:
-            self.accounts[account_id].setdefault(cashback_timestamp, 0)
-            self.accounts[account_id][cashback_timestamp] += cashback
+            self._record_transaction(account_id, cashback_timestamp, cashback)
         # update payment history
         payment_id = f"payment{len(self.payment_history) + 1}"
         self.payment_history.update({payment_id : (timestamp, account_id)})
@@ -218,12 +223,44 @@ class BankingSystemImpl(BankingSystem):
         ---------
         (int): total money in the account_id at timestamp
         '''
+        latest = self.latest[account_id]
+
+        # backdated timestamps are rebuilt from the full history
+        if timestamp < latest[0]:
+            account = self.accounts[account_id]
+            sorted_timestamps = sorted(account.keys())
+            while sorted_timestamps:
+                if sorted_timestamps[-1] <= timestamp:
+                    break
+                sorted_timestamps.pop(-1)
+
+            last_balance = sum(self.accounts[account_id][t] for t in sorted_timestamps)
+            return last_balance
+
+        # move the running balance forward, adding any cashback that is due by now
+        pending = self.pending[account_id]
+        while pending and pending[0] <= timestamp:
+            latest[1] += self.accounts[account_id][heapq.heappop(pending)]
+        latest[0] = timestamp
+        return latest[1]
+
+    def _record_transaction(self, account_id: str, timestamp: int, amount: int):
+        '''
+        adds amount to the account history at timestamp and keeps the running balance of the account up to date
+
+        Parameters:
+        ----------
+        account_id (str): unique account identifier
+        timestamp (int): time of the transaction
+        amount (int): signed amount of money added to the account
+        '''
         account = self.accounts[account_id]
-        sorted_timestamps = sorted(account.keys())
-        while sorted_timestamps:
-            if sorted_timestamps[-1] <= timestamp:
-                break
-            sorted_timestamps.pop(-1)
-
-        last_balance = sum(self.accounts[account_id][t] for t in sorted_timestamps)
-        return last_balance
\ No newline at end of file
+        latest = self.latest[account_id]
+
+        if timestamp <= latest[0]:
+            latest[1] += amount
+        elif timestamp not in account:
+            # transactions later than the running balance are added to it once their timestamp is reached
+            heapq.heappush(self.pending[account_id], timestamp)
+
+        account[timestamp] = account.get(timestamp, 0) + amount
\ No newline at end of file
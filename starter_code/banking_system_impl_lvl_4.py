@@ -1,4 +1,7 @@
 from banking_system import BankingSystem
+from leaderboard import SpendLeaderboard
+from account import Account, ColdAccount
+from cashback import CashbackScheduler
 import math
 
 class BankingSystemImpl(BankingSystem):
@@ -8,18 +11,45 @@ class BankingSystemImpl(BankingSystem):
     Attributes
     ----------
     accounts : dict
-        Stores accounts and a record of their balance at given timestamps
-    total_spend: dict
-        Stores information about the total spend to date for each account
+        Stores every account by account_id, with its transaction history, balance and total spend
+    account_nodes: dict
+        Stores the node of the current account with a given account_id, every created account gets a new node
+    node_accounts: list
+        Stores the account_id of every node
+    node_parents: list
+        Stores the node every node was merged into, or the node itself if it was not merged, so the account that
+        owns a payment now is found through the alias table instead of rewriting payment records on every merge
     payment_history: dict
-        Stores a record of every payment for each account 
+        Stores a record of every payment and the node of the account that made it
+    cashback: CashbackScheduler
+        Stores the cashback refunds that are not due yet, they are only added to the account histories once due
+    leaderboard: SpendLeaderboard
+        Stores every account ordered by total spend, or alphabetically by account_id for ties
+    counters: dict
+        Stores counts of the work done by the operations, see debug_stats
+    store: ColdStore
+        Stores the cold store accounts that were not used for a while are evicted to, or None if every account is
+        kept in memory, see coldstore.attach
     """
 
     def __init__(self):
         super(BankingSystem, self).__init__
-        self.accounts = {} # account_id : {timestamp : transaction_amount}
-        self.total_spend = {} # account_id : total_spent
-        self.payment_history = {} # payment_id : (timestamp, account_id)
+        self.accounts = {} # account_id : Account
+        self.leaderboard = SpendLeaderboard()
+        self.account_nodes = {} # account_id : node
+        self.node_accounts = [] # node : account_id
+        self.node_parents = [] # node : node it was merged into
+        self.payment_history = {} # payment_id : (timestamp, node)
+        self.cashback = CashbackScheduler()
+        self.counters = {
+            'get_balance_calls': 0,
+            'index_searches': 0, # get_balance calls that asked for a past balance and bisected the balance index
+            'index_entries_searched': 0, # entries the bisections compared against, log2 of the index length each
+            'merges': 0,
+            'owner_lookups': 0, # payments whose owner was resolved through the alias table
+            'aliases_followed': 0, # merge links the lookups followed before path compression
+        }
+        self.store = None
 
     def create_account(self, timestamp: int, account_id: str) -> bool:
         '''
@@ -35,18 +65,21 @@ class BankingSystemImpl(BankingSystem):
         True (boolean): account is created
         False(boolean): account is not created because it already exists
         '''
-        if account_id in self.accounts: #account already exists
-            if self.get_balance(0, account_id, timestamp) is None: # check if the existing account id is from a previously merged account, if yes delete the old account data
-                self.accounts[account_id].clear()
-                self.accounts[account_id] = {timestamp: 0}
-                self.total_spend[account_id] = 0
-                return True
-            else:
-                return False
-        else:
-            self.accounts[account_id] = {timestamp: 0}
-            self.total_spend[account_id] = 0
-            return True
+        account = self.accounts.get(account_id)
+        # an existing account id can only be reused if it is from a previously merged account, whose old data is replaced
+        if account is not None and account.merged_at is None:
+            return False
+
+        # ids of previously merged accounts can be reused, the new account gets a new node and the old one is left behind
+        node = len(self.node_accounts)
+        self.node_accounts.append(account_id)
+        self.node_parents.append(node)
+        self.account_nodes[account_id] = node
+        self.accounts[account_id] = Account(timestamp)
+        if self.store is not None:
+            self.store.touch(self.accounts, timestamp, account_id)
+        self.leaderboard.insert(account_id, 0)
+        return True
 
     def deposit(self, timestamp: int, account_id: str, amount: int) -> int | None:
         '''
@@ -63,19 +96,20 @@ class BankingSystemImpl(BankingSystem):
         (int): updated balance after deposit
         
         '''
-        if account_id not in self.accounts.keys(): #account doesn't exist
+        # evicted accounts are read back from the cold store
+        account = self.accounts.get(account_id) if self.store is None else self.store.touch(self.accounts, timestamp, account_id)
+        if account is None: #account doesn't exist
             return None
         
-        # check if the last time stamp is str "merged"
-        if self.get_balance(0, account_id, timestamp) is None:
+        # merged accounts no longer keep a running balance
+        if account.merged_at is not None:
             return None
         
-        #process pending cashback if this timestamp matches
-        if timestamp in self.accounts[account_id]:
-            amount += self.accounts[account_id][timestamp]
-
-        self.accounts[account_id].update({timestamp: amount})
-        return self.get_balance(0, account_id, timestamp)
+        # pending cashback at this timestamp is processed before the deposit is added
+        self._process_cashback(timestamp)
+        balance = account.latest_balance(timestamp)
+        account.record(timestamp, amount)
+        return balance + amount
     
     def transfer(self, timestamp: int, source_account_id: str, target_account_id: str, amount: int) -> int | None:
         '''
@@ -95,13 +129,20 @@ class BankingSystemImpl(BankingSystem):
         if source_account_id == target_account_id:
             return None
         
-        if source_account_id not in self.accounts.keys():
+        source = self.accounts.get(source_account_id) if self.store is None else self.store.touch(self.accounts, timestamp, source_account_id)
+        if source is None:
             return None
         
-        if target_account_id not in self.accounts.keys():
+        target = self.accounts.get(target_account_id) if self.store is None else self.store.touch(self.accounts, timestamp, target_account_id)
+        if target is None:
             return None
         
-        last_source_balance = self.get_balance(0, source_account_id, timestamp)
+        # neither account can have been merged away
+        if source.merged_at is not None or target.merged_at is not None:
+            return None
+        
+        self._process_cashback(timestamp)
+        last_source_balance = source.latest_balance(timestamp)
         if not last_source_balance:
             return None
 
@@ -109,15 +150,16 @@ class BankingSystemImpl(BankingSystem):
             return None
 
         # update source account balance
-        self.accounts[source_account_id].update({timestamp: -amount})
+        source.record(timestamp, -amount)
         
         # update target account balance
-        self.accounts[target_account_id].update({timestamp: amount})
+        target.record(timestamp, amount)
 
         # update spending record of source account
-        self.total_spend[source_account_id] += amount
+        self.leaderboard.update(source_account_id, source.total_spend, source.total_spend + amount)
+        source.total_spend += amount
 
-        return self.get_balance(0, source_account_id, timestamp)
+        return source.latest_balance(timestamp)
     
     def top_spenders(self, timestamp: int, n: int) -> list[str]:
         '''
@@ -133,16 +175,8 @@ class BankingSystemImpl(BankingSystem):
         --------
         (list): [account_id_1(total_outgoing),account_id_n(total_outgoing)]
         '''
-        # Sort in order of total transaction amount, or alphabetical of account_id for tie breaker
-        sorted_spending = sorted(
-            self.total_spend.items(),
-            key=lambda item: (-item[1], item[0])
-        )
-
-        if len(self.total_spend) < n:
-            return [f"{key}({val})" for key, val in sorted_spending]
-
-        return [f"{key}({val})" for key, val in sorted_spending[:n]]
+        # the leaderboard is already in order of total transaction amount, or alphabetical of account_id for tie breaker
+        return self.leaderboard.top(n)
     
     def pay(self, timestamp: int, account_id: str, amount: int) -> str | None:
         '''
@@ -160,31 +194,33 @@ class BankingSystemImpl(BankingSystem):
 
         '''
     
-        if account_id not in self.accounts.keys():
+        account = self.accounts.get(account_id) if self.store is None else self.store.touch(self.accounts, timestamp, account_id)
+        if account is None or account.merged_at is not None:
             return None
         
         # Insufficient funds
-        account_balance = self.get_balance(0, account_id, timestamp)
+        self._process_cashback(timestamp)
+        account_balance = account.latest_balance(timestamp)
         if not account_balance:
             return None
         if account_balance < amount:    
             return None
         
         # withdraw amount from account
-        self.accounts[account_id][timestamp] = self.accounts[account_id].get(timestamp, 0) - amount
+        account.record(timestamp, -amount)
 
         # Update total spend for account
-        self.total_spend[account_id] += amount
+        self.leaderboard.update(account_id, account.total_spend, account.total_spend + amount)
+        account.total_spend += amount
 
-        # Process cash back
+        # Process cash back, the refund is paid to whichever account owns the payment when it is due
+        ordinal = len(self.payment_history) + 1
         cashback = math.floor(0.02*amount)
-        cashback_timestamp = timestamp + 86400000
         if cashback > 0:
-            self.accounts[account_id].setdefault(cashback_timestamp, 0)
-            self.accounts[account_id][cashback_timestamp] += cashback
+            self.cashback.schedule(timestamp + 86400000, ordinal, cashback)
         # update payment history
-        payment_id = f"payment{len(self.payment_history) + 1}"
-        self.payment_history.update({payment_id : (timestamp, account_id)})
+        payment_id = f"payment{ordinal}"
+        self.payment_history[payment_id] = (timestamp, self.account_nodes[account_id])
 
         return payment_id
     
@@ -205,15 +241,16 @@ class BankingSystemImpl(BankingSystem):
 
         '''
         # Account ID doesnt exist
-        if account_id not in self.accounts.keys():
+        if account_id not in self.accounts:
             return None
         
-        # check if payment exists for specified account
-        if payment not in self.payment_history or self.payment_history[payment][1] != account_id:
+        # check if payment exists for specified account, payments of accounts merged into it belong to it
+        record = self.payment_history.get(payment)
+        if record is None or self._find(record[1]) != self.account_nodes[account_id]:
             return None
         
         # check payment status
-        if timestamp < (self.payment_history[payment][0] + 86400000):
+        if timestamp < (record[0] + 86400000):
             return "IN_PROGRESS"
         else:
             return "CASHBACK_RECEIVED"
@@ -232,59 +269,159 @@ class BankingSystemImpl(BankingSystem):
         ---------
         (int): total money in the account_id at timestamp time_at
         '''
-        if account_id not in self.accounts:
-            return None
-        
-        account = self.accounts[account_id]
-        sorted_timestamps = sorted(account.keys())
-        while sorted_timestamps:
-            if sorted_timestamps[-1] <= time_at:
-                break
-            sorted_timestamps.pop(-1)
-        
-        if not sorted_timestamps:
-            return None
-        
-        # if user is trying to access  balance data of a merged account after merge time, return None
-        if isinstance(self.accounts[account_id][sorted_timestamps[-1]], str):
+        account = self.accounts.get(account_id)
+        if account is None:
             return None
+
+        self._process_cashback(timestamp)
+
+        # an evicted account answers balances from its last transaction onwards without being read back
+        if self.store is not None:
+            account = self.store.touch(self.accounts, timestamp, account_id, time_at)
+            if account.__class__ is ColdAccount:
+                return account.balance_at(time_at)
+
+        counters = self.counters
+        counters['get_balance_calls'] += 1
+        if time_at < account.timestamps[-1]:
+            counters['index_searches'] += 1
+            counters['index_entries_searched'] += len(account.timestamps).bit_length()
         
-        last_balance = sum(self.accounts[account_id][t] for t in sorted_timestamps)
-        return last_balance
+        return account.balance_at(time_at)
     
     def merge_accounts(self, timestamp: int, account_id_1: str, account_id_2: str) -> bool:
         if account_id_1 == account_id_2:
             return False
         
-        if account_id_1 not in self.accounts or account_id_2 not in self.accounts:
+        if self.store is None:
+            account_1 = self.accounts.get(account_id_1)
+            account_2 = self.accounts.get(account_id_2)
+        else:
+            account_1 = self.store.touch(self.accounts, timestamp, account_id_1)
+            account_2 = self.store.touch(self.accounts, timestamp, account_id_2)
+        if account_1 is None or account_2 is None:
             return False
         
         # check that either account has not already been merged
-        if self.get_balance(timestamp, account_id_1, timestamp) is None or self.get_balance(timestamp, account_id_2, timestamp) is None:
+        if account_1.merged_at is not None or account_2.merged_at is not None:
             return False
         
-        # merge account data by adding balance & future cashback transactions of account_id_2 into account_id_1 data
-        future_transactions = {}
-        future_timestamps = list(self.accounts[account_id_2].keys())
-        for key in future_timestamps:
-            if key > timestamp:
-                future_transactions.update({key: self.accounts[account_id_2].pop(key)}) # remove future transactions from account_id_2 and add them to the future_transactions dict to be added to account_id_1 next
-                
-        self.accounts[account_id_1][timestamp] = self.accounts[account_id_1].get(timestamp, 0) + self.get_balance(timestamp, account_id_2, timestamp)
-        self.accounts[account_id_1] = self.accounts[account_id_1] | future_transactions
+        # merge account data by adding the balance of account_id_2 into account_id_1 data
+        self._process_cashback(timestamp)
+        account_1.record(timestamp, account_2.latest_balance(timestamp))
 
-        # update account_id_2 data so that final timestamp data records merge
-        self.accounts[account_id_2][timestamp] = f"MERGED with account ${account_id_1}"
+        # account_id_2 keeps its history up to the merge, its balance is None from the merge onwards
+        account_2.merged_at = timestamp
         
-        # find all transactions in payment history for account_id_2 and update them to use account_id_1
-        for key, val in self.payment_history.items():
-            if val[1] == account_id_2:
-                self.payment_history.update({key : (val[0], account_id_1)})
+        # the payments of account_id_2 now belong to account_id_1, so do the cashback refunds that are not due yet,
+        # payment records keep the node that made them and are resolved through the alias table when read
+        self.counters['merges'] += 1
+        self.node_parents[self.account_nodes[account_id_2]] = self.account_nodes[account_id_1]
                 
-        # add account_id_2 total spend to the total spend of account_id_1 and remove account_id_2 from total spend dict
-        self.total_spend[account_id_1] += self.total_spend[account_id_2]
-        self.total_spend.pop(account_id_2)
+        # add account_id_2 total spend to the total spend of account_id_1 and remove account_id_2 from the leaderboard
+        self.leaderboard.remove(account_id_2, account_2.total_spend)
+        self.leaderboard.update(account_id_1, account_1.total_spend, account_1.total_spend + account_2.total_spend)
+        account_1.total_spend += account_2.total_spend
+        account_2.total_spend = 0
 
         return True
 
-        
\ No newline at end of file
+    def debug_stats(self) -> dict:
+        '''
+        returns a snapshot of the internal counters and of the shape of the data, to explain why operations are slow
+
+        Returns:
+        ---------
+        (dict): {
+            'accounts': {'open', 'merged', 'cold'}: cold accounts were evicted to the cold store and are open or merged,
+            'history': {'entries', 'max_length', 'mean_length'}: entries of the balance index of every account in memory,
+            'pending_cashback': {'refunds', 'amount'}: cashback refunds that are scheduled but not due yet,
+            'get_balance': {'calls', 'index_searches', 'entries_searched', 'entries_searched_per_call', 'latest_hit_rate'},
+            'top_spenders': {'calls', 'cache_hits', 'cache_hit_rate', 'entries_listed', 'entries_moved'},
+            'merge_accounts': {'merges', 'owner_lookups', 'aliases_followed', 'aliases_followed_per_lookup'},
+            'payments': number of payments made,
+        }
+        '''
+        counters = self.counters
+        merged = sum(1 for account in self.accounts.values() if account.merged_at is not None)
+        # evicted accounts have no history in memory
+        accounts = [account for account in self.accounts.values() if account.__class__ is not ColdAccount]
+        lengths = [len(account.timestamps) for account in accounts]
+        refunds = self.cashback.columns()[2]
+        calls = counters['get_balance_calls']
+        lookups = counters['owner_lookups']
+        leaderboard = self.leaderboard
+
+        return {
+            'accounts': {'open': len(self.accounts) - merged, 'merged': merged, 'cold': len(self.accounts) - len(accounts)},
+            'history': {
+                'entries': sum(lengths),
+                'max_length': max(lengths, default=0),
+                'mean_length': round(sum(lengths) / len(lengths), 3) if lengths else 0.0,
+            },
+            'pending_cashback': {'refunds': len(refunds), 'amount': sum(refunds)},
+            'get_balance': {
+                'calls': calls,
+                'index_searches': counters['index_searches'],
+                'entries_searched': counters['index_entries_searched'],
+                'entries_searched_per_call': round(counters['index_entries_searched'] / calls, 3) if calls else 0.0,
+                'latest_hit_rate': round(1 - counters['index_searches'] / calls, 4) if calls else 0.0,
+            },
+            'top_spenders': {
+                'calls': leaderboard.reads,
+                'cache_hits': leaderboard.cache_hits,
+                'cache_hit_rate': round(leaderboard.cache_hits / leaderboard.reads, 4) if leaderboard.reads else 0.0,
+                'entries_listed': leaderboard.entries_listed,
+                'entries_moved': leaderboard.entries_moved,
+            },
+            'merge_accounts': {
+                'merges': counters['merges'],
+                'owner_lookups': lookups,
+                'aliases_followed': counters['aliases_followed'],
+                'aliases_followed_per_lookup': round(counters['aliases_followed'] / lookups, 3) if lookups else 0.0,
+            },
+            'payments': len(self.payment_history),
+        }
+
+    def _process_cashback(self, timestamp: int):
+        '''
+        pays out every cashback refund that is due at or before timestamp, before any other transaction at timestamp
+
+        Refunds are due in timestamp order and every transaction so far is no later than timestamp, so a refund is
+        always appended to the end of the account history.
+
+        Parameters:
+        ----------
+        timestamp (int): the current time
+        '''
+        for due_timestamp, ordinal, amount in self.cashback.pop_due(timestamp):
+            # refunds of merged accounts go to the account that owns the payment now
+            account_id = self.node_accounts[self._find(self.payment_history[f"payment{ordinal}"][1])]
+            account = self.accounts[account_id] if self.store is None else self.store.touch(self.accounts, timestamp, account_id)
+            account.record(due_timestamp, amount)
+
+    def _find(self, node: int) -> int:
+        '''
+        returns the node of the account that node has been merged into, following merges of merged accounts
+
+        Parameters:
+        ----------
+        node (int): node of the account that made a payment
+
+        Returns:
+        ---------
+        (int): node of the account that has not been merged away
+        '''
+        parents = self.node_parents
+        root = node
+        followed = 0
+        while parents[root] != root:
+            root = parents[root]
+            followed += 1
+        self.counters['owner_lookups'] += 1
+        self.counters['aliases_followed'] += followed
+
+        # path compression, point every node on the way straight at the root
+        while parents[node] != root:
+            parents[node], node = root, parents[node]
+        return root
@@ -0,0 +1,484 @@
+from array import array
+from itertools import islice
+import heapq
+import multiprocessing
+import zlib
+from banking_system import BankingSystem
+from banking_system_impl_columnar import BankingSystemImpl
+from ledger import TRANSFER_IN, MERGE
+from operations import CreateAccount, Deposit, Transfer, TopSpenders, Pay, GetPaymentStatus, MergeAccounts, GetBalance
+from payments import PaymentRegistry
+from wal import CODES, CODE_OF
+
+# kinds of the entries in the queue of a shard, plain operations are sent as (_PLAIN, index, log code, fields) since
+# plain tuples are much cheaper to pickle than operations, and queued as (_PLAIN, index, operation) once received
+_PLAIN = 0 # an operation that only touches accounts of the shard
+_WITHDRAW = 1 # (_WITHDRAW, index, ticket, timestamp, account_id, amount), outgoing side of a transfer to another shard
+_CREDIT = 2 # (_CREDIT, ticket, timestamp, account_id, amount), incoming side of a transfer from another shard
+_DETACH = 3 # (_DETACH, ticket, timestamp, account_id), account merged into an account of another shard
+_ABSORB = 4 # (_ABSORB, ticket, timestamp, account_id), account an account of another shard is merged into
+_TOP = 5 # (_TOP, index, n), top spenders of the shard
+
+class ShardEngine(BankingSystemImpl):
+    """
+    Columnar banking system holding one shard of the accounts of a ShardedBankingSystem
+
+    Transfers and merges between shards are split into two halves that run on the two shards. Payment ids
+    returned by a shard are local to the shard, the coordinator numbers payments across all shards.
+    """
+
+    def withdraw(self, timestamp: int, account_id: str, amount: int) -> int | None:
+        '''
+        outgoing side of a transfer to an account of another shard, returns the new balance or None if it failed
+        '''
+        node = self._live_node(account_id)
+        if node is None:
+            return None
+        return self._withdraw(timestamp, node, amount)
+
+    def credit(self, timestamp: int, account_id: str, amount: int):
+        '''
+        incoming side of a transfer from an account of another shard that succeeded
+        '''
+        self._deposit(timestamp, self.account_nodes[account_id], amount, TRANSFER_IN)
+
+    def detach(self, timestamp: int, account_id: str) -> tuple[int, int, list[tuple[int, int]]]:
+        '''
+        merges an account away into an account of another shard
+
+        Returns:
+        ---------
+        (tuple): (balance at timestamp, total spend, [(due_timestamp, amount)] of the refunds that are not due yet)
+        '''
+        self._process_cashback(timestamp)
+        node = self.account_nodes[account_id]
+        balance = self.ledgers[node].balance_at(timestamp)
+
+        # refunds that are not due yet follow the payments to the account the account is merged into
+        refunds = self.cashback.extract(lambda ordinal: self._find(self.payments.nodes[ordinal - 1]) == node)
+
+        self.merged_at[node] = timestamp
+        total_spend = self.total_spend[node]
+        self.leaderboard.remove(account_id, total_spend)
+        self.total_spend[node] = 0
+        return balance, total_spend, [(due_timestamp, amount) for due_timestamp, ordinal, amount in refunds]
+
+    def absorb(self, timestamp: int, account_id: str, balance: int, total_spend: int, refunds: list[tuple[int, int]]):
+        '''
+        merges the state returned by detach on another shard into an account
+        '''
+        self._process_cashback(timestamp)
+        node = self.account_nodes[account_id]
+        self.ledgers[node].record(timestamp, balance, MERGE)
+        self.leaderboard.update(account_id, self.total_spend[node], self.total_spend[node] + total_spend)
+        self.total_spend[node] += total_spend
+
+        # the refunds are scheduled under placeholder payments of the account, so they follow later merges like any other payment
+        for due_timestamp, amount in refunds:
+            self.cashback.schedule(due_timestamp, self.payments.add(due_timestamp - 86400000, node), amount)
+
+    def top(self, n: int) -> list[tuple[str, int]]:
+        '''
+        returns [(account_id, total_spend)] of the top n spenders of the shard
+        '''
+        return list(islice(self.leaderboard, n))
+
+def _accounts(entry: tuple) -> tuple:
+    '''
+    returns the accounts a queue entry reads or changes
+    '''
+    kind = entry[0]
+    if kind == _PLAIN:
+        operation = entry[2]
+        if type(operation) is Transfer:
+            return operation.source_account_id, operation.target_account_id
+        if type(operation) is MergeAccounts:
+            return operation.account_id_1, operation.account_id_2
+        return (operation.account_id,)
+    if kind == _TOP:
+        return ()
+    return (entry[-2],) if kind == _CREDIT or kind == _WITHDRAW else (entry[-1],)
+
+def _is_barrier(entry: tuple) -> bool:
+    '''
+    returns True if an entry can only run once every earlier entry ran, because it reads the whole shard or
+    moves future cashback between accounts
+    '''
+    kind = entry[0]
+    if kind == _PLAIN:
+        operation = entry[2]
+        # balances after the current time would include cashback paid out by later operations
+        return type(operation) is MergeAccounts or (type(operation) is GetBalance and operation.time_at > operation.timestamp)
+    return kind == _TOP or kind == _DETACH or kind == _ABSORB
+
+class _ShardWorker:
+    """
+    Runs the queue of one shard, deferring entries that wait for the outcome of another shard
+
+    Only the accounts of a waiting entry are held back: later entries touching other accounts run right away,
+    since transactions are recorded at their own timestamp and the ledgers accept backdated rows. Entries that
+    read the whole shard or move cashback between accounts wait for every earlier entry.
+    """
+
+    def __init__(self):
+        self.engine = ShardEngine()
+        self.queue = [] # entries that have not run yet, in timestamp order
+        self.outcomes = {} # ticket : outcome of the other half of a transfer or merge
+
+    def run(self, entries: list, outcomes: dict) -> tuple[list, dict, bool]:
+        '''
+        runs every queue entry that doesn't wait for an outcome that is not known yet
+
+        Returns:
+        ---------
+        (tuple): ([(index, result)] of the operations that ran, {ticket: outcome} of the halves that ran, True if waiting)
+        '''
+        self.queue.extend((_PLAIN, entry[1], CODES[entry[2]]._make(entry[3])) if entry[0] == _PLAIN else entry for entry in entries)
+        self.outcomes.update(outcomes)
+        engine = self.engine
+        results = []
+        produced = {}
+        deferred = []
+        held = set() # accounts of deferred entries
+        barrier = False # True once a barrier was deferred, every later entry waits for it
+        plain = [] # plain entries that are ready, applied as one batch before the next other entry
+
+        for entry in self.queue:
+            kind = entry[0]
+            accounts = _accounts(entry)
+            if barrier or not held.isdisjoint(accounts) or (deferred and _is_barrier(entry)) or (
+                    (kind == _CREDIT or kind == _ABSORB) and entry[1] not in self.outcomes):
+                deferred.append(entry)
+                held.update(accounts)
+                barrier = barrier or _is_barrier(entry)
+                continue
+
+            if kind == _PLAIN:
+                plain.append(entry)
+                continue
+
+            if plain:
+                results.extend(zip([index for _, index, _ in plain], engine.execute_batch([operation for _, _, operation in plain])))
+                plain.clear()
+
+            if kind == _CREDIT or kind == _ABSORB:
+                outcome = self.outcomes.pop(entry[1])
+                if kind == _ABSORB:
+                    engine.absorb(*entry[2:], *outcome)
+                elif outcome:
+                    engine.credit(*entry[2:])
+            elif kind == _WITHDRAW:
+                balance = engine.withdraw(*entry[3:])
+                results.append((entry[1], balance))
+                produced[entry[2]] = balance is not None
+            elif kind == _DETACH:
+                produced[entry[1]] = engine.detach(*entry[2:])
+            elif kind == _TOP:
+                results.append((entry[1], engine.top(entry[2])))
+
+        if plain:
+            results.extend(zip([index for _, index, _ in plain], engine.execute_batch([operation for _, _, operation in plain])))
+
+        self.queue = deferred
+        return results, produced, bool(deferred)
+
+def _serve(connection):
+    '''
+    main loop of a shard worker process
+    '''
+    worker = _ShardWorker()
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        connection.send(worker.run(*message))
+    connection.close()
+
+class ShardedBankingSystem(BankingSystem):
+    """
+    Banking system partitioning accounts by hash across a pool of worker processes, one engine per worker
+
+    Operations on a single account go straight to the shard owning the account, so batches of them run on all
+    workers in parallel. Transfers and merges between shards run as two halves on the two shards: the second
+    half waits in the queue of its shard until the coordinator passes on the outcome of the first half. Every
+    half waits only for halves at earlier timestamps, so all queues always make progress. top_spenders is
+    answered by a k-way merge of the top n lists of every shard.
+
+    The coordinator keeps the account and payment metadata itself, so payment ids are numbered across all shards
+    in the same order as with a single engine and payment status never needs a round trip to a worker.
+
+    Attributes
+    ----------
+    workers : int
+        Number of worker processes, every worker holds one shard
+    live : set
+        Stores the account_id of every account that exists and was not merged away
+    account_nodes: dict
+        Stores the node of the current account with a given account_id, every created account gets a new node
+    node_parents: array
+        Stores the node every node was merged into, or the node itself if it was not merged
+    node_accounts: list
+        Stores the account_id of every node
+    node_children: dict
+        Stores the nodes that were merged directly into a node
+    merged: dict
+        Stores the timestamp at which an account was merged into another account
+    payments: PaymentRegistry
+        Stores a record of every payment and the account node that made it
+    """
+
+    def __init__(self, workers: int = 4):
+        super(BankingSystem, self).__init__
+        self.workers = workers
+        self.live = set()
+        self.account_nodes = {} # account_id : node
+        self.node_parents = array('q') # node : node it was merged into
+        self.node_accounts = [] # node : account_id
+        self.node_children = {} # node : [nodes merged into it]
+        self.merged = {} # account_id : merge timestamp
+        self.payments = PaymentRegistry()
+        self._shards = {} # account_id : shard
+
+        self._connections = []
+        self._processes = []
+        for shard in range(workers):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve, args=(worker_connection,), name=f'shard-{shard}', daemon=True)
+            process.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+    def close(self):
+        '''
+        stops the worker processes
+        '''
+        for connection in self._connections:
+            connection.send(None)
+            connection.close()
+        for process in self._processes:
+            process.join()
+        self._connections.clear()
+        self._processes.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def shard(self, account_id: str) -> int:
+        '''
+        returns the shard owning account_id, the hash is stable across processes and runs
+        '''
+        try:
+            return self._shards[account_id]
+        except KeyError:
+            shard = self._shards[account_id] = zlib.crc32(account_id.encode()) % self.workers
+            return shard
+
+    def create_account(self, timestamp: int, account_id: str) -> bool:
+        return self.execute_batch([CreateAccount(timestamp, account_id)])[0]
+
+    def deposit(self, timestamp: int, account_id: str, amount: int) -> int | None:
+        return self.execute_batch([Deposit(timestamp, account_id, amount)])[0]
+
+    def transfer(self, timestamp: int, source_account_id: str, target_account_id: str, amount: int) -> int | None:
+        return self.execute_batch([Transfer(timestamp, source_account_id, target_account_id, amount)])[0]
+
+    def top_spenders(self, timestamp: int, n: int) -> list[str]:
+        return self.execute_batch([TopSpenders(timestamp, n)])[0]
+
+    def pay(self, timestamp: int, account_id: str, amount: int) -> str | None:
+        return self.execute_batch([Pay(timestamp, account_id, amount)])[0]
+
+    def get_payment_status(self, timestamp: int, account_id: str, payment: str) -> str | None:
+        return self.execute_batch([GetPaymentStatus(timestamp, account_id, payment)])[0]
+
+    def merge_accounts(self, timestamp: int, account_id_1: str, account_id_2: str) -> bool:
+        return self.execute_batch([MergeAccounts(timestamp, account_id_1, account_id_2)])[0]
+
+    def get_balance(self, timestamp: int, account_id: str, time_at: int) -> int | None:
+        return self.execute_batch([GetBalance(timestamp, account_id, time_at)])[0]
+
+    def list_payments(self, account_id: str, since: int, until: int) -> list[str] | None:
+        '''
+        returns the payments of an account between two timestamps, including payments of accounts merged into it
+
+        Parameters:
+        ----------
+        account_id (str): unique account identifier
+        since (int): earliest timestamp of a returned payment
+        until (int): latest timestamp of a returned payment
+
+        Returns:
+        ---------
+        (list): [payment ids] in the order the payments were made
+        None: the account doesn't exist
+        '''
+        if account_id not in self.account_nodes or account_id in self.merged:
+            return None
+
+        nodes = [self.account_nodes[account_id]]
+        for node in nodes:
+            nodes.extend(self.node_children.get(node, ()))
+
+        ordinals = heapq.merge(*(self.payments.node_payments(node, since, until) for node in nodes))
+        return [f"payment{ordinal}" for ordinal in ordinals]
+
+    def execute_batch(self, operations: list) -> list:
+        '''
+        applies a batch of operations in timestamp order, with the same results as a single engine
+
+        Parameters:
+        ----------
+        operations (list): operations from the operations module, e.g. [Deposit(1, 'account1', 100)]
+
+        Returns:
+        ---------
+        (list): the result of every operation, in the order the operations were given
+        '''
+        # sorting is stable, so operations at the same timestamp keep their order
+        order = sorted(range(len(operations)), key=lambda i: operations[i].timestamp)
+        results = [None] * len(operations)
+        queues = [[] for _ in range(self.workers)]
+        consumers = {} # ticket : shard waiting for the outcome of the ticket
+
+        # route every operation, whether accounts exist only depends on creates and merges so it is known up front
+        for i in order:
+            operation = operations[i]
+            kind = type(operation)
+
+            if kind is CreateAccount:
+                self.live.add(operation.account_id)
+                queues[self.shard(operation.account_id)].append((_PLAIN, i, CODE_OF[kind], tuple(operation)))
+
+            elif kind is Deposit or kind is Pay or kind is GetBalance:
+                queues[self.shard(operation.account_id)].append((_PLAIN, i, CODE_OF[kind], tuple(operation)))
+
+            elif kind is Transfer:
+                timestamp, source_account_id, target_account_id, amount = operation
+                source_shard = self.shard(source_account_id)
+                target_shard = self.shard(target_account_id)
+                if source_shard == target_shard:
+                    queues[source_shard].append((_PLAIN, i, CODE_OF[kind], tuple(operation)))
+                elif source_account_id in self.live and target_account_id in self.live:
+                    queues[source_shard].append((_WITHDRAW, i, i, timestamp, source_account_id, amount))
+                    queues[target_shard].append((_CREDIT, i, timestamp, target_account_id, amount))
+                    consumers[i] = target_shard
+
+            elif kind is MergeAccounts:
+                timestamp, account_id_1, account_id_2 = operation
+                if account_id_1 == account_id_2 or account_id_1 not in self.live or account_id_2 not in self.live:
+                    results[i] = False
+                    continue
+
+                self.live.discard(account_id_2)
+                results[i] = True
+                shard_1 = self.shard(account_id_1)
+                shard_2 = self.shard(account_id_2)
+                if shard_1 == shard_2:
+                    queues[shard_1].append((_PLAIN, i, CODE_OF[kind], tuple(operation)))
+                else:
+                    queues[shard_2].append((_DETACH, i, timestamp, account_id_2))
+                    queues[shard_1].append((_ABSORB, i, timestamp, account_id_1))
+                    consumers[i] = shard_1
+
+            elif kind is TopSpenders:
+                results[i] = []
+                for queue in queues:
+                    queue.append((_TOP, i, operation.n))
+
+        self._run(queues, consumers, results)
+
+        # settle the metadata in timestamp order, payments are numbered across shards here
+        for i in order:
+            operation = operations[i]
+            kind = type(operation)
+
+            if kind is CreateAccount and results[i]:
+                node = len(self.node_accounts)
+                self.account_nodes[operation.account_id] = node
+                self.node_parents.append(node)
+                self.node_accounts.append(operation.account_id)
+                self.merged.pop(operation.account_id, None)
+
+            elif kind is Pay and results[i] is not None:
+                results[i] = f"payment{self.payments.add(operation.timestamp, self.account_nodes[operation.account_id])}"
+
+            elif kind is MergeAccounts and results[i]:
+                timestamp, account_id_1, account_id_2 = operation
+                node_1 = self.account_nodes[account_id_1]
+                node_2 = self.account_nodes[account_id_2]
+                self.node_parents[node_2] = node_1
+                self.node_children.setdefault(node_1, []).append(node_2)
+                self.merged[account_id_2] = timestamp
+
+            elif kind is GetPaymentStatus:
+                results[i] = self._payment_status(*operation)
+
+            elif kind is TopSpenders:
+                top = heapq.merge(*results[i], key=lambda entry: (-entry[1], entry[0]))
+                results[i] = [f"{account_id}({total_spend})" for account_id, total_spend in islice(top, operation.n)]
+
+        return results
+
+    def _run(self, queues: list[list], consumers: dict, results: list):
+        '''
+        runs the queues of every shard in parallel, passing on outcomes until no shard is waiting
+        '''
+        waiting = {} # shard : outcomes to send it
+        for shard, queue in enumerate(queues):
+            if queue:
+                waiting[shard] = {}
+
+        entries = queues
+        while waiting:
+            for shard, outcomes in waiting.items():
+                self._connections[shard].send((entries[shard], outcomes))
+
+            running = list(waiting)
+            waiting = {}
+            produced = {}
+            for shard in running:
+                shard_results, shard_produced, blocked = self._connections[shard].recv()
+                for index, result in shard_results:
+                    if isinstance(results[index], list):
+                        results[index].append(result)
+                    else:
+                        results[index] = result
+                produced.update(shard_produced)
+                if blocked:
+                    waiting[shard] = {}
+
+            for ticket, outcome in produced.items():
+                waiting.setdefault(consumers[ticket], {})[ticket] = outcome
+            entries = [[] for _ in queues]
+
+    def _payment_status(self, timestamp: int, account_id: str, payment: str) -> str | None:
+        '''
+        returns the status of a payment, like get_payment_status of a single engine
+        '''
+        if account_id not in self.account_nodes:
+            return None
+
+        ordinal = self.payments.ordinal(payment)
+        if ordinal is None or self.node_accounts[self._find(self.payments.nodes[ordinal - 1])] != account_id:
+            return None
+
+        return self.payments.status(ordinal, timestamp)
+
+    def _find(self, node: int) -> int:
+        '''
+        returns the node of the account that node has been merged into, following merges of merged accounts
+        '''
+        parents = self.node_parents
+        root = node
+        while parents[root] != root:
+            root = parents[root]
+
+        # path compression, point every node on the way straight at the root
+        while parents[node] != root:
+            parents[node], node = root, parents[node]
+
+        return root
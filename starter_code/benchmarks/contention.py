@@ -0,0 +1,105 @@
+import argparse
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from banking_system_impl_columnar import BankingSystemImpl
+from banking_system_concurrent import ConcurrentBankingSystemImpl
+
+class GloballyLockedBankingSystem:
+    """
+    Columnar banking system behind a single lock, the baseline the striped engine is compared with
+    """
+
+    def __init__(self):
+        self.system = BankingSystemImpl()
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        method = getattr(self.system, name)
+
+        def locked(*args):
+            with self.lock:
+                return method(*args)
+        return locked
+
+def zipf_weights(accounts: int, exponent: float) -> list[float]:
+    '''
+    returns the cumulative Zipf weights of accounts, account i is picked with probability proportional to 1 / (i + 1) ** exponent
+    '''
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(accounts)))
+
+def workload(account_ids: list[str], weights: list[float], count: int, read_ratio: float, seed: int) -> list[tuple]:
+    '''
+    builds a stream of (method, *arguments) calls on accounts drawn from the Zipf distribution, timestamps are filled in when a call is made
+    '''
+    rng = random.Random(seed)
+    picks = rng.choices(account_ids, cum_weights=weights, k=count * 2)
+    calls = []
+    for i in range(count):
+        account_id, other_account_id = picks[2 * i], picks[2 * i + 1]
+        draw = rng.random()
+        if draw < read_ratio:
+            calls.append(('get_balance', account_id))
+        elif draw < read_ratio + (1 - read_ratio) * 0.4:
+            calls.append(('deposit', account_id, rng.randrange(1, 100)))
+        elif draw < read_ratio + (1 - read_ratio) * 0.7:
+            calls.append(('pay', account_id, rng.randrange(1, 100)))
+        else:
+            calls.append(('transfer', account_id, other_account_id, rng.randrange(1, 100)))
+    return calls
+
+def measure(system, account_ids: list[str], streams: list[list[tuple]]) -> float:
+    '''
+    runs every stream on its own thread against system and returns the total throughput in calls per second
+    '''
+    for account_id in account_ids:
+        system.create_account(1, account_id)
+        system.deposit(2, account_id, 10 ** 9)
+    # a shared clock keeps timestamps increasing across threads, as they would be for a live service
+    clock = itertools.count(3)
+
+    def run(stream):
+        for method, *arguments in stream:
+            timestamp = next(clock)
+            if method == 'get_balance':
+                system.get_balance(timestamp, arguments[0], timestamp)
+            else:
+                getattr(system, method)(timestamp, *arguments)
+
+    threads = [threading.Thread(target=run, args=(stream,)) for stream in streams]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(map(len, streams)) / (time.perf_counter() - start)
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Compare the striped-lock engine with a single global lock under Zipf-distributed account popularity.')
+    parser.add_argument('--accounts', type=int, default=10000)
+    parser.add_argument('--operations', type=int, default=200000, help='total number of calls, split evenly between the threads')
+    parser.add_argument('--exponent', type=float, default=1.1, help='Zipf exponent, higher values concentrate calls on fewer hot accounts')
+    parser.add_argument('--read-ratio', type=float, default=0.5, help='share of get_balance calls')
+    parser.add_argument('--stripes', type=int, default=64)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    account_ids = [f"account{i}" for i in range(args.accounts)]
+    weights = zipf_weights(args.accounts, args.exponent)
+    gil = 'enabled' if getattr(sys, '_is_gil_enabled', lambda: True)() else 'disabled'
+    print(f"{os.cpu_count()} cpus, GIL {gil}, {args.accounts} accounts, {args.operations} calls, zipf exponent {args.exponent}, {args.stripes} stripes")
+    print(f"{'threads':<10}{'global lock':>14}{'striped':>14}{'ratio':>8}")
+    for threads in args.threads:
+        streams = [workload(account_ids, weights, args.operations // threads, args.read_ratio, args.seed + i) for i in range(threads)]
+        baseline = measure(GloballyLockedBankingSystem(), account_ids, streams)
+        striped = measure(ConcurrentBankingSystemImpl(args.stripes), account_ids, streams)
+        print(f"{threads:<10}{baseline:>14.0f}{striped:>14.0f}{striped / baseline:>8.2f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import argparse
+import gc
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import latency
+import operations
+from benchmarks.suite import load_engine
+from benchmarks.workloads import generate
+
+ENGINES = ('banking_system_impl_lvl_4', 'banking_system_impl_columnar')
+
+def run(engine: type, setup: list, stream: list, sample_every: int = 0) -> float:
+    '''
+    applies setup and then stream to a new system of engine and returns the seconds the stream took, with the
+    methods instrumented by latency.instrument if sample_every is positive
+    '''
+    system = engine()
+    for operation in setup:
+        operations.apply(system, operation)
+    if sample_every > 0:
+        latency.instrument(system, sample_every=sample_every)
+    # methods are looked up after instrumenting, so the instrumented runs call the wrappers
+    calls = [(getattr(system, operations.METHODS[type(operation)]), operation) for operation in stream]
+    gc.collect()
+    start = time.perf_counter()
+    for call, arguments in calls:
+        call(*arguments)
+    elapsed = time.perf_counter() - start
+    latency.uninstrument(system)
+    return elapsed
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Measure how much slower a workload runs with the methods of the banking system instrumented by latency.instrument.')
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES), help='modules providing BankingSystemImpl, or module:Class (default: %(default)s)')
+    parser.add_argument('--mix', default='balanced')
+    parser.add_argument('--distribution', default='zipf')
+    parser.add_argument('--shape', default='many_accounts')
+    parser.add_argument('--operations', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=25, help='interleaved runs with and without instrumentation, the best of each is compared (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--sample-every', type=int, default=16, help='one call in this many is timed, 1 to time every call (default: %(default)s)')
+    parser.add_argument('--max-overhead', type=float, default=0.05, help='relative slowdown above which the benchmark fails (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    workload = generate(args.mix, args.distribution, args.shape, args.operations, args.seed)
+    print(f"{workload.name}, {args.operations} operations, best of {args.repeat} runs")
+    print(f"{'engine':<36}{'plain us/op':>14}{'timed us/op':>14}{'overhead':>10}")
+    failed = False
+    for spec in args.engines:
+        engine = load_engine(spec)
+        plain, timed = [], []
+        # runs alternate, so a slow phase of the machine hits both sides alike
+        for _ in range(args.repeat):
+            plain.append(run(engine, workload.setup, workload.operations))
+            timed.append(run(engine, workload.setup, workload.operations, args.sample_every))
+        overhead = min(timed) / min(plain) - 1
+        failed = failed or overhead > args.max_overhead
+        print(f"{spec:<36}{min(plain) / args.operations * 1e6:>14.2f}{min(timed) / args.operations * 1e6:>14.2f}{overhead:>10.1%}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
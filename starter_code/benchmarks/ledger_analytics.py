@@ -0,0 +1,102 @@
+import argparse
+import os
+import random
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from analytics import LedgerFrame, DAY
+from banking_system_impl_columnar import BankingSystemImpl
+from ledger import DEPOSIT, TRANSFER_OUT, TRANSFER_IN, PAYMENT, CASHBACK
+
+def populate(accounts: int, operations: int, seed: int) -> tuple[BankingSystemImpl, int]:
+    '''
+    builds a columnar system with a random mix of deposits, transfers and payments spread over several days
+    '''
+    rng = random.Random(seed)
+    system = BankingSystemImpl()
+    account_ids = [f"account{i}" for i in range(accounts)]
+    for account_id in account_ids:
+        system.create_account(1, account_id)
+        system.deposit(2, account_id, 10 ** 9)
+    # about 20 days of calls
+    step = max(1, 20 * DAY // operations)
+    timestamp = 3
+    for _ in range(operations):
+        timestamp += step
+        draw = rng.random()
+        account_id = rng.choice(account_ids)
+        if draw < 0.4:
+            system.deposit(timestamp, account_id, rng.randrange(1, 1000))
+        elif draw < 0.7:
+            system.pay(timestamp, account_id, rng.randrange(1, 1000))
+        else:
+            system.transfer(timestamp, account_id, rng.choice(account_ids), rng.randrange(1, 1000))
+    return system, timestamp
+
+def python_report(system: BankingSystemImpl) -> tuple[dict, list, dict]:
+    '''
+    computes the daily flows, payment sizes and cashback liabilities with Python loops over the ledgers
+    '''
+    flows = {} # (node, day) : [inflow, outflow, cashback, net]
+    payments = []
+    for node, ledger in enumerate(system.ledgers):
+        for timestamp, amount, kind in zip(ledger.timestamps, ledger.amounts, ledger.kinds):
+            flow = flows.get((node, timestamp // DAY))
+            if flow is None:
+                flow = flows[node, timestamp // DAY] = [0, 0, 0, 0]
+            if kind == DEPOSIT or kind == TRANSFER_IN:
+                flow[0] += amount
+            elif kind == TRANSFER_OUT or kind == PAYMENT:
+                flow[1] -= amount
+                if kind == PAYMENT:
+                    payments.append(-amount)
+            elif kind == CASHBACK:
+                flow[2] += amount
+            flow[3] += amount
+    liabilities = {}
+    for due_timestamp, ordinal, amount in system.cashback._heap:
+        node = system._find(system.payments.nodes[ordinal - 1])
+        liabilities[node] = liabilities.get(node, 0) + amount
+    return flows, payments, liabilities
+
+def numpy_report(frame: LedgerFrame) -> tuple:
+    '''
+    computes the same report with the vectorized kernels of LedgerFrame
+    '''
+    return frame.daily_flows(), frame.payment_histogram(20), frame.cashback_liabilities()
+
+def best_of(repeat: int, function, *arguments) -> float:
+    '''
+    returns the fastest of repeat runs of function, in seconds
+    '''
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*arguments)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Compare the vectorized ledger analytics with Python loops over the ledgers.')
+    parser.add_argument('--accounts', type=int, default=10000)
+    parser.add_argument('--operations', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    system, timestamp = populate(args.accounts, args.operations, args.seed)
+    start = time.perf_counter()
+    frame = LedgerFrame.from_system(system, timestamp)
+    export = time.perf_counter() - start
+
+    loops = best_of(args.repeat, python_report, system)
+    kernels = best_of(args.repeat, numpy_report, frame)
+    print(f"{args.accounts} accounts, {len(frame)} ledger rows")
+    print(f"{'python loops':<24}{loops * 1000:>10.1f} ms")
+    print(f"{'export':<24}{export * 1000:>10.1f} ms")
+    print(f"{'numpy kernels':<24}{kernels * 1000:>10.1f} ms{loops / kernels:>8.1f}x")
+    print(f"{'export + kernels':<24}{(export + kernels) * 1000:>10.1f} ms{loops / (export + kernels):>8.1f}x")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+import argparse
+import gc
+import itertools
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchmarks.suite import load_engine
+
+OPERATIONS = ('get_balance', 'deposit', 'transfer', 'pay', 'merge_accounts', 'top_spenders')
+
+# milliseconds between two operations, so long histories span several days and cashback is paid out along the way
+STEP = 1000
+
+def sizes(smallest: int, largest: int, per_decade: int) -> list[int]:
+    '''
+    returns geometrically spaced sizes from smallest to largest, per_decade of them for every factor of 10
+    '''
+    count = round(math.log10(largest / smallest) * per_decade)
+    return sorted({round(smallest * 10 ** (i / per_decade)) for i in range(count + 1)})
+
+def fit_exponent(points: list[tuple[int, float]]) -> float:
+    '''
+    returns the slope of the least squares line through (log size, log cost), the exponent k of cost ~ size ** k
+
+    Logarithmic and constant costs fit an exponent close to 0, linear costs an exponent close to 1.
+    '''
+    xs = [math.log(size) for size, cost in points]
+    ys = [math.log(cost) for size, cost in points]
+    mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+    spread = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread if spread else 0.0
+
+class Sweep:
+    """
+    Banking system grown step by step, with the cost of every operation measured at every size
+
+    Attributes
+    ----------
+    system : BankingSystem
+        Stores the system that is grown
+    clock : iterator
+        Stores the source of increasing timestamps
+    rng : Random
+        Stores the source of randomness of the sampled operations
+    size : int
+        Stores the current size, history events of the first account or number of accounts
+    """
+
+    def __init__(self, engine: type, seed: int):
+        self.system = engine()
+        self.clock = itertools.count(STEP, STEP)
+        self.rng = random.Random(seed)
+        self.size = 0
+        self._fresh = itertools.count() # numbers of the accounts that are created to be merged away
+
+    def grow(self, size: int):
+        '''
+        grows the system to size, implemented by every sweep
+        '''
+        raise NotImplementedError
+
+    def account(self) -> str:
+        '''
+        returns the account a sampled operation is applied to, implemented by every sweep
+        '''
+        raise NotImplementedError
+
+    def other(self) -> str:
+        '''
+        returns the account a sampled transfer goes to, implemented by every sweep
+        '''
+        raise NotImplementedError
+
+    def measure(self, operation: str, samples: int) -> float:
+        '''
+        returns the median cost of samples calls of operation in nanoseconds, preparation of a call is not timed
+        '''
+        system, clock, rng = self.system, time.perf_counter_ns, self.rng
+        costs = []
+        for _ in range(samples):
+            timestamp = next(self.clock)
+            account_id = self.account()
+            if operation == 'get_balance':
+                call, arguments = system.get_balance, (timestamp, account_id, rng.randrange(STEP, timestamp + 1))
+            elif operation == 'deposit':
+                call, arguments = system.deposit, (timestamp, account_id, 1)
+            elif operation == 'transfer':
+                call, arguments = system.transfer, (timestamp, account_id, self.other(), 1)
+            elif operation == 'pay':
+                call, arguments = system.pay, (timestamp, account_id, 1)
+            elif operation == 'merge_accounts':
+                # the merged account made a payment, so merges that walk the payments of every account show up
+                merged = f"fresh{next(self._fresh)}"
+                system.create_account(timestamp, merged)
+                system.deposit(timestamp, merged, 100)
+                system.pay(timestamp, merged, 50)
+                timestamp = next(self.clock)
+                call, arguments = system.merge_accounts, (timestamp, account_id, merged)
+            else:
+                # a payment in between changes the order of the spenders, so the leaderboard can't answer from a cache
+                system.pay(timestamp, account_id, 1)
+                call, arguments = system.top_spenders, (next(self.clock), 10)
+            started = clock()
+            call(*arguments)
+            costs.append(clock() - started)
+        return statistics.median(costs)
+
+class HistorySweep(Sweep):
+    """
+    Sweep over the number of history events of one account, every sampled operation is applied to that account
+    and transfers go to a second account
+    """
+
+    def __init__(self, engine: type, seed: int):
+        super().__init__(engine, seed)
+        for account_id in ('account0', 'account1'):
+            self.system.create_account(next(self.clock), account_id)
+            self.system.deposit(next(self.clock), account_id, 10 ** 12)
+        self.size = 2
+
+    def grow(self, size: int):
+        system = self.system
+        while self.size < size:
+            # every tenth event is a payment, so cashback keeps arriving in the history
+            timestamp = next(self.clock)
+            if self.size % 10:
+                system.deposit(timestamp, 'account0', 100)
+            else:
+                system.pay(timestamp, 'account0', 100)
+            self.size += 1
+
+    def account(self) -> str:
+        return 'account0'
+
+    def other(self) -> str:
+        return 'account1'
+
+class AccountSweep(Sweep):
+    """
+    Sweep over the number of accounts, every account has a short history and every tenth account made a payment
+    """
+
+    def grow(self, size: int):
+        system = self.system
+        while self.size < size:
+            account_id = f"account{self.size}"
+            timestamp = next(self.clock)
+            system.create_account(timestamp, account_id)
+            system.deposit(timestamp, account_id, 10 ** 12)
+            if self.size % 10 == 0:
+                system.pay(timestamp, account_id, 100)
+            self.size += 1
+
+    def account(self) -> str:
+        return f"account{self.rng.randrange(self.size)}"
+
+    def other(self) -> str:
+        return self.account()
+
+SWEEPS = {'history': HistorySweep, 'accounts': AccountSweep}
+
+def run_sweep(engine: type, sweep: str, points: list[int], samples: int, seed: int, progress=None) -> dict:
+    '''
+    grows a system through every size in points and measures every operation at each of them
+
+    Returns:
+    ---------
+    (dict): {operation: [[size, median cost in nanoseconds]]}
+    '''
+    grown = SWEEPS[sweep](engine, seed)
+    curves = {operation: [] for operation in OPERATIONS}
+    for size in points:
+        grown.grow(size)
+        gc.collect()
+        for operation in OPERATIONS:
+            curves[operation].append([size, grown.measure(operation, samples)])
+        if progress is not None:
+            progress(f"{sweep:<10}{size:>10}" + ''.join(f"{curves[operation][-1][1]:>16.0f}" for operation in OPERATIONS))
+    return curves
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Measure how the cost of every operation grows with history length and account count, and fail if one grows linearly.')
+    parser.add_argument('--engine', default='banking_system_impl_lvl_4', help='module providing BankingSystemImpl, or module:Class (default: %(default)s)')
+    parser.add_argument('--sweeps', nargs='+', choices=sorted(SWEEPS), default=['history', 'accounts'])
+    parser.add_argument('--min-history', type=int, default=10)
+    parser.add_argument('--max-history', type=int, default=10 ** 6)
+    parser.add_argument('--min-accounts', type=int, default=100)
+    # a million level 4 accounts take about 900 MB, ten million don't fit in the memory of a typical machine
+    parser.add_argument('--max-accounts', type=int, default=10 ** 6)
+    parser.add_argument('--per-decade', type=int, default=2, help='sizes measured for every factor of 10 (default: %(default)s)')
+    parser.add_argument('--samples', type=int, default=200, help='calls of every operation at every size, the median cost is kept (default: %(default)s)')
+    parser.add_argument('--fit-points', type=int, default=5, help='largest sizes the exponent is fitted over, constant overheads dominate the smallest ones (default: %(default)s)')
+    parser.add_argument('--max-exponent', type=float, default=0.5, help='fitted exponent above which an operation counts as linear (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='file the cost curves and exponents are written to as JSON')
+    args = parser.parse_args(argv)
+
+    engine = load_engine(args.engine)
+    ranges = {'history': (args.min_history, args.max_history), 'accounts': (args.min_accounts, args.max_accounts)}
+    print(f"{args.engine}, median cost of {args.samples} calls in nanoseconds")
+    print(f"{'sweep':<10}{'size':>10}" + ''.join(f"{operation:>16}" for operation in OPERATIONS))
+
+    report = {'engine': args.engine, 'sweeps': {}}
+    failures = []
+    for sweep in args.sweeps:
+        curves = run_sweep(engine, sweep, sizes(*ranges[sweep], args.per_decade), args.samples, args.seed, print)
+        exponents = {operation: round(fit_exponent(curve[-args.fit_points:]), 3) for operation, curve in curves.items()}
+        report['sweeps'][sweep] = {'curves': curves, 'exponents': exponents}
+        print(f"{'exponent':<20}" + ''.join(f"{exponents[operation]:>16.2f}" for operation in OPERATIONS))
+        failures += [f"{operation} grows with {sweep} as size ** {exponent:.2f}" for operation, exponent in exponents.items() if exponent > args.max_exponent]
+
+    if args.output is not None:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    for failure in failures:
+        print(f"linear: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+import operations
+from client import BankingClient
+
+def percentile(latencies: list[float], fraction: float) -> float:
+    '''
+    returns the latency below which fraction of the sorted latencies fall
+    '''
+    return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+async def load(clients: list[BankingClient], account_ids: list[str], rate: float, duration: float, clock, rng: random.Random) -> tuple[list[float], float]:
+    '''
+    sends requests at a fixed rate spread over the clients, without waiting for responses before sending the next
+
+    Latency is measured from the time a request was due to be sent, so a server that falls behind is charged
+    for the requests queued up behind it and not only for the ones it answered.
+
+    Returns:
+    ---------
+    (tuple): (sorted latencies in seconds, achieved requests per second)
+    '''
+    loop = asyncio.get_running_loop()
+    latencies = []
+    pending = []
+
+    async def request(client, operation, due):
+        await client.call(operation)
+        latencies.append(loop.time() - due)
+
+    count = int(rate * duration)
+    start = loop.time()
+    for i in range(count):
+        due = start + i / rate
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        timestamp = next(clock)
+        account_id = rng.choice(account_ids)
+        draw = rng.random()
+        if draw < 0.4:
+            operation = operations.GetBalance(timestamp, account_id, timestamp)
+        elif draw < 0.7:
+            operation = operations.Deposit(timestamp, account_id, rng.randrange(1, 100))
+        elif draw < 0.9:
+            operation = operations.Pay(timestamp, account_id, rng.randrange(1, 100))
+        else:
+            operation = operations.Transfer(timestamp, account_id, rng.choice(account_ids), rng.randrange(1, 100))
+        pending.append(asyncio.create_task(request(clients[i % len(clients)], operation, due)))
+    await asyncio.gather(*pending)
+    return sorted(latencies), count / (loop.time() - start)
+
+async def run(path: str, args) -> None:
+    clients = [await BankingClient.connect(path=path) for _ in range(args.connections)]
+    account_ids = [f"account{i}" for i in range(args.accounts)]
+    clock = itertools.count(1)
+    for account_id in account_ids:
+        await clients[0].create_account(next(clock), account_id)
+    await asyncio.gather(*(clients[0].deposit(next(clock), account_id, 10 ** 9) for account_id in account_ids))
+
+    rng = random.Random(args.seed)
+    print(f"{'target/sec':>12}{'achieved/sec':>14}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for rate in args.rates:
+        latencies, achieved = await load(clients, account_ids, rate, args.duration, clock, rng)
+        print(f"{rate:>12.0f}{achieved:>14.0f}{percentile(latencies, 0.5) * 1000:>10.2f}"
+              f"{percentile(latencies, 0.99) * 1000:>10.2f}{latencies[-1] * 1000:>10.2f}")
+    for client in clients:
+        await client.close()
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Measure the latency of the banking server at increasing request rates.')
+    parser.add_argument('--rates', type=float, nargs='+', default=[1000, 5000, 10000, 20000, 40000])
+    parser.add_argument('--duration', type=float, default=2.0, help='seconds of load at every rate')
+    parser.add_argument('--connections', type=int, default=4)
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--max-batch', type=int, default=1024)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bank.sock')
+        # the server runs in its own process so the load generator doesn't share its event loop
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'server.py'), '--unix', path,
+                                   '--max-batch', str(args.max_batch)], cwd=ROOT)
+        try:
+            deadline = time.monotonic() + 10
+            while not os.path.exists(path):
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("banking server did not start")
+                time.sleep(0.05)
+            print(f"{os.cpu_count()} cpus, {args.connections} connections, {args.accounts} accounts, {args.duration:.0f}s per rate")
+            asyncio.run(run(path, args))
+        finally:
+            server.terminate()
+            server.wait()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
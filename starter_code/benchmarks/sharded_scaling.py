@@ -0,0 +1,71 @@
+import argparse
+import os
+import random
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import operations
+from banking_system_impl_columnar import BankingSystemImpl
+from banking_system_sharded import ShardedBankingSystem
+
+def workload(accounts: int, count: int, transfer_ratio: float, seed: int) -> tuple[list, list]:
+    '''
+    builds the operations creating every account and a random stream of deposits, payments, transfers and balance reads
+
+    Returns:
+    ---------
+    (tuple): (setup operations, measured operations)
+    '''
+    rng = random.Random(seed)
+    account_ids = [f"account{i}" for i in range(accounts)]
+    setup = [operations.CreateAccount(1, account_id) for account_id in account_ids]
+    setup += [operations.Deposit(2, account_id, 1000000) for account_id in account_ids]
+
+    stream = []
+    for timestamp in range(3, count + 3):
+        account_id = rng.choice(account_ids)
+        draw = rng.random()
+        if draw < transfer_ratio:
+            stream.append(operations.Transfer(timestamp, account_id, rng.choice(account_ids), rng.randrange(1, 100)))
+        elif draw < transfer_ratio + (1 - transfer_ratio) * 0.5:
+            stream.append(operations.Deposit(timestamp, account_id, rng.randrange(1, 100)))
+        elif draw < transfer_ratio + (1 - transfer_ratio) * 0.8:
+            stream.append(operations.Pay(timestamp, account_id, rng.randrange(1, 100)))
+        else:
+            stream.append(operations.GetBalance(timestamp, account_id, timestamp))
+    return setup, stream
+
+def measure(system, setup: list, stream: list, batch_size: int) -> float:
+    '''
+    returns the throughput of system over stream in operations per second
+    '''
+    system.execute_batch(setup)
+    start = time.perf_counter()
+    for i in range(0, len(stream), batch_size):
+        system.execute_batch(stream[i:i + batch_size])
+    return len(stream) / (time.perf_counter() - start)
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Measure how the sharded engine scales with the number of worker processes.')
+    parser.add_argument('--accounts', type=int, default=10000)
+    parser.add_argument('--operations', type=int, default=200000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--transfer-ratio', type=float, default=0.2, help='share of transfers in the stream, most of them cross shards')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    setup, stream = workload(args.accounts, args.operations, args.transfer_ratio, args.seed)
+    print(f"{os.cpu_count()} cpus, {args.accounts} accounts, {args.operations} operations, batches of {args.batch_size}")
+
+    baseline = measure(BankingSystemImpl(), setup, stream, args.batch_size)
+    print(f"{'engine':<20}{'ops/sec':>12}{'speedup':>10}")
+    print(f"{'single engine':<20}{baseline:>12.0f}{1:>10.2f}")
+    for workers in args.workers:
+        with ShardedBankingSystem(workers) as system:
+            throughput = measure(system, setup, stream, args.batch_size)
+        print(f"{f'{workers} workers':<20}{throughput:>12.0f}{throughput / baseline:>10.2f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
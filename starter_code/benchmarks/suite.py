@@ -0,0 +1,252 @@
+import argparse
+import gc
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import operations
+from banking_system import BankingSystem
+from benchmarks.workloads import DISTRIBUTIONS, MIXES, SHAPES, generate
+
+# the four level implementations and the optimized engine, "module" or "module:Class"
+ENGINES = (
+    'banking_system_impl',
+    'banking_system_impl_lvl_2',
+    'banking_system_impl_lvl_3',
+    'banking_system_impl_lvl_4',
+    'banking_system_impl_columnar',
+)
+
+PERCENTILES = (50, 90, 99)
+
+# methods called fewer times than this in a workload are not compared on p99 latency, which is then just the slowest call
+MIN_CALLS = 100
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+def load_engine(spec: str) -> type:
+    '''
+    returns the banking system class of an engine, given as "module" for module.BankingSystemImpl or "module:Class"
+    '''
+    module, _, name = spec.partition(':')
+    return getattr(importlib.import_module(module), name or 'BankingSystemImpl')
+
+def supported_methods(engine: type) -> set[str]:
+    '''
+    returns the BankingSystem methods an engine implements, lower levels keep the default implementation of the rest
+    '''
+    return {method for method in operations.OPERATIONS if getattr(engine, method) is not getattr(BankingSystem, method)}
+
+def percentile(latencies: list[int], fraction: float) -> int:
+    '''
+    returns the latency below which fraction of the sorted latencies fall
+    '''
+    return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+def _timed_run(engine: type, setup: list, stream: list) -> tuple[float, dict]:
+    '''
+    applies setup and then stream to a new system of engine, timing every call of stream
+
+    Returns:
+    ---------
+    (tuple): (seconds the stream took, {method : sorted nanoseconds of every call})
+    '''
+    system = engine()
+    for operation in setup:
+        operations.apply(system, operation)
+
+    latencies = {} # method : [nanoseconds of every call]
+    calls = [(operations.METHODS[type(operation)], getattr(system, operations.METHODS[type(operation)]), operation) for operation in stream]
+    clock = time.perf_counter_ns
+    gc.collect()
+    start = clock()
+    for method, call, arguments in calls:
+        started = clock()
+        call(*arguments)
+        latencies.setdefault(method, []).append(clock() - started)
+    elapsed = (clock() - start) / 1e9
+
+    for samples in latencies.values():
+        samples.sort()
+    return elapsed, latencies
+
+def measure(engine: type, workload, memory: bool = True, repeat: int = 3) -> dict:
+    '''
+    runs a workload against new systems of engine and returns its throughput, latencies and peak memory
+
+    Operations the engine doesn't implement are left out of the workload. The workload is run repeat times and
+    the best throughput and the lowest value of every latency percentile are kept, which filters out most of the
+    noise of other processes. Those runs don't use tracemalloc, which slows every allocation down, peak memory
+    is taken from one more traced run.
+
+    Parameters:
+    ----------
+    engine (type): banking system class
+    workload (Workload): workload from benchmarks.workloads
+    memory (bool): if False, the traced run is skipped and peak memory is not reported
+    repeat (int): number of timed runs
+
+    Returns:
+    ---------
+    (dict): {'operations', 'ops_per_sec', 'peak_memory_bytes', 'skipped', 'methods': {method: {'count', 'p50_us', 'p90_us', 'p99_us', 'max_us'}}}
+    '''
+    supported = supported_methods(engine)
+    setup = [operation for operation in workload.setup if operations.METHODS[type(operation)] in supported]
+    stream = [operation for operation in workload.operations if operations.METHODS[type(operation)] in supported]
+    skipped = sorted({operations.METHODS[type(operation)] for operation in workload.operations} - supported)
+
+    runs = [_timed_run(engine, setup, stream) for _ in range(max(repeat, 1))]
+    elapsed = min(elapsed for elapsed, latencies in runs)
+
+    methods = {}
+    for method in sorted(runs[0][1]):
+        samples = [latencies[method] for elapsed, latencies in runs]
+        methods[method] = {'count': len(samples[0])}
+        for value in PERCENTILES:
+            methods[method][f'p{value}_us'] = round(min(percentile(run, value / 100) for run in samples) / 1000, 3)
+        methods[method]['max_us'] = round(min(run[-1] for run in samples) / 1000, 3)
+
+    peak = None
+    if memory:
+        del runs
+        gc.collect()
+        tracemalloc.start()
+        system = engine()
+        for operation in setup + stream:
+            operations.apply(system, operation)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        'operations': len(stream),
+        'ops_per_sec': round(len(stream) / elapsed, 1) if elapsed else None,
+        'peak_memory_bytes': peak,
+        'skipped': skipped,
+        'methods': methods,
+    }
+
+def run_suite(engines: list[str], workloads: list, memory: bool = True, repeat: int = 3, progress=None) -> dict:
+    '''
+    measures every engine on every workload
+
+    Parameters:
+    ----------
+    engines (list): engine specs, see load_engine
+    workloads (list): workloads from benchmarks.workloads
+    memory (bool): whether peak memory is measured
+    repeat (int): number of timed runs of every measurement, see measure
+    progress (callable): called with a line of text after every measurement
+
+    Returns:
+    ---------
+    (dict): the JSON report, {'environment': {...}, 'workloads': {workload name: {engine: result of measure}}}
+    '''
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'workloads': {},
+    }
+    classes = {spec: load_engine(spec) for spec in engines}
+    for workload in workloads:
+        results = report['workloads'][workload.name] = {}
+        for spec, engine in classes.items():
+            results[spec] = measure(engine, workload, memory, repeat)
+            if progress is not None:
+                progress(f"{workload.name:<36}{spec:<36}{results[spec]['ops_per_sec']:>12.0f} ops/sec")
+    return report
+
+def compare(report: dict, baseline: dict, tolerance: float, latency_tolerance: float) -> list[dict]:
+    '''
+    compares a report with a baseline report and returns every measurement that got worse by more than its tolerance
+
+    Throughput, peak memory and the p99 latency of every method called at least MIN_CALLS times are compared for
+    every (workload, engine) pair both reports contain, measurements that only one of them has are ignored.
+
+    Parameters:
+    ----------
+    report (dict): report returned by run_suite
+    baseline (dict): earlier report to compare with
+    tolerance (float): allowed relative change of throughput and peak memory, e.g. 0.1 for 10%
+    latency_tolerance (float): allowed relative change of p99 latencies, which are noisier than throughput
+
+    Returns:
+    ---------
+    (list): [{'workload', 'engine', 'metric', 'baseline', 'current', 'change'}] of every regression
+    '''
+    regressions = []
+
+    def check(workload, engine, metric, old, new, higher_is_better, tolerance=tolerance):
+        if not old or new is None:
+            return
+        change = (new - old) / old
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append({'workload': workload, 'engine': engine, 'metric': metric, 'baseline': old, 'current': new, 'change': round(change, 4)})
+
+    for workload, engines in report['workloads'].items():
+        for engine, result in engines.items():
+            old = baseline.get('workloads', {}).get(workload, {}).get(engine)
+            if old is None:
+                continue
+            check(workload, engine, 'ops_per_sec', old['ops_per_sec'], result['ops_per_sec'], True)
+            check(workload, engine, 'peak_memory_bytes', old.get('peak_memory_bytes'), result['peak_memory_bytes'], False)
+            for method, latencies in result['methods'].items():
+                if method in old['methods'] and latencies['count'] >= MIN_CALLS:
+                    check(workload, engine, f'{method}.p99_us', old['methods'][method]['p99_us'], latencies['p99_us'], False, latency_tolerance)
+    return regressions
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the banking system engines on seeded synthetic workloads and compare the results with a stored baseline.')
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES), help='modules providing BankingSystemImpl, or module:Class (default: every level and the columnar engine)')
+    parser.add_argument('--mixes', nargs='+', choices=sorted(MIXES), default=sorted(MIXES))
+    parser.add_argument('--distributions', nargs='+', choices=DISTRIBUTIONS, default=list(DISTRIBUTIONS))
+    parser.add_argument('--shapes', nargs='+', choices=sorted(SHAPES), default=sorted(SHAPES))
+    parser.add_argument('--operations', type=int, default=20000, help='measured operations per workload')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs of every measurement, the best one is kept (default: %(default)s)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced run that measures peak memory')
+    parser.add_argument('--output', help='file the JSON report is written to, by default it is printed')
+    parser.add_argument('--baseline', default=BASELINE, help='report to compare with, ignored if the file does not exist (default: %(default)s)')
+    parser.add_argument('--update-baseline', action='store_true', help='store this report as the new baseline instead of comparing with it')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='relative drop of throughput or growth of peak memory that counts as a regression (default: %(default)s)')
+    parser.add_argument('--latency-tolerance', type=float, default=0.25, help='relative growth of p99 latency that counts as a regression (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    workloads = [generate(mix, distribution, shape, args.operations, args.seed) for mix in args.mixes for distribution in args.distributions for shape in args.shapes]
+    report = run_suite(args.engines, workloads, not args.no_memory, args.repeat, lambda line: print(line, file=sys.stderr))
+    report['settings'] = {'operations': args.operations, 'seed': args.seed}
+
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as baseline:
+            baseline.write(text + '\n')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as baseline:
+        baseline = json.load(baseline)
+    if baseline.get('settings') != report['settings']:
+        print(f"baseline {args.baseline} was measured with {baseline.get('settings')}, not {report['settings']}, skipping the comparison", file=sys.stderr)
+        return 0
+
+    regressions = compare(report, baseline, args.tolerance, args.latency_tolerance)
+    for regression in regressions:
+        print(f"regression: {regression['workload']} {regression['engine']} {regression['metric']} {regression['baseline']} -> {regression['current']} ({regression['change']:+.1%})", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import bisect
+import itertools
+import random
+import operations
+
+# length of a day in milliseconds, cashback is paid out one day after a payment
+DAY = 86400000
+
+# share of every method in an operation mix, the shares of a mix add up to 1
+MIXES = {
+    'balanced': {'deposit': 0.3, 'transfer': 0.25, 'pay': 0.2, 'get_balance': 0.15, 'top_spenders': 0.04, 'get_payment_status': 0.04, 'merge_accounts': 0.02},
+    'deposits': {'deposit': 0.8, 'get_balance': 0.2},
+    'transfers': {'transfer': 0.7, 'deposit': 0.2, 'get_balance': 0.1},
+    'payments': {'pay': 0.6, 'get_payment_status': 0.2, 'deposit': 0.2},
+    'merges': {'merge_accounts': 0.1, 'deposit': 0.4, 'transfer': 0.3, 'pay': 0.2},
+}
+
+# number of accounts of every workload shape, the same number of operations is spread over fewer or more accounts
+SHAPES = {
+    'many_accounts': 10000,
+    'long_histories': 20,
+}
+
+DISTRIBUTIONS = ('uniform', 'zipf')
+
+class Workload:
+    """
+    Seeded stream of operations to benchmark a banking system with
+
+    Attributes
+    ----------
+    name : str
+        Stores the name of the workload, "<mix>-<distribution>-<shape>"
+    setup : list
+        Stores the operations creating and funding every account, they are applied before the measurement
+    operations : list
+        Stores the measured operations, in timestamp order
+    """
+
+    def __init__(self, name: str, setup: list, operations: list):
+        self.name = name
+        self.setup = setup
+        self.operations = operations
+
+def account_picker(account_ids: list[str], distribution: str, exponent: float, rng: random.Random):
+    '''
+    returns a function that picks a random account, either uniformly or with Zipf distributed popularity
+
+    Parameters:
+    ----------
+    account_ids (list): accounts to pick from, for Zipf the first account is the most popular
+    distribution (str): 'uniform' or 'zipf'
+    exponent (float): Zipf exponent, account i is picked with probability proportional to 1 / (i + 1) ** exponent
+    rng (Random): source of randomness
+
+    Returns:
+    ---------
+    (callable): called without arguments, returns an account_id
+    '''
+    if distribution == 'uniform':
+        return lambda: account_ids[rng.randrange(len(account_ids))]
+    if distribution != 'zipf':
+        raise ValueError(f"unknown distribution {distribution!r}")
+
+    weights = list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(len(account_ids))))
+    total = weights[-1]
+    return lambda: account_ids[bisect.bisect(weights, rng.random() * total)]
+
+def generate(mix: str, distribution: str, shape: str, count: int, seed: int = 1, exponent: float = 1.1, days: int = 3) -> Workload:
+    '''
+    builds a workload of count operations
+
+    Parameters:
+    ----------
+    mix (str): name of an operation mix in MIXES
+    distribution (str): 'uniform' or 'zipf' account popularity
+    shape (str): name of a workload shape in SHAPES
+    count (int): number of measured operations
+    seed (int): seed of the random stream, the same arguments always build the same workload
+    exponent (float): Zipf exponent
+    days (int): number of days the operations are spread over, so cashback is paid out during the workload
+
+    Returns:
+    ---------
+    (Workload): the workload
+    '''
+    rng = random.Random(seed)
+    account_ids = [f"account{i}" for i in range(SHAPES[shape])]
+    pick = account_picker(account_ids, distribution, exponent, rng)
+    methods, shares = zip(*MIXES[mix].items())
+    cumulative = list(itertools.accumulate(shares))
+
+    setup = [operations.CreateAccount(1, account_id) for account_id in account_ids]
+    setup += [operations.Deposit(2, account_id, 10 ** 12) for account_id in account_ids]
+
+    stream = []
+    step = max(2, days * DAY // max(count, 1))
+    timestamp = 3
+    payments = 0
+    while len(stream) < count:
+        timestamp += step
+        method = methods[min(bisect.bisect(cumulative, rng.random() * cumulative[-1]), len(methods) - 1)]
+        account_id = pick()
+        if method == 'deposit':
+            stream.append(operations.Deposit(timestamp, account_id, rng.randrange(1, 1000)))
+        elif method == 'transfer':
+            stream.append(operations.Transfer(timestamp, account_id, pick(), rng.randrange(1, 1000)))
+        elif method == 'pay':
+            stream.append(operations.Pay(timestamp, account_id, rng.randrange(1, 1000)))
+            payments += 1
+        elif method == 'get_balance':
+            # most reads ask for the current balance, the rest for a random earlier time
+            time_at = timestamp if rng.random() < 0.8 else rng.randrange(1, timestamp)
+            stream.append(operations.GetBalance(timestamp, account_id, time_at))
+        elif method == 'top_spenders':
+            stream.append(operations.TopSpenders(timestamp, 10))
+        elif method == 'get_payment_status':
+            stream.append(operations.GetPaymentStatus(timestamp, account_id, f"payment{rng.randrange(1, payments + 2)}"))
+        else:
+            # the merged account is opened again right away, so the number of accounts stays the same
+            stream.append(operations.MergeAccounts(timestamp, account_id, pick()))
+            stream.append(operations.CreateAccount(timestamp + 1, stream[-1].account_id_2))
+            stream.append(operations.Deposit(timestamp + 1, stream[-1].account_id, 10 ** 12))
+    return Workload(f"{mix}-{distribution}-{shape}", setup, stream[:count])
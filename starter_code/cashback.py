@@ -0,0 +1,93 @@
+from array import array
+import heapq
+
+class CashbackScheduler:
+    """
+    Cashback refunds that have been scheduled by pay but are not due yet
+
+    Refunds are kept in a min-heap keyed by the timestamp they are due at, so account
+    histories only ever contain transactions that have already happened. Payments arrive
+    in timestamp order, which makes scheduling a refund an O(1) push onto the heap.
+    """
+
+    def __init__(self):
+        self._heap = [] # (due_timestamp, payment ordinal, amount)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def extract(self, owned) -> list[tuple[int, int, int]]:
+        '''
+        removes every scheduled refund of the payments owned selects
+
+        Parameters:
+        ----------
+        owned (callable): called with the ordinal number of a payment, returns True if its refund has to be removed
+
+        Returns:
+        ---------
+        (list): [(due_timestamp, payment ordinal, amount)] of the removed refunds
+        '''
+        kept, removed = [], []
+        for entry in self._heap:
+            (removed if owned(entry[1]) else kept).append(entry)
+        if removed:
+            heapq.heapify(kept)
+            self._heap = kept
+        return removed
+
+    def columns(self) -> tuple[array, array, array]:
+        '''
+        returns the scheduled refunds as (due timestamps, payment ordinals, amounts) columns, in heap order
+        '''
+        due_timestamps, ordinals, amounts = array('q'), array('q'), array('q')
+        for due_timestamp, ordinal, amount in self._heap:
+            due_timestamps.append(due_timestamp)
+            ordinals.append(ordinal)
+            amounts.append(amount)
+        return due_timestamps, ordinals, amounts
+
+    @classmethod
+    def from_columns(cls, due_timestamps, ordinals, amounts) -> 'CashbackScheduler':
+        '''
+        rebuilds a scheduler from the columns returned by columns
+        '''
+        scheduler = cls()
+        scheduler._heap = list(zip(due_timestamps, ordinals, amounts))
+        return scheduler
+
+    def schedule(self, due_timestamp: int, ordinal: int, amount: int):
+        '''
+        schedules a cashback refund for a payment
+
+        Parameters:
+        ----------
+        due_timestamp (int): time the refund has to be paid out at
+        ordinal (int): ordinal number of the payment the refund belongs to
+        amount (int): amount of money to refund
+        '''
+        heapq.heappush(self._heap, (due_timestamp, ordinal, amount))
+
+    def next_due(self) -> int | None:
+        '''
+        returns the timestamp of the earliest scheduled refund, or None if nothing is scheduled
+        '''
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, timestamp: int) -> list[tuple[int, int, int]]:
+        '''
+        removes every refund that is due at or before timestamp
+
+        Parameters:
+        ----------
+        timestamp (int): the current time
+
+        Returns:
+        ---------
+        (list): [(due_timestamp, payment ordinal, amount)] in the order the refunds have to be paid out
+        '''
+        heap = self._heap
+        due = []
+        while heap and heap[0][0] <= timestamp:
+            due.append(heapq.heappop(heap))
+        return due
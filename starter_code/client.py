@@ -0,0 +1,116 @@
+import asyncio
+import collections
+import protocol
+from operations import OPERATIONS
+from protocol import ProtocolError, RemoteError
+
+class BankingClient:
+    """
+    asyncio client of a BankingServer with every BankingSystem method as a coroutine
+
+    e.g. await client.deposit(3, 'account1', 100)
+
+    Calls can be pipelined: every call is written as soon as it is made and its response is matched by order,
+    so calls made from several tasks at once, e.g. with asyncio.gather, are all in flight together. Writing
+    waits for the transport once its buffer is full, which holds callers back when the server falls behind.
+
+    Attributes
+    ----------
+    in_flight : int
+        Stores the number of calls waiting for their response
+    """
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._pending = collections.deque() # future of every call waiting for its response, in the order they were sent
+        self._receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host: str | None = None, port: int | None = None, path: str | None = None):
+        '''
+        connects to a server on a TCP host and port, or on a Unix socket if path is given
+        '''
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    async def call(self, operation):
+        '''
+        sends an operation from the operations module and returns the result of the BankingSystem method
+
+        Raises:
+        ---------
+        RemoteError: the server failed to apply the operation
+        ConnectionError: the connection was closed before the response arrived
+        '''
+        return await (await self.submit(operation))
+
+    async def submit(self, operation) -> asyncio.Future:
+        '''
+        sends an operation without waiting for its response, the returned future resolves to the result
+        '''
+        if self._receiver.done():
+            raise ConnectionError("connection to the banking server is closed")
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(future)
+        self._writer.write(protocol.frame(protocol.encode_request(operation)))
+        await self._writer.drain()
+        return future
+
+    def __getattr__(self, method: str):
+        operation = OPERATIONS.get(method)
+        if operation is None:
+            raise AttributeError(method)
+
+        async def call(*arguments):
+            return await self.call(operation(*arguments))
+        return call
+
+    async def close(self):
+        '''
+        closes the connection, calls still waiting for their response fail with ConnectionError
+        '''
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+        await self._receiver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _receive(self):
+        '''
+        resolves the pending calls with the responses of the server, in order
+        '''
+        error = ConnectionError("connection to the banking server was closed")
+        try:
+            while True:
+                payload = await protocol.read_frame(self._reader)
+                if payload is None:
+                    break
+                value = protocol.decode_response(payload)
+                future = self._pending.popleft()
+                if future.done():
+                    continue
+                if isinstance(value, RemoteError):
+                    future.set_exception(value)
+                else:
+                    future.set_result(value)
+        except (ProtocolError, ConnectionError) as exception:
+            error = ConnectionError(f"connection to the banking server failed: {exception}")
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(error)
@@ -0,0 +1,199 @@
+from collections import OrderedDict
+import os
+import pickle
+from account import Account, ColdAccount
+
+# length of a day in milliseconds, the unit of every timestamp
+DAY = 86400000
+
+# bytes of garbage records below which the store file is never compacted, however small the file is
+COMPACT_BYTES = 1 << 20
+
+class ColdStore:
+    """
+    Tiered storage for the accounts of a level 4 banking system, accounts that were not used for a while are
+    moved to a file on disk and replaced in memory by a ColdAccount stub
+
+    Accounts are kept in least recently used order of the timestamps of the calls that used them. Every call
+    evicts the accounts that were not used for idle milliseconds, so memory is bounded by the accounts used
+    within the last idle milliseconds however many dormant accounts there are. Current balances are answered
+    by the stub, any other use of an evicted account reads its history back from the file and makes it hot.
+
+    The file is an append-only sequence of pickled records, records of accounts that were read back are
+    garbage and the file is compacted once garbage makes up most of it. The file only lives as long as the
+    system and is emptied when it is opened, it is not a snapshot of the system.
+
+    Attributes
+    ----------
+    path : str
+        Path of the store file
+    idle : int
+        Milliseconds an account has to go unused before it is evicted
+    evictions : int
+        Number of accounts moved to the file
+    loads : int
+        Number of accounts read back from the file
+    """
+
+    def __init__(self, path: str, idle: int = 7 * DAY):
+        if idle <= 0:
+            raise ValueError("idle must be positive")
+        self.path = path
+        self.idle = idle
+        self.evictions = 0
+        self.loads = 0
+        self._used = OrderedDict() # account_id : timestamp it was last used at, least recently used first
+        self._file = open(path, 'w+b')
+        self._size = 0 # bytes written to the file
+        self._garbage = 0 # bytes of records that were read back
+
+    def touch(self, accounts: dict, timestamp: int, account_id: str, time_at: int | None = None):
+        '''
+        returns an account for a call at timestamp, reading it back from the file if it was evicted, and evicts
+        the accounts that were not used for idle milliseconds
+
+        Parameters:
+        ----------
+        accounts (dict): the accounts of the banking system, account_id : Account or ColdAccount
+        timestamp (int): time of the call
+        account_id (str): unique account identifier
+        time_at (int): for get_balance, the time the balance is asked for, the stub answers if it is not
+            earlier than its last transaction and the account is left cold
+
+        Returns:
+        ---------
+        (Account): the account, or its ColdAccount stub if it answers for time_at
+        None: the account doesn't exist
+        '''
+        account = accounts.get(account_id)
+        if account is None:
+            return None
+
+        if account.__class__ is ColdAccount:
+            if time_at is not None and time_at >= account.last_entry:
+                return account
+            account = accounts[account_id] = self._load(account)
+
+        used = self._used
+        used[account_id] = timestamp
+        used.move_to_end(account_id)
+        self._evict(accounts, timestamp)
+        return account
+
+    def load_all(self, accounts: dict):
+        '''
+        reads every evicted account back from the file
+        '''
+        for account_id, account in accounts.items():
+            if account.__class__ is ColdAccount:
+                accounts[account_id] = self._load(account)
+        self._used.clear()
+
+    def close(self):
+        '''
+        closes and removes the store file, evicted accounts can't be read back afterwards, see detach
+        '''
+        if self._file.closed:
+            return
+        self._file.close()
+        os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _evict(self, accounts: dict, timestamp: int):
+        '''
+        moves every account that was not used since timestamp - idle to the file
+        '''
+        used = self._used
+        horizon = timestamp - self.idle
+        while used:
+            account_id, last_used = next(iter(used.items()))
+            if last_used > horizon:
+                break
+
+            del used[account_id]
+            account = accounts[account_id]
+            record = pickle.dumps((account.timestamps, account.balances), pickle.HIGHEST_PROTOCOL)
+            self._file.seek(self._size)
+            self._file.write(record)
+            accounts[account_id] = ColdAccount(account, self._size, len(record))
+            self._size += len(record)
+            self.evictions += 1
+
+        if self._garbage > max(self._size // 2, COMPACT_BYTES):
+            self._compact(accounts)
+
+    def _load(self, stub: ColdAccount) -> Account:
+        '''
+        reads the history of an evicted account back from the file
+        '''
+        self._file.seek(stub.offset)
+        timestamps, balances = pickle.loads(self._file.read(stub.length))
+        self._garbage += stub.length
+        self.loads += 1
+
+        account = Account.__new__(Account)
+        account.timestamps = timestamps
+        account.balances = balances
+        account.total_spend = stub.total_spend
+        account.merged_at = stub.merged_at
+        return account
+
+    def _compact(self, accounts: dict):
+        '''
+        rewrites the file with only the records of the accounts that are still evicted
+        '''
+        self._file.flush()
+        compacted = open(self.path + '.tmp', 'w+b')
+        size = 0
+        for account in accounts.values():
+            if account.__class__ is ColdAccount:
+                self._file.seek(account.offset)
+                compacted.write(self._file.read(account.length))
+                account.offset = size
+                size += account.length
+        self._file.close()
+        os.replace(self.path + '.tmp', self.path)
+        self._file = compacted
+        self._size = size
+        self._garbage = 0
+
+def attach(system, path: str, idle: int = 7 * DAY) -> ColdStore:
+    '''
+    turns on tiered storage for a level 4 banking system, accounts not used for idle milliseconds are moved
+    to a file from then on
+
+    Parameters:
+    ----------
+    system (BankingSystemImpl): level 4 banking system, see banking_system_impl_lvl_4
+    path (str): path of the store file, an existing file is replaced
+    idle (int): milliseconds an account has to go unused before it is evicted
+
+    Returns:
+    ---------
+    (ColdStore): the store, also set as system.store
+    '''
+    if system.store is not None:
+        raise ValueError("system already has a cold store")
+    store = ColdStore(path, idle)
+
+    # accounts that already exist were last used at their last transaction, as far as is known
+    for account_id, account in sorted(system.accounts.items(), key=lambda item: item[1].timestamps[-1]):
+        store._used[account_id] = account.timestamps[-1]
+    system.store = store
+    return store
+
+def detach(system):
+    '''
+    reads every evicted account of a banking system back into memory and turns tiered storage off
+    '''
+    store = system.store
+    if store is None:
+        return
+    store.load_all(system.accounts)
+    system.store = None
+    store.close()
@@ -0,0 +1,266 @@
+import argparse
+import importlib
+import json
+import random
+import sys
+import time
+import operations
+from replay import batched
+
+# length of a day in milliseconds, cashback is paid out one day after a payment
+DAY = 86400000
+
+# share of every method in a generated case
+WEIGHTS = {
+    'deposit': 0.2,
+    'get_balance': 0.2,
+    'transfer': 0.15,
+    'pay': 0.15,
+    'create_account': 0.08,
+    'get_payment_status': 0.1,
+    'merge_accounts': 0.05,
+    'top_spenders': 0.07,
+}
+
+REFERENCE = 'banking_system_impl_lvl_4'
+
+ENGINES = ('banking_system_impl_columnar', 'banking_system_concurrent:ConcurrentBankingSystemImpl')
+
+def load_engine(spec: str) -> type:
+    '''
+    returns the banking system class of an engine, given as "module" for module.BankingSystemImpl or "module:Class"
+    '''
+    module, _, name = spec.partition(':')
+    return getattr(importlib.import_module(module), name or 'BankingSystemImpl')
+
+def generate(rng: random.Random, length: int, accounts: int = 4) -> list:
+    '''
+    builds a random sequence of operations that exercises the corner cases of the BankingSystem semantics
+
+    A handful of account ids is shared by every operation, so accounts are merged, recreated after a merge and
+    transferred between often. Time moves forward in small steps, in jumps of several days and onto the exact
+    timestamps cashback is due at, so cashback lands at the same timestamp as other operations. Balances are
+    asked for at the timestamps of earlier events, just before them and at random earlier times.
+
+    Parameters:
+    ----------
+    rng (Random): source of randomness, the same state always builds the same case
+    length (int): number of operations
+    accounts (int): number of account ids, one more id that is never created is used as well
+
+    Returns:
+    ---------
+    (list): operations from the operations module, in timestamp order
+    '''
+    account_ids = [f"account{i}" for i in range(accounts + 1)]
+    pick = lambda: account_ids[rng.randrange(accounts)] if rng.random() < 0.95 else account_ids[accounts]
+    methods, weights = zip(*WEIGHTS.items())
+
+    stream = []
+    timestamp = 0
+    payments = 0
+    events = [] # timestamps of earlier operations and of cashback, for get_balance to ask about
+    while len(stream) < length:
+        step = rng.random()
+        due = [event for event in events[-20:] if event > timestamp]
+        if due and step < 0.15:
+            timestamp = rng.choice(due)
+        elif step < 0.2:
+            timestamp += rng.randrange(DAY, 30 * DAY)
+        else:
+            timestamp += rng.choice((1, 1, 2, rng.randrange(1, DAY // 2)))
+
+        method = rng.choices(methods, weights)[0]
+        if len(stream) < 2:
+            method = 'create_account'
+        amount = rng.choice((0, rng.randrange(1, 100), rng.randrange(1, 2000), rng.randrange(1, 20000)))
+        if method == 'create_account':
+            stream.append(operations.CreateAccount(timestamp, pick()))
+        elif method == 'deposit':
+            # deposits are larger than withdrawals on average, so most transfers and payments can be afforded
+            stream.append(operations.Deposit(timestamp, pick(), amount * rng.randrange(1, 5)))
+        elif method == 'transfer':
+            stream.append(operations.Transfer(timestamp, pick(), pick(), amount))
+        elif method == 'pay':
+            stream.append(operations.Pay(timestamp, pick(), amount))
+            payments += 1
+            events.append(timestamp + DAY)
+        elif method == 'get_payment_status':
+            # about half of the payments fail for lack of funds, so ids are picked among the first half
+            stream.append(operations.GetPaymentStatus(timestamp, pick(), f"payment{rng.randrange(1, payments // 2 + 2)}"))
+        elif method == 'merge_accounts':
+            stream.append(operations.MergeAccounts(timestamp, pick(), pick()))
+        elif method == 'top_spenders':
+            stream.append(operations.TopSpenders(timestamp, rng.randrange(1, accounts + 2)))
+        else:
+            past = [event for event in events if event <= timestamp]
+            choice = rng.random()
+            if past and choice < 0.5:
+                time_at = rng.choice(past) - (choice < 0.2)
+            elif choice < 0.75:
+                time_at = timestamp
+            else:
+                time_at = rng.randrange(timestamp + 1)
+            stream.append(operations.GetBalance(timestamp, pick(), time_at))
+        events.append(timestamp)
+    return stream
+
+def results(engine: type, case: list, batch_size: int = 0) -> list:
+    '''
+    applies a case to a new system of engine and returns the result of every operation
+
+    An exception is recorded as the result of the operation that raised it and ends the run, as the state of
+    the system is unknown from then on.
+
+    Parameters:
+    ----------
+    engine (type): banking system class
+    case (list): operations
+    batch_size (int): if positive and the engine has execute_batch, operations are applied in batches of this size
+
+    Returns:
+    ---------
+    (list): the result of every operation that was applied, the last one is an error message if it raised
+    '''
+    system = engine()
+    found = []
+    try:
+        if batch_size > 0 and hasattr(system, 'execute_batch'):
+            for batch in batched(case, batch_size):
+                try:
+                    found += system.execute_batch(batch)
+                except Exception as error:
+                    if isinstance(error, operations.BatchError):
+                        # cases are in timestamp order, so the operations before the failing one are the ones applied
+                        found += error.results[:error.failed]
+                        error = error.__cause__
+                    found.append(f"raised {type(error).__name__}: {error}")
+                    break
+        else:
+            for operation in case:
+                try:
+                    found.append(operations.apply(system, operation))
+                except Exception as error:
+                    found.append(f"raised {type(error).__name__}: {error}")
+                    break
+    finally:
+        close = getattr(system, 'close', None)
+        if close is not None:
+            close()
+    return found
+
+def divergence(engines: list[type], case: list, batch_size: int = 0) -> tuple[int, list] | None:
+    '''
+    runs a case against every engine and returns where the first engine, the reference, and any other disagree
+
+    Returns:
+    ---------
+    (tuple): (index of the first operation with different results, [result of every engine at that index])
+    None: every engine returned the same results
+    '''
+    runs = [results(engine, case, batch_size if i else 0) for i, engine in enumerate(engines)]
+    for index in range(len(case)):
+        found = [run[index] if index < len(run) else None for run in runs]
+        if any(result != found[0] for result in found[1:]):
+            return index, found
+    return None
+
+def shrink(engines: list[type], case: list, batch_size: int = 0) -> list:
+    '''
+    reduces a case the engines disagree on to a minimal one they still disagree on
+
+    Operations after the first disagreement are dropped, then chunks of operations of halving size are removed
+    for as long as the engines still disagree, and finally amounts are replaced by smaller round numbers.
+    Removing operations keeps the timestamps in order, so every reduced case is still a valid sequence.
+
+    Parameters:
+    ----------
+    engines (list): banking system classes, the first one is the reference
+    case (list): operations the engines disagree on
+    batch_size (int): see results
+
+    Returns:
+    ---------
+    (list): the reduced case
+    '''
+    def failing(candidate):
+        found = divergence(engines, candidate, batch_size)
+        return None if found is None else candidate[:found[0] + 1]
+
+    case = failing(case)
+    if case is None:
+        raise ValueError("the engines agree on the case")
+
+    chunk = max(len(case) // 2, 1)
+    while True:
+        removed = False
+        start = 0
+        while start < len(case):
+            reduced = failing(case[:start] + case[start + chunk:])
+            if reduced is not None:
+                case, removed = reduced, True
+            else:
+                start += chunk
+        if removed:
+            continue
+        if chunk == 1:
+            break
+        chunk //= 2
+
+    for i, operation in enumerate(case):
+        if 'amount' not in operation._fields:
+            continue
+        for amount in (0, 1, 10, 100, 1000, 10000):
+            if amount >= operation.amount:
+                break
+            reduced = failing(case[:i] + [operation._replace(amount=amount)] + case[i + 1:])
+            if reduced is not None and len(reduced) == len(case):
+                case = reduced
+                break
+    return case
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Run random operation sequences against a reference banking system and faster engines side by side, and shrink any disagreement to a minimal reproduction.')
+    parser.add_argument('--reference', default=REFERENCE, help='module providing BankingSystemImpl, or module:Class (default: %(default)s)')
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES), help='engines compared with the reference (default: %(default)s)')
+    parser.add_argument('--cases', type=int, default=10000, help='number of random cases (default: %(default)s)')
+    parser.add_argument('--length', type=int, default=200, help='operations per case (default: %(default)s)')
+    parser.add_argument('--accounts', type=int, default=4, help='account ids shared by the operations of a case (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--first-case', type=int, default=0, help='number of the first case, to rerun a reported case (default: %(default)s)')
+    parser.add_argument('--batch-size', type=int, default=0, help='apply operations to the engines with execute_batch in batches of this size')
+    parser.add_argument('--time-limit', type=float, help='seconds after which no new case is started')
+    parser.add_argument('--output', help='file the minimal reproduction is written to, as an operation log for replay.py')
+    args = parser.parse_args(argv)
+
+    engines = [load_engine(spec) for spec in [args.reference] + args.engines]
+    deadline = None if args.time_limit is None else time.monotonic() + args.time_limit
+    start = time.monotonic()
+    tested = 0
+    for number in range(args.first_case, args.first_case + args.cases):
+        if deadline is not None and time.monotonic() > deadline:
+            break
+        case = generate(random.Random(args.seed << 32 | number), args.length, args.accounts)
+        tested += 1
+        if divergence(engines, case, args.batch_size) is None:
+            if tested % 1000 == 0:
+                print(f"{tested} cases, {tested * args.length} operations, {time.monotonic() - start:.0f} s", file=sys.stderr)
+            continue
+
+        case = shrink(engines, case, args.batch_size)
+        index, found = divergence(engines, case, args.batch_size)
+        lines = [json.dumps([operations.METHODS[type(operation)]] + list(operation)) for operation in case]
+        print(f"case {number} of seed {args.seed}: the engines disagree after {len(case)} operations")
+        print('\n'.join(lines))
+        for spec, result in zip([args.reference] + args.engines, found):
+            print(f"{spec}: {result!r}")
+        if args.output is not None:
+            with open(args.output, 'w') as output:
+                output.write('\n'.join(lines) + '\n')
+        return 1
+
+    print(f"{tested} cases, {tested * args.length} operations: every engine agrees with {args.reference}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,319 @@
+from array import array
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+import operations
+
+try:
+    import numpy as np
+except ImportError: # numpy is optional, samples are folded into the histograms one by one without it
+    np = None
+
+# methods that are timed, the BankingSystem methods and the extensions of the columnar engine when a system has them
+METHODS = tuple(operations.OPERATIONS) + ('get_balances', 'list_payments', 'execute_batch')
+
+# every power of two of nanoseconds is split into 2 ** (SUB_BITS - 1) buckets, so a bucket is at most 1 / 16 of its values wide
+SUB_BITS = 5
+
+_BUCKETS = 64 << (SUB_BITS - 1)
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+# source of the wrapper of a method, compiled with the parameters of the method so calls don't pack and unpack
+# their arguments, every sample_every-th call is timed and the others only draw from the call counter
+_TIMED = '''
+def timed({parameters}):
+    if next(_ticks) % _sample_every:
+        return _call({parameters})
+    started = _clock()
+    result = _call({parameters})
+    _append(_clock() - started)
+    return result
+'''
+
+def bucket_index(nanoseconds: int) -> int:
+    '''
+    returns the histogram bucket of a latency, latencies below 2 ** SUB_BITS nanoseconds have a bucket each
+    '''
+    if nanoseconds < 1 << SUB_BITS:
+        return nanoseconds
+    shift = nanoseconds.bit_length() - SUB_BITS
+    return ((shift + 1) << (SUB_BITS - 1)) + (nanoseconds >> shift) - (1 << (SUB_BITS - 1))
+
+def bucket_bounds(index: int) -> tuple[int, int]:
+    '''
+    returns the lowest and the highest latency in nanoseconds that fall into a histogram bucket
+    '''
+    if index < 1 << SUB_BITS:
+        return index, index
+    shift = (index >> (SUB_BITS - 1)) - 1
+    lowest = ((index & ((1 << (SUB_BITS - 1)) - 1)) + (1 << (SUB_BITS - 1))) << shift
+    return lowest, lowest + (1 << shift) - 1
+
+class LatencyHistogram:
+    """
+    Log-bucketed histogram of the latencies of one method, in the style of an HDR histogram
+
+    Buckets grow with the latency, so the histogram has a fixed size of a few hundred counters whatever the
+    range of latencies, and every latency is known to within 1 / 16 of its value.
+
+    Attributes
+    ----------
+    counts : list
+        Stores the number of latencies in every bucket, see bucket_index
+    total : int
+        Stores the sum of every latency in nanoseconds
+    max : int
+        Stores the highest latency in nanoseconds
+    """
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.total = 0
+        self.max = 0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def add(self, latencies):
+        '''
+        adds latencies in nanoseconds to the histogram
+
+        Parameters:
+        ----------
+        latencies (array): int64 latencies in nanoseconds
+        '''
+        if not len(latencies):
+            return
+
+        if np is None:
+            self.total += sum(latencies)
+            self.max = max(self.max, max(latencies))
+            counts = self.counts
+            for latency in latencies:
+                counts[bucket_index(latency)] += 1
+            return
+
+        values = np.frombuffer(latencies, dtype=np.int64)
+        self.total += int(values.sum())
+        self.max = max(self.max, int(values.max()))
+        # the exponent of frexp is the bit length of every latency, latencies are far below 2 ** 53 nanoseconds
+        shifts = np.maximum(np.frexp(values.astype(np.float64))[1].astype(np.int64) - SUB_BITS, 0)
+        indexes = np.where(shifts > 0, ((shifts + 1) << (SUB_BITS - 1)) + (values >> shifts) - (1 << (SUB_BITS - 1)), values)
+        for index, count in enumerate(np.bincount(indexes, minlength=_BUCKETS).tolist()):
+            self.counts[index] += count
+
+    def percentile(self, percent: float) -> int:
+        '''
+        returns the highest latency in the bucket below which percent of the latencies fall, 0 if there are none
+        '''
+        target = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(bucket_bounds(index)[1], self.max)
+        return 0
+
+    def summary(self) -> dict:
+        '''
+        returns the call count, mean, percentiles and maximum in microseconds and the non-empty buckets
+
+        Returns:
+        ---------
+        (dict): {'count', 'mean_us', 'p50_us', 'p90_us', 'p99_us', 'p99.9_us', 'max_us', 'buckets': [[lowest nanoseconds, count]]}
+        '''
+        count = self.count
+        summary = {'count': count, 'mean_us': round(self.total / count / 1000, 3) if count else 0.0}
+        for percent in PERCENTILES:
+            summary[f'p{percent:g}_us'] = round(self.percentile(percent) / 1000, 3)
+        summary['max_us'] = round(self.max / 1000, 3)
+        summary['buckets'] = [[bucket_bounds(index)[0], count] for index, count in enumerate(self.counts) if count]
+        return summary
+
+class LatencyRecorder:
+    """
+    Per method latency histograms of a banking system, see instrument
+
+    Every call is counted, and one call in sample_every is timed: it reads the clock twice and appends its
+    latency to an array. Reading the clock takes a system call on hosts without a vDSO clock, a few hundred
+    nanoseconds for every call, so the histograms are built from a sample of the calls. The percentiles of the
+    sample track those of every call, the maximum is the highest latency of a timed call. A sample_every of 1
+    times every call. A background thread folds the arrays into the histograms every fold_interval seconds, so
+    memory stays bounded, and writes the statistics to dump_path every dump_interval seconds if a path is given.
+
+    Attributes
+    ----------
+    dump_path : str
+        Path of the file the statistics are written to as JSON, or None
+    dump_interval : float
+        Seconds between two dumps
+    fold_interval : float
+        Seconds between two folds of the latency arrays into the histograms
+    sample_every : int
+        One call in sample_every is timed
+    """
+
+    def __init__(self, dump_path: str | None = None, dump_interval: float = 60.0, fold_interval: float = 1.0, sample_every: int = 16):
+        if sample_every < 1:
+            raise ValueError("sample_every must be positive")
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+        self.fold_interval = fold_interval
+        self.sample_every = sample_every
+        self._samples = {} # method : array of latencies in nanoseconds not folded yet
+        self._histograms = {} # method : LatencyHistogram
+        self._ticks = {} # method : counter drawn from once by every call and once by every read of the call count
+        self._reads = {} # method : number of times the call count was read
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._started = time.time()
+        self._folder = threading.Thread(target=self._fold_periodically, name='latency-folder', daemon=True)
+        self._folder.start()
+
+    def wrap(self, method: str, call):
+        '''
+        returns call with every call timed under the name method
+        '''
+        with self._lock:
+            samples = self._samples.setdefault(method, array('q'))
+            self._histograms.setdefault(method, LatencyHistogram())
+            ticks = self._ticks.setdefault(method, itertools.count())
+            self._reads.setdefault(method, 0)
+
+        try:
+            parameters = list(inspect.signature(call).parameters.values())
+        except (TypeError, ValueError):
+            parameters = None
+        if parameters is None or any(parameter.kind is not parameter.POSITIONAL_OR_KEYWORD or parameter.default is not parameter.empty or parameter.name.startswith('_') for parameter in parameters):
+            source = _TIMED.format(parameters='*arguments, **keywords')
+        else:
+            source = _TIMED.format(parameters=', '.join(parameter.name for parameter in parameters))
+        namespace = {'_call': call, '_ticks': ticks, '_sample_every': self.sample_every, '_clock': time.perf_counter_ns, '_append': samples.append}
+        exec(source, namespace)
+
+        timed = namespace['timed']
+        timed.__wrapped__ = call
+        return timed
+
+    def stats(self) -> dict:
+        '''
+        returns the latency statistics of every method that was called at least once
+
+        Returns:
+        ---------
+        (dict): {method: summary of its histogram}, see LatencyHistogram.summary, with 'count' the number of calls and 'timed' the number of timed calls
+        '''
+        self._fold()
+        stats = {}
+        with self._lock:
+            for method, histogram in sorted(self._histograms.items()):
+                # the count is read by drawing from the counter like a call does, so the draws of reads are taken off
+                calls = next(self._ticks[method]) - self._reads[method]
+                self._reads[method] += 1
+                if calls:
+                    summary = histogram.summary()
+                    stats[method] = {'count': calls, 'timed': summary.pop('count'), **summary}
+        return stats
+
+    def dump(self, path: str | None = None):
+        '''
+        writes the statistics to a JSON file, the file is replaced atomically so readers never see a partial dump
+
+        Parameters:
+        ----------
+        path (str): path of the file, dump_path by default
+        '''
+        path = path or self.dump_path
+        report = {'started': self._started, 'dumped': time.time(), 'methods': self.stats()}
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as output:
+            json.dump(report, output)
+        os.replace(temporary, path)
+
+    def close(self):
+        '''
+        stops the background thread and writes a last dump if a dump path is set
+        '''
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._folder.join()
+        if self.dump_path is not None:
+            self.dump()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _fold(self):
+        '''
+        moves the latencies appended since the last fold into the histograms
+        '''
+        with self._lock:
+            for method, samples in self._samples.items():
+                # calls keep appending while the fold runs, only the latencies that are there now are taken
+                count = len(samples)
+                if count:
+                    latencies = samples[:count]
+                    del samples[:count]
+                    self._histograms[method].add(latencies)
+
+    def _fold_periodically(self):
+        '''
+        folds the latency arrays every fold_interval seconds and dumps every dump_interval seconds until closed
+        '''
+        next_dump = time.monotonic() + self.dump_interval
+        while not self._closed.wait(self.fold_interval):
+            self._fold()
+            if self.dump_path is not None and time.monotonic() >= next_dump:
+                self.dump()
+                next_dump = time.monotonic() + self.dump_interval
+
+def instrument(system, dump_path: str | None = None, dump_interval: float = 60.0, sample_every: int = 16) -> LatencyRecorder:
+    '''
+    starts counting every call of the public methods of a banking system and timing a sample of them, see LatencyRecorder
+
+    The methods are only wrapped on this system object, the class is left alone, so systems that are not
+    instrumented don't pay anything. The recorder is also set as system.latency.
+
+    Parameters:
+    ----------
+    system (BankingSystem): banking system to instrument, any implementation
+    dump_path (str): path of a file the statistics are written to every dump_interval seconds, or None
+    dump_interval (float): seconds between two dumps
+    sample_every (int): one call in sample_every is timed, 1 to time every call
+
+    Returns:
+    ---------
+    (LatencyRecorder): the recorder, its stats method returns the histograms
+    '''
+    if getattr(system, 'latency', None) is not None:
+        raise ValueError("system is already instrumented")
+
+    recorder = LatencyRecorder(dump_path, dump_interval, sample_every=sample_every)
+    for method in METHODS:
+        call = getattr(system, method, None)
+        if call is not None:
+            setattr(system, method, recorder.wrap(method, call))
+    system.latency = recorder
+    return recorder
+
+def uninstrument(system):
+    '''
+    stops timing the calls of a banking system instrumented with instrument and closes its recorder
+    '''
+    recorder = getattr(system, 'latency', None)
+    if recorder is None:
+        return
+    for method in METHODS:
+        if method in vars(system):
+            delattr(system, method)
+    system.latency = None
+    recorder.close()
@@ -0,0 +1,238 @@
+from bisect import bisect_left, insort
+
+class SpendLeaderboard:
+    """
+    Accounts ordered by total outgoing transactions, kept up to date as spending changes
+
+    Entries are (-total_spend, account_id) keys kept in a list of sorted buckets, so the
+    highest spenders come first and ties are broken alphabetically. Finding a key is a bisect
+    over the bucket maxima and then over one bucket, and moving it costs at most a memmove of
+    one bucket, which keeps updates logarithmic in practice even with millions of accounts.
+    Spending changes are only moved into the buckets when the leaderboard is read, so an
+    account that spends many times between two reads is moved once. Buckets are shared with
+    frozen copies and only copied when they are changed, see frozen.
+
+    Attributes
+    ----------
+    load : int
+        Number of entries a bucket holds before it is split in two
+    reads : int
+        Number of calls of top
+    cache_hits : int
+        Number of calls of top answered from the cache without walking the buckets
+    entries_listed : int
+        Number of entries walked by calls of top that missed the cache
+    entries_moved : int
+        Number of accounts moved to a new position when spending changes were applied
+    """
+
+    def __init__(self, load: int = 1000):
+        self.load = load
+        self._buckets = [] # [[sorted (-total_spend, account_id)]]
+        self._maxes = [] # last key of every bucket
+        self._owned = [] # whether every bucket is only used by this leaderboard, shared buckets are copied before they change
+        self._cache = {} # n : formatted top n accounts
+        self._pending = {} # account_id : [total_spend in the buckets, latest total_spend]
+        self.reads = 0
+        self.cache_hits = 0
+        self.entries_listed = 0
+        self.entries_moved = 0
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self._buckets)
+
+    def __iter__(self):
+        '''
+        iterates over every account as (account_id, total_spend), highest spenders first
+        '''
+        self._flush()
+        for bucket in self._buckets:
+            for total_spend, account_id in bucket:
+                yield account_id, -total_spend
+
+    @classmethod
+    def from_sorted(cls, entries, load: int = 1000) -> 'SpendLeaderboard':
+        '''
+        builds a leaderboard from accounts that are already in leaderboard order, without sorting them again
+
+        Parameters:
+        ----------
+        entries (iterable): (account_id, total_spend) of every account, highest spenders first
+        load (int): number of entries a bucket holds before it is split in two
+
+        Returns:
+        ---------
+        (SpendLeaderboard): the leaderboard
+        '''
+        leaderboard = cls(load)
+        keys = [(-total_spend, account_id) for account_id, total_spend in entries]
+        leaderboard._buckets = [keys[i:i + load] for i in range(0, len(keys), load)]
+        leaderboard._maxes = [bucket[-1] for bucket in leaderboard._buckets]
+        leaderboard._owned = [True] * len(leaderboard._buckets)
+        return leaderboard
+
+    def frozen(self) -> 'SpendLeaderboard':
+        '''
+        returns a copy of the leaderboard as it is now, which later changes to the leaderboard don't affect
+
+        The copy shares the buckets with the leaderboard, so taking it only copies the list of buckets, a bucket
+        is copied by the leaderboard the first time it changes afterwards.
+
+        Returns:
+        ---------
+        (SpendLeaderboard): the copy
+        '''
+        self._flush()
+        copy = SpendLeaderboard(self.load)
+        copy._buckets = list(self._buckets)
+        copy._maxes = list(self._maxes)
+        copy._owned = [False] * len(self._buckets)
+        self._owned = [False] * len(self._buckets)
+        return copy
+
+    def insert(self, account_id: str, total_spend: int):
+        '''
+        adds an account to the leaderboard
+
+        Parameters:
+        ----------
+        account_id (str): unique account identifier
+        total_spend (int): total outgoing transactions of the account
+        '''
+        self._cache.clear()
+        self._insert_key((-total_spend, account_id))
+
+    def remove(self, account_id: str, total_spend: int):
+        '''
+        removes an account from the leaderboard
+
+        Parameters:
+        ----------
+        account_id (str): unique account identifier
+        total_spend (int): total outgoing transactions of the account
+
+        Raises:
+        ---------
+        KeyError: the account is not in the leaderboard with that total spend
+        '''
+        self._cache.clear()
+
+        # an account that spent since the last read is still in the buckets with its old total spend
+        pending = self._pending.pop(account_id, None)
+        if pending is not None:
+            total_spend = pending[0]
+        self._remove_key((-total_spend, account_id))
+
+    def update(self, account_id: str, old_total_spend: int, new_total_spend: int):
+        '''
+        moves an account to its new position after its total outgoing transactions changed
+
+        Parameters:
+        ----------
+        account_id (str): unique account identifier
+        old_total_spend (int): total outgoing transactions of the account before the change
+        new_total_spend (int): total outgoing transactions of the account now
+        '''
+        self._cache.clear()
+        pending = self._pending.get(account_id)
+        if pending is None:
+            self._pending[account_id] = [old_total_spend, new_total_spend]
+        else:
+            pending[1] = new_total_spend
+
+    def top(self, n: int) -> list[str]:
+        '''
+        returns the top n accounts in the format used by top_spenders
+
+        Parameters:
+        ----------
+        n (int): the number of accounts you want returned, a negative n leaves out the last -n accounts like
+            slicing the full ranking with [:n]
+
+        Returns:
+        --------
+        (list): [account_id_1(total_outgoing),account_id_n(total_outgoing)]
+        '''
+        self.reads += 1
+        if n in self._cache:
+            self.cache_hits += 1
+        else:
+            self._flush()
+            count = n if n >= 0 else max(len(self) + n, 0)
+            top = []
+            for bucket in self._buckets:
+                if len(top) >= count:
+                    break
+                top.extend(f"{account_id}({-total_spend})" for total_spend, account_id in bucket[:count - len(top)])
+            self._cache[n] = top
+            self.entries_listed += len(top)
+
+        # callers get their own copy so the cached result can't be changed
+        return list(self._cache[n])
+
+    def _flush(self):
+        '''
+        moves every account whose spending changed since the last read to its new position
+        '''
+        for account_id, (old_total_spend, new_total_spend) in self._pending.items():
+            if old_total_spend != new_total_spend:
+                self._remove_key((-old_total_spend, account_id))
+                self._insert_key((-new_total_spend, account_id))
+                self.entries_moved += 1
+        self._pending.clear()
+
+    def _insert_key(self, key: tuple[int, str]):
+        '''
+        adds a (-total_spend, account_id) key to the buckets
+        '''
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+            self._owned.append(True)
+            return
+
+        # keys larger than every bucket maximum go into the last bucket
+        i = min(bisect_left(self._maxes, key), len(self._buckets) - 1)
+        bucket = self._bucket(i)
+        insort(bucket, key)
+        self._maxes[i] = bucket[-1]
+
+        if len(bucket) > 2 * self.load:
+            self._buckets.insert(i + 1, bucket[self.load:])
+            self._owned.insert(i + 1, True)
+            del bucket[self.load:]
+            self._maxes.insert(i, bucket[-1])
+
+    def _remove_key(self, key: tuple[int, str]):
+        '''
+        removes a (-total_spend, account_id) key from the buckets
+
+        Raises:
+        ---------
+        KeyError: the key is not in the buckets, the total spend it was given for the account is out of date
+        '''
+        i = bisect_left(self._maxes, key)
+        # the key can only be in the first bucket whose maximum is not smaller, whatever is at its position is
+        # checked first, so a stale total spend fails instead of removing a neighbour from the ranking
+        bucket = self._buckets[i] if i < len(self._buckets) else []
+        j = bisect_left(bucket, key)
+        if j == len(bucket) or bucket[j] != key:
+            raise KeyError(key)
+        bucket = self._bucket(i)
+        del bucket[j]
+
+        if bucket:
+            self._maxes[i] = bucket[-1]
+        else:
+            del self._buckets[i]
+            del self._maxes[i]
+            del self._owned[i]
+
+    def _bucket(self, i: int) -> list:
+        '''
+        returns bucket i to be changed, copying it first if it is shared with a frozen copy
+        '''
+        if not self._owned[i]:
+            self._buckets[i] = list(self._buckets[i])
+            self._owned[i] = True
+        return self._buckets[i]
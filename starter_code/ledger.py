@@ -0,0 +1,198 @@
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+# kind of event every ledger row records
+OPENED, DEPOSIT, TRANSFER_OUT, TRANSFER_IN, PAYMENT, CASHBACK, MERGE = range(7)
+KINDS = ('opened', 'deposit', 'transfer_out', 'transfer_in', 'payment', 'cashback', 'merge')
+
+# range of the int64 columns, a transaction taking an amount or a balance out of it is rejected before the ledger changes
+INT64_MIN = -1 << 63
+INT64_MAX = (1 << 63) - 1
+
+class Ledger:
+    """
+    Columnar transaction history of a single account
+
+    Every transaction is stored as one row across three parallel int64 arrays and a byte array of event kinds
+    instead of a dict entry, so a row costs 25 bytes and the columns grow geometrically on append.
+
+    Attributes
+    ----------
+    timestamps : array
+        Stores the timestamp of every transaction in ascending order
+    amounts : array
+        Stores the signed amount of every transaction
+    balances : array
+        Stores the balance of the account after every transaction
+    kinds : array
+        Stores the kind of event of every transaction, one of OPENED, DEPOSIT, TRANSFER_OUT, TRANSFER_IN, PAYMENT, CASHBACK or MERGE
+    """
+
+    def __init__(self, timestamp: int):
+        # the account is opened with an empty transaction so balances before its creation are None
+        self.timestamps = array('q', [timestamp])
+        self.amounts = array('q', [0])
+        self.balances = array('q', [0])
+        self.kinds = array('B', [OPENED])
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def columns(self) -> tuple:
+        '''
+        returns the (timestamps, amounts, kinds) columns of the ledger, balances can be rebuilt from the amounts
+        '''
+        return self.timestamps, self.amounts, self.kinds
+
+    def record(self, timestamp: int, amount: int, kind: int = DEPOSIT) -> int:
+        '''
+        adds a transaction of amount to the ledger at timestamp
+
+        Parameters:
+        ----------
+        timestamp (int): time of the transaction
+        amount (int): signed amount of money added to the account
+        kind (int): kind of event of the transaction, e.g. PAYMENT
+
+        Returns:
+        ---------
+        (int): balance of the account at timestamp, after the transaction
+
+        Raises:
+        ---------
+        OverflowError: the amount or a balance would not fit in int64, the ledger is left unchanged
+        '''
+        # transactions almost always arrive in order, so appending is the common case
+        if timestamp >= self.timestamps[-1]:
+            balance = self.balances[-1] + amount
+            if not (INT64_MIN <= balance <= INT64_MAX and INT64_MIN <= amount <= INT64_MAX):
+                raise OverflowError("transaction takes the balance of the account out of the int64 range")
+            self.timestamps.append(timestamp)
+            self.amounts.append(amount)
+            self.balances.append(balance)
+            self.kinds.append(kind)
+            return balance
+
+        # transactions at the same timestamp are kept in the order they were recorded
+        position = bisect_right(self.timestamps, timestamp)
+        self._check(position, amount)
+        self.timestamps.insert(position, timestamp)
+        self.amounts.insert(position, amount)
+        self.balances.insert(position, self.balances[position - 1] if position else 0)
+        self.kinds.insert(position, kind)
+
+        # every balance from timestamp onwards includes the new transaction
+        balances = self.balances
+        for i in range(position, len(balances)):
+            balances[i] += amount
+        return balances[position]
+
+    def check(self, timestamp: int, amount: int):
+        '''
+        raises OverflowError if record would reject a transaction of amount at timestamp, without changing the ledger
+        '''
+        self._check(bisect_right(self.timestamps, timestamp), amount)
+
+    def _check(self, position: int, amount: int):
+        '''
+        raises OverflowError if a transaction of amount inserted at row position takes a balance out of the int64 range
+        '''
+        balances = self.balances
+        # the new row starts from the balance before it and every later row moves by amount
+        affected = balances[position:]
+        affected.append(balances[position - 1] if position else 0)
+        if not (INT64_MIN <= amount <= INT64_MAX and INT64_MIN <= min(affected) + amount and max(affected) + amount <= INT64_MAX):
+            raise OverflowError("transaction takes the balance of the account out of the int64 range")
+
+    def balance_at(self, time_at: int) -> int | None:
+        '''
+        returns the balance of the account after every transaction up to and including time_at
+
+        Parameters:
+        ----------
+        time_at (int): the timestamp of where you want to check balance
+
+        Returns:
+        ---------
+        (int): total money in the account at time_at
+        None: the account was not open yet at time_at
+        '''
+        # most queries ask for the current balance, which is the last row
+        if self.timestamps[-1] <= time_at:
+            return self.balances[-1]
+
+        position = bisect_right(self.timestamps, time_at)
+        if not position:
+            return None
+        return self.balances[position - 1]
+
+class MappedLedger(Ledger):
+    """
+    Ledger of an account loaded from a snapshot, its columns are decoded the first time they are used
+
+    Until then the ledger only holds its position in the snapshot, so loading a snapshot doesn't read any
+    transaction history and accounts that are never used again are never decoded.
+    """
+
+    def __init__(self, snapshot, index: int):
+        self._snapshot = snapshot
+        self._index = index
+
+    def __getattr__(self, name: str):
+        # only called for attributes that are not set yet, i.e. before the columns are decoded
+        if name not in ('timestamps', 'amounts', 'balances', 'kinds') or '_snapshot' not in self.__dict__:
+            raise AttributeError(name)
+
+        self.timestamps, self.amounts, self.kinds = self._snapshot.ledger_columns(self._index)
+        self.balances = array('q', accumulate(self.amounts))
+        del self._snapshot
+        return getattr(self, name)
+
+    def columns(self) -> tuple:
+        '''
+        returns the (timestamps, amounts, kinds) columns of the ledger, without decoding them if they are still in the snapshot
+        '''
+        if '_snapshot' in self.__dict__:
+            return self._snapshot.ledger_buffers(self._index)
+        return self.timestamps, self.amounts, self.kinds
+
+class LedgerVersion:
+    """
+    Read-only version of a ledger as it was when it had a given number of rows
+
+    Transactions are almost always appended, which leaves the first rows of the columns untouched, so a version
+    shares the columns of the ledger and only reads up to its row count. Only a transaction inserted before
+    existing rows changes rows a version can see, detached makes a copy of the rows for that case.
+
+    Attributes
+    ----------
+    ledger : Ledger
+        Stores the ledger whose columns the version reads
+    rows : int
+        Stores the number of rows of the ledger that belong to the version
+    """
+
+    def __init__(self, ledger: Ledger, rows: int):
+        self.ledger = ledger
+        self.rows = rows
+
+    def balance_at(self, time_at: int) -> int | None:
+        '''
+        returns the balance of the account at time_at as seen by this version, see Ledger.balance_at
+        '''
+        position = bisect_right(self.ledger.timestamps, time_at, 0, self.rows)
+        if not position:
+            return None
+        return self.ledger.balances[position - 1]
+
+    def detached(self) -> 'LedgerVersion':
+        '''
+        returns the same version with its own copy of the rows, so the ledger can be changed anywhere
+        '''
+        ledger = Ledger.__new__(Ledger)
+        ledger.timestamps = self.ledger.timestamps[:self.rows]
+        ledger.amounts = self.ledger.amounts[:self.rows]
+        ledger.balances = self.ledger.balances[:self.rows]
+        ledger.kinds = self.ledger.kinds[:self.rows]
+        return LedgerVersion(ledger, self.rows)
@@ -0,0 +1,147 @@
+from typing import NamedTuple
+
+class CreateAccount(NamedTuple):
+    """
+    `create_account` call
+    """
+    timestamp: int
+    account_id: str
+
+class Deposit(NamedTuple):
+    """
+    `deposit` call
+    """
+    timestamp: int
+    account_id: str
+    amount: int
+
+class Transfer(NamedTuple):
+    """
+    `transfer` call
+    """
+    timestamp: int
+    source_account_id: str
+    target_account_id: str
+    amount: int
+
+class TopSpenders(NamedTuple):
+    """
+    `top_spenders` call
+    """
+    timestamp: int
+    n: int
+
+class Pay(NamedTuple):
+    """
+    `pay` call
+    """
+    timestamp: int
+    account_id: str
+    amount: int
+
+class GetPaymentStatus(NamedTuple):
+    """
+    `get_payment_status` call
+    """
+    timestamp: int
+    account_id: str
+    payment: str
+
+class MergeAccounts(NamedTuple):
+    """
+    `merge_accounts` call
+    """
+    timestamp: int
+    account_id_1: str
+    account_id_2: str
+
+class GetBalance(NamedTuple):
+    """
+    `get_balance` call
+    """
+    timestamp: int
+    account_id: str
+    time_at: int
+
+# operation type : name of the BankingSystem method it calls, fields are in the same order as the method arguments
+METHODS = {
+    CreateAccount: 'create_account',
+    Deposit: 'deposit',
+    Transfer: 'transfer',
+    TopSpenders: 'top_spenders',
+    Pay: 'pay',
+    GetPaymentStatus: 'get_payment_status',
+    MergeAccounts: 'merge_accounts',
+    GetBalance: 'get_balance',
+}
+
+# name of a BankingSystem method : operation type
+OPERATIONS = {method: operation for operation, method in METHODS.items()}
+
+class BatchError(Exception):
+    """
+    Raised by execute_batch when an operation of the batch raises, the exception of the operation is the __cause__
+
+    Operations are applied in timestamp order, the ones before the failing operation were applied and the ones
+    after it were not, so a caller can carry on after the failing operation without applying any of them twice.
+
+    Attributes
+    ----------
+    results : list
+        Stores the result of every operation applied before the failing one, None for the others, in the order
+        the operations were given
+    failed : int
+        Stores the index of the failing operation in the batch
+    """
+
+    def __init__(self, results: list, failed: int):
+        # both are passed on as args, so the error can be pickled, e.g. by a worker process
+        super().__init__(results, failed)
+        self.results = results
+        self.failed = failed
+
+    def __str__(self) -> str:
+        return f"operation {self.failed} of the batch failed: {self.__cause__!r}"
+
+def apply(system, operation):
+    '''
+    calls the BankingSystem method of an operation
+
+    Parameters:
+    ----------
+    system (BankingSystem): banking system the operation is applied to
+    operation (NamedTuple): one of the operation types of this module
+
+    Returns:
+    ---------
+    the result of the BankingSystem method
+    '''
+    return getattr(system, METHODS[type(operation)])(*operation)
+
+def parse(method: str, arguments) -> NamedTuple:
+    '''
+    builds an operation from a method name and its arguments, e.g. from a line of an operation log
+
+    Parameters:
+    ----------
+    method (str): name of the BankingSystem method, in any case (example: deposit or DEPOSIT)
+    arguments (iterable): arguments of the method in order, numbers may be given as strings
+
+    Returns:
+    ---------
+    (NamedTuple): the operation
+
+    Raises:
+    ---------
+    ValueError: method is unknown or the arguments don't match the method
+    '''
+    operation = OPERATIONS.get(method.lower())
+    if operation is None:
+        raise ValueError(f"unknown operation {method!r}")
+
+    arguments = list(arguments)
+    if len(arguments) != len(operation._fields):
+        raise ValueError(f"{method} takes {len(operation._fields)} arguments, got {len(arguments)}")
+
+    types = operation.__annotations__.values()
+    return operation._make(int(value) if kind is int else str(value) for kind, value in zip(types, arguments))
@@ -0,0 +1,158 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+class PaymentRegistry:
+    """
+    Compact record of every payment, indexed by the ordinal number in its payment id
+
+    A payment is one row across two int64 arrays instead of a "paymentN" string key and a
+    tuple, the id string is only built when a payment is returned. Payments are also indexed
+    per account node so the payments of one account can be listed without a full scan.
+    Payments are expected in timestamp order, like every other operation of the system.
+
+    Attributes
+    ----------
+    timestamps : array
+        Stores the timestamp of every payment, payment N is at position N - 1
+    nodes : array
+        Stores the account node that made every payment, payment N is at position N - 1
+    """
+
+    def __init__(self):
+        self.timestamps = array('q')
+        self.nodes = array('q')
+        self._node_payments = {} # node : array of ordinals in ascending order
+        # payments loaded from a snapshot, ordinals of node N are _loaded_ordinals[_loaded_offsets[N]:_loaded_offsets[N + 1]]
+        self._loaded_offsets = array('q', [0])
+        self._loaded_ordinals = array('q')
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def add(self, timestamp: int, node: int) -> int:
+        '''
+        records a new payment
+
+        Parameters:
+        ----------
+        timestamp (int): time of the payment
+        node (int): node of the account that made the payment
+
+        Returns:
+        ---------
+        (int): ordinal number of the payment, the payment id is f"payment{ordinal}"
+        '''
+        self.timestamps.append(timestamp)
+        self.nodes.append(node)
+        ordinal = len(self.timestamps)
+
+        if node not in self._node_payments:
+            self._node_payments[node] = array('q')
+        self._node_payments[node].append(ordinal)
+        return ordinal
+
+    def ordinal(self, payment: str) -> int | None:
+        '''
+        returns the ordinal number of a payment id
+
+        Parameters:
+        ----------
+        payment (str): payment id (example: payment3)
+
+        Returns:
+        ---------
+        (int): ordinal number of the payment
+        None: payment is not the id of a recorded payment
+        '''
+        digits = payment[7:]
+        if not payment.startswith('payment') or not digits.isascii() or not digits.isdigit() or digits[0] == '0':
+            return None
+
+        ordinal = int(digits)
+        if ordinal > len(self.timestamps):
+            return None
+        return ordinal
+
+    def status(self, ordinal: int, timestamp: int) -> str:
+        '''
+        returns the status of a payment at timestamp, which only depends on when its cashback is due
+
+        Parameters:
+        ----------
+        ordinal (int): ordinal number of the payment
+        timestamp (int): the current time
+
+        Returns:
+        ---------
+        (str): "IN_PROGRESS" if the cashback has not been received
+        (str): "CASHBACK_RECEIVED" if the cashback has been received
+        '''
+        if timestamp < self.timestamps[ordinal - 1] + 86400000:
+            return "IN_PROGRESS"
+        else:
+            return "CASHBACK_RECEIVED"
+
+    def node_payments(self, node: int, since: int, until: int) -> array:
+        '''
+        returns the payments a node made between since and until
+
+        Parameters:
+        ----------
+        node (int): node of the account that made the payments
+        since (int): earliest timestamp of a returned payment
+        until (int): latest timestamp of a returned payment
+
+        Returns:
+        ---------
+        (array): ordinal numbers of the payments in ascending order
+        '''
+        ordinals = self._ordinals(node)
+
+        # ordinals of one node are in timestamp order, so the range is found with two bisects
+        timestamp_of = lambda ordinal: self.timestamps[ordinal - 1]
+        first = bisect_left(ordinals, since, key=timestamp_of)
+        last = bisect_right(ordinals, until, key=timestamp_of)
+        return ordinals[first:last]
+
+    def columns(self, node_count: int) -> tuple[array, array, array, array]:
+        '''
+        returns the registry as columns that can be saved in a snapshot
+
+        Parameters:
+        ----------
+        node_count (int): number of account nodes
+
+        Returns:
+        ---------
+        (tuple): (timestamps, nodes, offsets, ordinals), the ordinals of every node in ascending order are
+            ordinals[offsets[node]:offsets[node + 1]]
+        '''
+        offsets = array('q', [0])
+        ordinals = array('q')
+        for node in range(node_count):
+            ordinals.extend(self._ordinals(node))
+            offsets.append(len(ordinals))
+        return self.timestamps, self.nodes, offsets, ordinals
+
+    @classmethod
+    def from_columns(cls, timestamps: array, nodes: array, offsets: array, ordinals: array) -> 'PaymentRegistry':
+        '''
+        rebuilds a registry from the columns returned by columns, the per node index is not unpacked
+        '''
+        registry = cls()
+        registry.timestamps = timestamps
+        registry.nodes = nodes
+        registry._loaded_offsets = offsets
+        registry._loaded_ordinals = ordinals
+        return registry
+
+    def _ordinals(self, node: int) -> array:
+        '''
+        returns the ordinals of every payment of a node in ascending order
+        '''
+        ordinals = self._node_payments.get(node, array('q'))
+
+        # payments loaded from a snapshot were all made before the payments recorded since
+        if node + 1 < len(self._loaded_offsets):
+            ordinals = self._loaded_ordinals[self._loaded_offsets[node]:self._loaded_offsets[node + 1]] + ordinals
+        return ordinals
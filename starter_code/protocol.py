@@ -0,0 +1,160 @@
+import asyncio
+import struct
+from wal import CODES, CODE_OF
+
+# A frame is a little endian uint32 payload length followed by the payload.
+#
+# A request payload is the code of the operation (its index in wal.CODES) as one byte followed by the fields of
+# the operation in order, integers as int64 and strings as a uint32 byte length followed by UTF-8.
+#
+# A response payload is a tag byte followed by the value: nothing for NONE, FALSE and TRUE, an int64 for INT, a
+# string for STR and ERROR, a uint32 count followed by that many strings for LIST. Responses are sent in the
+# order the requests of a connection were received, so a client can pipeline requests without tagging them.
+
+NONE, FALSE, TRUE, INT, STR, LIST, ERROR = range(7)
+
+MAX_FRAME = 1 << 20
+
+_LENGTH = struct.Struct('<I')
+_INT = struct.Struct('<q')
+_CODE = struct.Struct('<B')
+
+# code : True for every int field of the operation with that code, False for every string field
+_FIELD_TYPES = tuple(tuple(kind is int for kind in operation.__annotations__.values()) for operation in CODES)
+
+class ProtocolError(ValueError):
+    """
+    Malformed frame, the connection it was received on can't be read any further
+    """
+
+def _pack_string(value: str) -> bytes:
+    encoded = value.encode()
+    return _LENGTH.pack(len(encoded)) + encoded
+
+def _unpack_string(payload: bytes, offset: int) -> tuple[str, int]:
+    (length,) = _LENGTH.unpack_from(payload, offset)
+    offset += _LENGTH.size
+    if offset + length > len(payload):
+        raise ProtocolError("string runs past the end of the frame")
+    return payload[offset:offset + length].decode(), offset + length
+
+def frame(payload: bytes) -> bytes:
+    '''
+    prefixes a payload with its length
+    '''
+    return _LENGTH.pack(len(payload)) + payload
+
+async def read_frame(reader) -> bytes | None:
+    '''
+    reads the payload of the next frame from an asyncio stream, None once the stream is closed between frames
+
+    Raises:
+    ---------
+    ProtocolError: the frame is larger than MAX_FRAME or the stream is closed in the middle of it
+    '''
+    try:
+        header = await reader.readexactly(_LENGTH.size)
+    except asyncio.IncompleteReadError as error:
+        if error.partial:
+            raise ProtocolError("stream closed in the middle of a frame header") from error
+        return None
+    (length,) = _LENGTH.unpack(header)
+    if length > MAX_FRAME:
+        raise ProtocolError(f"frame of {length} bytes is larger than {MAX_FRAME} bytes")
+    try:
+        return await reader.readexactly(length)
+    except asyncio.IncompleteReadError as error:
+        raise ProtocolError("stream closed in the middle of a frame") from error
+
+def encode_request(operation) -> bytes:
+    '''
+    encodes an operation from the operations module as a request payload, e.g. Deposit(3, 'account1', 100)
+    '''
+    code = CODE_OF[type(operation)]
+    parts = [_CODE.pack(code)]
+    for is_int, value in zip(_FIELD_TYPES[code], operation):
+        parts.append(_INT.pack(value) if is_int else _pack_string(value))
+    return b''.join(parts)
+
+def decode_request(payload: bytes):
+    '''
+    decodes a request payload into an operation
+
+    Raises:
+    ---------
+    ProtocolError: the payload is not a valid request
+    '''
+    try:
+        code = payload[0]
+        if code >= len(CODES):
+            raise ProtocolError(f"unknown operation code {code}")
+        fields = []
+        offset = _CODE.size
+        for is_int in _FIELD_TYPES[code]:
+            if is_int:
+                fields.append(_INT.unpack_from(payload, offset)[0])
+                offset += _INT.size
+            else:
+                value, offset = _unpack_string(payload, offset)
+                fields.append(value)
+    except (IndexError, struct.error, UnicodeDecodeError) as error:
+        raise ProtocolError(f"malformed request: {error}") from error
+    if offset != len(payload):
+        raise ProtocolError("trailing bytes after the request")
+    return CODES[code]._make(fields)
+
+def encode_response(value) -> bytes:
+    '''
+    encodes the result of a BankingSystem method as a response payload, exceptions are encoded as ERROR
+    '''
+    if value is None:
+        return _CODE.pack(NONE)
+    if value is True:
+        return _CODE.pack(TRUE)
+    if value is False:
+        return _CODE.pack(FALSE)
+    if isinstance(value, int):
+        return _CODE.pack(INT) + _INT.pack(value)
+    if isinstance(value, str):
+        return _CODE.pack(STR) + _pack_string(value)
+    if isinstance(value, BaseException):
+        return _CODE.pack(ERROR) + _pack_string(f"{type(value).__name__}: {value}")
+    return _CODE.pack(LIST) + _LENGTH.pack(len(value)) + b''.join(map(_pack_string, value))
+
+def decode_response(payload: bytes):
+    '''
+    decodes a response payload, an ERROR response is returned as a RemoteError
+
+    Raises:
+    ---------
+    ProtocolError: the payload is not a valid response
+    '''
+    try:
+        tag = payload[0]
+        if tag == NONE:
+            return None
+        if tag == TRUE:
+            return True
+        if tag == FALSE:
+            return False
+        if tag == INT:
+            return _INT.unpack_from(payload, _CODE.size)[0]
+        if tag == STR:
+            return _unpack_string(payload, _CODE.size)[0]
+        if tag == ERROR:
+            return RemoteError(_unpack_string(payload, _CODE.size)[0])
+        if tag == LIST:
+            (count,) = _LENGTH.unpack_from(payload, _CODE.size)
+            values, offset = [], _CODE.size + _LENGTH.size
+            for _ in range(count):
+                value, offset = _unpack_string(payload, offset)
+                values.append(value)
+            return values
+    except (IndexError, struct.error, UnicodeDecodeError) as error:
+        raise ProtocolError(f"malformed response: {error}") from error
+    raise ProtocolError(f"unknown response tag {tag}")
+
+class RemoteError(Exception):
+    """
+    Error raised by the server while it handled a request
+    """
@@ -0,0 +1,229 @@
+import argparse
+import csv
+import gzip
+import importlib
+import json
+import sys
+import time
+import operations
+
+def open_trace(path: str, mode: str = 'rt'):
+    '''
+    opens an operation log for streaming, logs ending in .gz are decompressed on the fly
+
+    Parameters:
+    ----------
+    path (str): path of the operation log
+    mode (str): 'rt' to read or 'wt' to write
+
+    Returns:
+    ---------
+    text file object
+    '''
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+def parse_jsonl(lines):
+    '''
+    parses operations from JSON lines, one operation per line, either as a list of the method name
+    followed by its arguments or as an object with an "operation" key and the argument names
+
+    e.g. ["deposit", 3, "account1", 100] or {"operation": "deposit", "timestamp": 3, "account_id": "account1", "amount": 100}
+
+    Parameters:
+    ----------
+    lines (iterable): lines of the operation log
+
+    Returns:
+    ---------
+    generator of operations, blank lines and lines starting with # are skipped
+    '''
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        try:
+            record = json.loads(line)
+            if isinstance(record, list):
+                yield operations.parse(record[0], record[1:])
+            else:
+                method = record['operation']
+                operation = operations.OPERATIONS.get(method.lower())
+                if operation is None:
+                    raise ValueError(f"unknown operation {method!r}")
+                yield operations.parse(method, [record[field] for field in operation._fields])
+        except (KeyError, IndexError, TypeError, ValueError) as error:
+            raise ValueError(f"line {number}: {error}") from error
+
+def parse_csv(lines):
+    '''
+    parses operations from CSV rows of the method name followed by its arguments
+
+    e.g. DEPOSIT,3,account1,100
+
+    Parameters:
+    ----------
+    lines (iterable): lines of the operation log
+
+    Returns:
+    ---------
+    generator of operations, empty rows and rows starting with # are skipped
+    '''
+    for number, row in enumerate(csv.reader(lines), 1):
+        if not row or row[0].startswith('#'):
+            continue
+
+        try:
+            yield operations.parse(row[0], row[1:])
+        except ValueError as error:
+            raise ValueError(f"line {number}: {error}") from error
+
+def read_operations(path: str, format: str | None = None):
+    '''
+    streams the operations of an operation log without loading it into memory
+
+    Parameters:
+    ----------
+    path (str): path of the operation log
+    format (str): 'jsonl' or 'csv', by default picked from the file extension
+
+    Returns:
+    ---------
+    generator of operations
+    '''
+    if format is None:
+        format = 'csv' if path.removesuffix('.gz').endswith('.csv') else 'jsonl'
+    parse = parse_csv if format == 'csv' else parse_jsonl
+
+    with open_trace(path) as lines:
+        yield from parse(lines)
+
+def batched(stream, size: int):
+    '''
+    groups a stream of operations into lists of at most size operations
+    '''
+    batch = []
+    for operation in stream:
+        batch.append(operation)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class ReplayStats:
+    """
+    Throughput and latency of a replay
+
+    Attributes
+    ----------
+    counts : dict
+        Stores the number of replayed operations per method
+    total_ns : dict
+        Stores the total time spent per method, only when operations are replayed one by one
+    max_ns : dict
+        Stores the slowest call per method, only when operations are replayed one by one
+    elapsed : float
+        Stores the wall clock time of the replay in seconds, including parsing
+    """
+
+    def __init__(self):
+        self.counts = {} # method : number of operations
+        self.total_ns = {} # method : total nanoseconds
+        self.max_ns = {} # method : slowest call in nanoseconds
+        self.elapsed = 0.0
+
+    @property
+    def operations(self) -> int:
+        return sum(self.counts.values())
+
+    def record(self, method: str, elapsed_ns: int | None = None):
+        '''
+        counts one replayed operation of method, with its latency if it was timed on its own
+        '''
+        self.counts[method] = self.counts.get(method, 0) + 1
+        if elapsed_ns is not None:
+            self.total_ns[method] = self.total_ns.get(method, 0) + elapsed_ns
+            self.max_ns[method] = max(self.max_ns.get(method, 0), elapsed_ns)
+
+    def report(self) -> str:
+        '''
+        returns a human readable summary of the replay
+        '''
+        rate = self.operations / self.elapsed if self.elapsed else 0.0
+        lines = [
+            f"replayed {self.operations} operations in {self.elapsed:.2f} s ({rate:.0f} ops/sec)",
+            f"{'operation':<20}{'count':>12}{'mean us':>12}{'max us':>12}",
+        ]
+        for method, count in sorted(self.counts.items()):
+            if method in self.total_ns:
+                lines.append(f"{method:<20}{count:>12}{self.total_ns[method] / count / 1000:>12.2f}{self.max_ns[method] / 1000:>12.2f}")
+            else:
+                lines.append(f"{method:<20}{count:>12}{'-':>12}{'-':>12}")
+        return '\n'.join(lines)
+
+def replay(system, stream, output=None, batch_size: int = 0) -> ReplayStats:
+    '''
+    applies a stream of operations to a banking system
+
+    Parameters:
+    ----------
+    system (BankingSystem): banking system the operations are applied to
+    stream (iterable): operations from the operations module
+    output (file): text file the JSON encoded result of every operation is written to, one per line
+    batch_size (int): if positive, operations are applied with system.execute_batch in batches of this size,
+        per operation latencies are not measured in that case
+
+    Returns:
+    ---------
+    (ReplayStats): throughput and latency of the replay
+    '''
+    stats = ReplayStats()
+    start = time.perf_counter()
+
+    if batch_size > 0:
+        for batch in batched(stream, batch_size):
+            results = system.execute_batch(batch)
+            for operation in batch:
+                stats.record(operations.METHODS[type(operation)])
+            if output is not None:
+                output.writelines(json.dumps(result) + '\n' for result in results)
+    else:
+        clock = time.perf_counter_ns
+        for operation in stream:
+            method = operations.METHODS[type(operation)]
+            call = getattr(system, method)
+            started = clock()
+            result = call(*operation)
+            stats.record(method, clock() - started)
+            if output is not None:
+                output.write(json.dumps(result) + '\n')
+
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Replay an operation log through a banking system implementation.')
+    parser.add_argument('trace', help='operation log in JSON lines or CSV format, optionally gzip compressed')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help='format of the operation log, by default picked from its extension')
+    parser.add_argument('--engine', default='banking_system_impl_columnar', help='module providing BankingSystemImpl (default: %(default)s)')
+    parser.add_argument('--output', help='file the result of every operation is written to, one JSON value per line')
+    parser.add_argument('--batch-size', type=int, default=0, help='apply operations with execute_batch in batches of this size')
+    args = parser.parse_args(argv)
+
+    system = importlib.import_module(args.engine).BankingSystemImpl()
+    stream = read_operations(args.trace, args.format)
+
+    if args.output is None:
+        stats = replay(system, stream, batch_size=args.batch_size)
+    else:
+        with open_trace(args.output, 'wt') as output:
+            stats = replay(system, stream, output, args.batch_size)
+
+    print(stats.report())
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
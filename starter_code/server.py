@@ -0,0 +1,220 @@
+import argparse
+import asyncio
+import importlib
+import os
+import sys
+import operations
+import protocol
+from operations import BatchError
+from protocol import ProtocolError
+
+class BankingServer:
+    """
+    asyncio server exposing a banking system over TCP or a Unix socket with the protocol of the protocol module
+
+    Every connection can have up to max_in_flight requests waiting for their responses. Once that many are
+    waiting the connection is no longer read, so a client sending faster than the server answers, or reading
+    its responses slower than they are written, is held back by the transport instead of filling memory.
+
+    Requests of every connection go into one queue, and the requests queued while the engine was busy are
+    applied together with execute_batch. Under light load a batch holds one request, under heavy load the cost
+    of a call into the engine is shared by up to max_batch requests. execute_batch applies a batch in timestamp
+    order, so requests that are in flight at the same time must not depend on each other's order beyond their
+    timestamps. If an operation of a batch raises, its request is answered with the error. An engine that raises
+    BatchError says which operations it applied, the requests after the failing one are then applied one at a
+    time, any other exception is sent back to every request of the batch. No request is ever applied twice.
+
+    Attributes
+    ----------
+    system : BankingSystem
+        Stores the banking system, it has to support execute_batch
+    max_batch : int
+        Stores the largest number of requests applied with one execute_batch call
+    max_in_flight : int
+        Stores the largest number of requests of one connection waiting for their response
+    batches : int
+        Stores the number of execute_batch calls
+    requests : int
+        Stores the number of requests applied
+    """
+
+    def __init__(self, system, max_batch: int = 1024, max_in_flight: int = 256):
+        self.system = system
+        self.max_batch = max_batch
+        self.max_in_flight = max_in_flight
+        self.batches = 0
+        self.requests = 0
+        self._queue = None # (operation, future) of every request waiting for the engine
+        self._engine = None
+        self._server = None
+        self._connections = {} # task serving a connection : its reader
+
+    async def start(self, host: str | None = None, port: int | None = None, path: str | None = None):
+        '''
+        starts listening on a TCP host and port, or on a Unix socket if path is given
+        '''
+        self._queue = asyncio.Queue()
+        self._engine = asyncio.create_task(self._apply_batches())
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._serve, path)
+        else:
+            self._server = await asyncio.start_server(self._serve, host, port)
+        return self
+
+    @property
+    def sockets(self):
+        return self._server.sockets
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        '''
+        stops listening and closes every connection once the requests it already sent are answered
+        '''
+        self._server.close()
+        for reader in self._connections.values():
+            reader.feed_eof()
+        await asyncio.gather(*self._connections)
+        await self._server.wait_closed()
+        self._engine.cancel()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _serve(self, reader, writer):
+        '''
+        reads the requests of a connection while a second task writes their responses in the same order
+        '''
+        # the bound of this queue is the backpressure, put blocks once max_in_flight responses are outstanding
+        responses = asyncio.Queue(self.max_in_flight)
+        responder = asyncio.create_task(self._respond(responses, writer))
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        self._connections[task] = reader
+        try:
+            while True:
+                payload = await protocol.read_frame(reader)
+                if payload is None:
+                    break
+                future = loop.create_future()
+                try:
+                    operation = protocol.decode_request(payload)
+                except ProtocolError as error:
+                    future.set_result(error)
+                else:
+                    self._queue.put_nowait((operation, future))
+                await responses.put(future)
+        except (ProtocolError, ConnectionError):
+            # the stream can't be resynchronized after a torn frame, so the connection is dropped
+            pass
+        finally:
+            await responses.put(None)
+            await responder
+            writer.close()
+            del self._connections[task]
+
+    async def _respond(self, responses: asyncio.Queue, writer):
+        '''
+        writes the response of every request of a connection as soon as it and every request before it are answered
+        '''
+        while True:
+            future = await responses.get()
+            if future is None:
+                return
+            result = await future
+            try:
+                payload = protocol.encode_response(result)
+            except Exception as error:
+                # a result the protocol can't carry, e.g. an int outside int64, is answered with an error in its place
+                payload = protocol.encode_response(error)
+            try:
+                writer.write(protocol.frame(payload))
+                if responses.empty():
+                    # waiting for the transport only when no more responses are ready lets pipelined responses share a write
+                    await writer.drain()
+            except ConnectionError:
+                # the client is gone, the remaining responses are dropped but the requests are still applied
+                pass
+
+    async def _apply_batches(self):
+        '''
+        applies every request queued since the last batch with one execute_batch call
+        '''
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            batch_operations = [operation for operation, _ in batch]
+            try:
+                results = self.system.execute_batch(batch_operations)
+            except BatchError as error:
+                results = self._resume(batch_operations, error)
+            except Exception as error:
+                # it is not known which requests were applied, so none of them is applied again
+                results = [error] * len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+                queue.task_done()
+            self.batches += 1
+            self.requests += len(batch)
+            # the engine runs on the event loop, so it gives connections a turn to read and write between batches
+            await asyncio.sleep(0)
+
+    def _resume(self, batch: list, error: BatchError) -> list:
+        '''
+        answers the failing request of a batch with its error and applies the requests execute_batch didn't
+        get to one at a time in timestamp order, so every request gets its own result
+        '''
+        results = list(error.results)
+        results[error.failed] = error.__cause__
+        order = sorted(range(len(batch)), key=lambda i: batch[i].timestamp)
+        for i in order[order.index(error.failed) + 1:]:
+            try:
+                results[i] = operations.apply(self.system, batch[i])
+            except Exception as failure:
+                results[i] = failure
+        return results
+
+async def serve(system, host: str | None = None, port: int | None = None, path: str | None = None, **options):
+    '''
+    runs a BankingServer until it is cancelled
+
+    Parameters:
+    ----------
+    system (BankingSystem): banking system supporting execute_batch
+    host (str): TCP host to listen on
+    port (int): TCP port to listen on
+    path (str): Unix socket to listen on instead of TCP
+    options: max_batch and max_in_flight of the BankingServer
+    '''
+    server = await BankingServer(system, **options).start(host, port, path)
+    async with server:
+        await server.serve_forever()
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Serve a banking system over TCP or a Unix socket.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7878)
+    parser.add_argument('--unix', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--engine', default='banking_system_impl_columnar', help='module providing BankingSystemImpl (default: %(default)s)')
+    parser.add_argument('--max-batch', type=int, default=1024)
+    parser.add_argument('--max-in-flight', type=int, default=256)
+    args = parser.parse_args(argv)
+
+    system = importlib.import_module(args.engine).BankingSystemImpl()
+    if args.unix is not None and os.path.exists(args.unix):
+        os.unlink(args.unix)
+    try:
+        asyncio.run(serve(system, args.host, args.port, args.unix, max_batch=args.max_batch, max_in_flight=args.max_in_flight))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+from array import array
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b'BANKSNAP'
+VERSION = 2
+
+# sections of a snapshot in the order they are stored, every section except node_ids and kinds is a little endian int64 column
+SECTIONS = (
+    'node_ids', # account_id of every node, UTF-8 separated by NUL bytes
+    'node_parents', # node every node was merged into
+    'node_children', # (parent, child) pairs of every merge, in the order of the merges
+    'account_nodes', # node of every account, accounts are stored in node order
+    'row_starts', # first ledger row of every account, followed by the total number of rows
+    'total_spend', # total spend of every account
+    'merged_at', # merge timestamp of every account, NOT_MERGED if it was not merged away
+    'timestamps', # ledger timestamps of every account, one after the other
+    'amounts', # ledger amounts of every account, one after the other
+    'leaderboard', # index of every account that was not merged away, in leaderboard order
+    'payment_timestamps',
+    'payment_nodes',
+    'payment_offsets', # ordinals of node N are payment_ordinals[payment_offsets[N]:payment_offsets[N + 1]]
+    'payment_ordinals',
+    'cashback_due',
+    'cashback_ordinals',
+    'cashback_amounts',
+    'kinds', # ledger event kind of every row, one byte per row, in the same order as timestamps
+)
+
+NOT_MERGED = -1 << 63
+
+_HEADER = struct.Struct('<8sII') # magic, version, number of sections
+_SECTION = struct.Struct('<QQ') # offset, length in bytes
+
+def _little_endian(column: array) -> array:
+    '''
+    returns a column in the byte order of the snapshot format
+    '''
+    if sys.byteorder == 'big' and column.itemsize > 1:
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+def write_snapshot(path: str, sections: dict):
+    '''
+    writes a snapshot file, the file is replaced atomically so a crash never leaves a partial snapshot behind
+
+    Parameters:
+    ----------
+    path (str): path of the snapshot file
+    sections (dict): name of every section in SECTIONS : list of bytes-like chunks that make up the section
+    '''
+    table = []
+    position = _HEADER.size + _SECTION.size * len(SECTIONS)
+    temporary = path + '.tmp'
+
+    with open(temporary, 'wb') as snapshot:
+        snapshot.seek(position)
+        for name in SECTIONS:
+            length = 0
+            for chunk in sections[name]:
+                # chunks that are not arrays are bytes of an earlier snapshot and already in the right byte order
+                if isinstance(chunk, array):
+                    chunk = _little_endian(chunk)
+                length += snapshot.write(chunk)
+            table.append((position, length))
+            position += length
+
+        snapshot.seek(0)
+        snapshot.write(_HEADER.pack(MAGIC, VERSION, len(SECTIONS)))
+        for offset, length in table:
+            snapshot.write(_SECTION.pack(offset, length))
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+
+    os.replace(temporary, path)
+
+class MappedSnapshot:
+    """
+    Snapshot file mapped into memory, sections are only read when they are decoded
+
+    Ledger columns stay in the mapping until an account is used, so the operating system only pages in
+    the histories that are actually needed.
+
+    Attributes
+    ----------
+    path : str
+        Path of the snapshot file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as snapshot:
+            self._map = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"{path} is not a snapshot")
+        magic, version, count = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snapshot")
+        if version != VERSION:
+            raise ValueError(f"{path} has snapshot version {version}, only version {VERSION} is supported")
+
+        self._sections = {} # name : (offset, length)
+        for i, name in enumerate(SECTIONS[:count]):
+            self._sections[name] = _SECTION.unpack_from(self._map, _HEADER.size + i * _SECTION.size)
+        self._row_starts = self.column('row_starts')
+
+    def section(self, name: str) -> memoryview:
+        '''
+        returns the bytes of a section without copying them
+        '''
+        offset, length = self._sections[name]
+        return self._view[offset:offset + length]
+
+    def column(self, name: str, start: int = 0, stop: int | None = None) -> array:
+        '''
+        decodes rows start to stop of an int64 section
+        '''
+        section = self.section(name)
+        if stop is None:
+            stop = len(section) // 8
+        column = array('q')
+        column.frombytes(section[start * 8:stop * 8])
+        if sys.byteorder == 'big':
+            column.byteswap()
+        return column
+
+    def strings(self, name: str, count: int) -> list[str]:
+        '''
+        decodes a section of count NUL separated strings
+        '''
+        return bytes(self.section(name)).decode().split('\0') if count else []
+
+    def ledger_columns(self, index: int) -> tuple[array, array, array]:
+        '''
+        decodes the (timestamps, amounts, kinds) columns of the account at index
+        '''
+        start, stop = self._row_starts[index], self._row_starts[index + 1]
+        kinds = array('B', self.section('kinds')[start:stop])
+        return self.column('timestamps', start, stop), self.column('amounts', start, stop), kinds
+
+    def ledger_buffers(self, index: int) -> tuple[memoryview, memoryview, memoryview]:
+        '''
+        returns the (timestamps, amounts, kinds) columns of the account at index as they are stored, without decoding them
+        '''
+        start, stop = self._row_starts[index], self._row_starts[index + 1]
+        return self.section('timestamps')[start * 8:stop * 8], self.section('amounts')[start * 8:stop * 8], self.section('kinds')[start:stop]
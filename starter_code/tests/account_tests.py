@@ -0,0 +1,89 @@
+import unittest
+import sys
+sys.path.insert(0, '../')
+from account import Account
+from banking_system_impl_lvl_4 import BankingSystemImpl
+
+
+class AccountTests(unittest.TestCase):
+    """
+    Tests for the account record of the level 4 banking system.
+    """
+
+    failureException = Exception
+
+    @classmethod
+    def setUp(cls):
+        cls.account = Account(1)
+        cls.system = BankingSystemImpl()
+
+    def test_account_case_01_cashback_is_added_when_due(self):
+        self.account.record(2, 100)
+        self.account.record(2, -50)
+        self.account.record(86400002, 1)
+        self.assertEqual(self.account.latest_balance(3), 50)
+        self.assertEqual(self.account.latest_balance(86400002), 51)
+        self.assertEqual(self.account.balance_at(86400001), 50)
+        self.assertEqual(self.account.timestamps, [1, 2, 86400002])
+        self.assertIsNone(self.account.balance_at(0))
+        self.assertFalse(hasattr(self.account, '__dict__'))
+
+    def test_account_case_02_backdated_transactions_update_later_balances(self):
+        self.account.record(10, 100)
+        self.account.record(5, 20)
+        self.assertEqual(self.account.balance_at(7), 20)
+        self.assertEqual(self.account.latest_balance(10), 120)
+        self.assertEqual(self.account.latest_balance(6), 20)
+
+    def test_account_case_03_merged_accounts_hand_over_their_payments(self):
+        self.assertTrue(self.system.create_account(1, 'account1'))
+        self.assertTrue(self.system.create_account(2, 'account2'))
+        self.assertEqual(self.system.deposit(3, 'account2', 1000), 1000)
+        self.assertEqual(self.system.pay(4, 'account2', 100), 'payment1')
+        self.assertTrue(self.system.merge_accounts(5, 'account1', 'account2'))
+        self.assertIsNone(self.system.get_balance(6, 'account2', 5))
+        self.assertEqual(self.system.get_balance(6, 'account2', 4), 900)
+        self.assertTrue(self.system.create_account(7, 'account2'))
+        self.assertEqual(self.system.deposit(8, 'account2', 300), 300)
+        self.assertEqual(self.system.pay(9, 'account2', 100), 'payment2')
+        self.assertTrue(self.system.merge_accounts(10, 'account1', 'account2'))
+        self.assertEqual(self.system.get_payment_status(11, 'account1', 'payment1'), 'IN_PROGRESS')
+        self.assertEqual(self.system.get_payment_status(11, 'account1', 'payment2'), 'IN_PROGRESS')
+        self.assertIsNone(self.system.get_payment_status(11, 'account2', 'payment2'))
+        self.assertEqual(self.system.node_parents, [0, 0, 0])
+        self.assertEqual(self.system.get_balance(86400010, 'account1', 86400010), 1104)
+        self.assertEqual(self.system.top_spenders(11, 2), ['account1(200)'])
+
+    def test_account_case_04_writes_after_payments_are_appended(self):
+        self.assertTrue(self.system.create_account(1, 'account1'))
+        self.assertEqual(self.system.deposit(2, 'account1', 100000), 100000)
+        for timestamp in range(3, 103):
+            self.assertEqual(self.system.pay(timestamp, 'account1', 100), f"payment{timestamp - 2}")
+
+        # cashback that is not due yet is not in the history, so the deposit is the last entry of the index
+        account = self.system.accounts['account1']
+        balances = list(account.balances)
+        self.assertEqual(self.system.deposit(103, 'account1', 5), 90005)
+        self.assertEqual(account.timestamps[-1], 103)
+        self.assertEqual(account.balances, balances + [90005])
+        self.assertEqual(len(self.system.cashback), 100)
+        self.assertEqual(self.system.deposit(86400003, 'account1', 5), 90012)
+        self.assertEqual(account.timestamps[-2:], [103, 86400003])
+        self.assertEqual(account.balances[-1] - account.balances[-2], 7)
+
+    def test_account_case_05_merges_are_resolved_through_the_alias_table(self):
+        for account_id in ('account1', 'account2', 'account3'):
+            self.assertTrue(self.system.create_account(1, account_id))
+            self.assertEqual(self.system.deposit(2, account_id, 1000), 1000)
+        self.assertEqual(self.system.pay(3, 'account3', 500), 'payment1')
+        self.assertTrue(self.system.merge_accounts(4, 'account2', 'account3'))
+        self.assertTrue(self.system.merge_accounts(5, 'account1', 'account2'))
+
+        # merges only link nodes, the payment record still names the node that made it
+        self.assertEqual(self.system.payment_history['payment1'], (3, 2))
+        self.assertEqual(self.system.node_parents, [0, 0, 1])
+        self.assertIsNone(self.system.get_payment_status(6, 'account3', 'payment1'))
+        self.assertIsNone(self.system.get_payment_status(6, 'account2', 'payment1'))
+        self.assertEqual(self.system.get_payment_status(6, 'account1', 'payment1'), 'IN_PROGRESS')
+        self.assertEqual(self.system.node_parents, [0, 0, 0])
+        self.assertEqual(self.system.get_balance(86400003, 'account1', 86400003), 2510)
@@ -0,0 +1,76 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.insert(0, '../')
+from banking_system_impl_columnar import BankingSystemImpl
+from banking_system_impl_lvl_4 import BankingSystemImpl as Level4BankingSystemImpl
+from ledger import KINDS, OPENED, DEPOSIT, TRANSFER_OUT, TRANSFER_IN, PAYMENT, CASHBACK, MERGE
+
+try:
+    import numpy
+    from analytics import LedgerFrame, DAY
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, 'the analytics module needs numpy')
+class AnalyticsTests(unittest.TestCase):
+    """
+    Tests for the vectorized ledger analytics of the columnar implementation.
+    """
+
+    failureException = Exception
+
+    @classmethod
+    def setUp(cls):
+        cls.system = BankingSystemImpl()
+        cls.system.create_account(1, 'account1')
+        cls.system.create_account(2, 'account2')
+        cls.system.deposit(1000, 'account1', 1000)
+        cls.system.pay(2000, 'account1', 200)
+        cls.system.transfer(3000, 'account1', 'account2', 100)
+        cls.system.pay(DAY + 5000, 'account2', 50)
+
+    def test_analytics_case_01_daily_flows(self):
+        flows = LedgerFrame.from_system(self.system, DAY + 6000).daily_flows()
+        rows = list(zip(*(flows[name].tolist() for name in ('nodes', 'days', 'inflow', 'outflow', 'cashback', 'net'))))
+        self.assertEqual(rows, [
+            (0, 0, 1000, 300, 0, 700),
+            (0, 1, 0, 0, 4, 4),
+            (1, 0, 100, 0, 0, 100),
+            (1, 1, 0, 50, 0, -50),
+        ])
+
+    def test_analytics_case_02_totals_by_kind_and_payment_sizes(self):
+        frame = LedgerFrame.from_system(self.system, DAY + 6000)
+        totals = frame.totals_by_kind()
+        self.assertEqual(totals.shape, (2, len(KINDS)))
+        self.assertEqual(totals[0].tolist(), [0, 1000, -100, 0, -200, 4, 0])
+        self.assertEqual(totals[1, TRANSFER_IN], 100)
+        counts, edges = frame.payment_histogram([0, 100, 1000])
+        self.assertEqual(counts.tolist(), [1, 1])
+        self.assertEqual(frame.kinds[frame.nodes == 0].tolist(), [OPENED, DEPOSIT, PAYMENT, TRANSFER_OUT, CASHBACK])
+
+    def test_analytics_case_03_cashback_liabilities_follow_merges_and_snapshots(self):
+        self.assertTrue(self.system.merge_accounts(DAY + 7000, 'account1', 'account2'))
+        frame = LedgerFrame.from_system(self.system, DAY + 8000)
+        self.assertEqual(frame.cashback_liabilities().tolist(), [1, 0])
+        self.assertEqual(int(frame.amounts[(frame.nodes == 0) & (frame.kinds == MERGE)].sum()), 50)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'banking.snapshot')
+            self.system.save_snapshot(path)
+            reloaded = BankingSystemImpl()
+            reloaded.load_snapshot(path)
+            loaded = LedgerFrame.from_system(reloaded, DAY + 8000)
+            for name in ('nodes', 'timestamps', 'amounts', 'kinds', 'pending_nodes', 'pending_amounts'):
+                self.assertEqual(getattr(loaded, name).tolist(), getattr(frame, name).tolist())
+            self.assertEqual(reloaded.get_balance(2 * DAY + 5000, 'account1', 2 * DAY + 5000), 755)
+            self.assertEqual(LedgerFrame.from_system(reloaded, 2 * DAY + 5000).cashback_liabilities().tolist(), [0, 0])
+
+    def test_analytics_case_04_other_engines_are_rejected(self):
+        system = Level4BankingSystemImpl()
+        system.create_account(1, 'account1')
+        with self.assertRaises(TypeError):
+            LedgerFrame.from_system(system, 2)
@@ -0,0 +1,92 @@
+import unittest
+import os
+import random
+import sys
+import tempfile
+sys.path.insert(0, '../')
+import coldstore
+import fuzz
+from account import Account, ColdAccount
+from banking_system_impl_lvl_4 import BankingSystemImpl
+
+DAY = coldstore.DAY
+
+
+class ColdStoreTests(unittest.TestCase):
+    """
+    Tests for evicting dormant accounts of the level 4 banking system to a cold store.
+    """
+
+    failureException = Exception
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'accounts.cold')
+        self.system = BankingSystemImpl()
+        self.store = coldstore.attach(self.system, self.path, idle=DAY)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_coldstore_case_01_stub_answers_current_balances(self):
+        self.assertTrue(self.system.create_account(1, 'account1'))
+        self.assertTrue(self.system.create_account(2, 'account2'))
+        self.assertEqual(self.system.deposit(3, 'account1', 1000), 1000)
+        self.assertEqual(self.system.pay(4, 'account1', 500), 'payment1')
+
+        # the cashback of account1 is due at DAY + 4, paying it out reads the evicted account back
+        self.assertEqual(self.system.deposit(2 * DAY, 'account2', 10), 10)
+        self.assertIsInstance(self.system.accounts['account1'], Account)
+        self.assertEqual(self.store.loads, 1)
+        self.assertEqual(self.system.deposit(4 * DAY, 'account2', 10), 20)
+        self.assertIsInstance(self.system.accounts['account1'], ColdAccount)
+
+        self.assertEqual(self.system.get_balance(4 * DAY + 1, 'account1', 4 * DAY + 1), 510)
+        self.assertEqual(self.store.loads, 1)
+        self.assertEqual(self.system.top_spenders(4 * DAY + 2, 1), ['account1(500)'])
+        self.assertEqual(self.system.get_payment_status(4 * DAY + 3, 'account1', 'payment1'), 'CASHBACK_RECEIVED')
+        self.assertEqual(self.system.debug_stats()['accounts'], {'open': 2, 'merged': 0, 'cold': 1})
+
+    def test_coldstore_case_02_history_is_read_back_when_needed(self):
+        self.assertTrue(self.system.create_account(1, 'account1'))
+        self.assertTrue(self.system.create_account(2, 'account2'))
+        self.assertEqual(self.system.deposit(3, 'account1', 1000), 1000)
+        self.assertEqual(self.system.deposit(3 * DAY, 'account2', 10), 10)
+        self.assertIsInstance(self.system.accounts['account1'], ColdAccount)
+
+        self.assertEqual(self.system.get_balance(3 * DAY + 1, 'account1', 2), 0)
+        self.assertIsInstance(self.system.accounts['account1'], Account)
+        self.assertEqual(self.system.transfer(5 * DAY, 'account2', 'account1', 10), 0)
+        self.assertIsInstance(self.system.accounts['account1'], Account)
+        self.assertIsInstance(self.system.accounts['account2'], Account)
+        self.assertEqual(self.system.get_balance(5 * DAY + 1, 'account1', 4), 1000)
+        self.assertEqual(self.store.loads, 2)
+
+    def test_coldstore_case_03_merged_accounts_are_evicted_and_recreated(self):
+        self.assertTrue(self.system.create_account(1, 'account1'))
+        self.assertTrue(self.system.create_account(2, 'account2'))
+        self.assertEqual(self.system.deposit(3, 'account2', 100), 100)
+        self.assertTrue(self.system.merge_accounts(4, 'account1', 'account2'))
+        self.assertEqual(self.system.deposit(2 * DAY, 'account1', 1), 101)
+        self.assertIsInstance(self.system.accounts['account2'], ColdAccount)
+
+        self.assertIsNone(self.system.get_balance(2 * DAY + 1, 'account2', 5))
+        self.assertEqual(self.system.get_balance(2 * DAY + 2, 'account2', 3), 100)
+        self.assertTrue(self.system.create_account(2 * DAY + 3, 'account2'))
+        self.assertEqual(self.system.get_balance(2 * DAY + 4, 'account2', 2 * DAY + 4), 0)
+
+    def test_coldstore_case_04_matches_the_system_without_store(self):
+        path = os.path.join(self.directory.name, 'fuzz.cold')
+        coldstore.COMPACT_BYTES, compact_bytes = 0, coldstore.COMPACT_BYTES
+        try:
+            for seed in range(10):
+                case = fuzz.generate(random.Random(seed), 300)
+                system = BankingSystemImpl()
+                with coldstore.attach(system, path, idle=DAY // 2) as store:
+                    self.assertEqual(fuzz.results(lambda: system, case), fuzz.results(BankingSystemImpl, case))
+                    self.assertTrue(store.evictions > 0)
+                    coldstore.detach(system)
+                self.assertFalse(os.path.exists(path))
+        finally:
+            coldstore.COMPACT_BYTES = compact_bytes
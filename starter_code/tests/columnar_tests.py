@@ -0,0 +1,260 @@
+import unittest
+from unittest import mock
+import random
+import sys
+sys.path.insert(0, '../')
+import level_1_tests
+import level_2_tests
+import level_3_tests
+import level_4_tests
+import banking_system_impl_columnar
+import operations
+from banking_system_impl_columnar import BankingSystemImpl
+from ledger import Ledger
+
+
+class ColumnarLevel1Tests(level_1_tests.Level1Tests):
+    """
+    Runs the Level 1 test suit against the columnar implementation.
+    """
+
+    @classmethod
+    def setUp(cls):
+        cls.system = BankingSystemImpl()
+
+
+class ColumnarLevel2Tests(level_2_tests.Level2Tests):
+    """
+    Runs the Level 2 test suit against the columnar implementation.
+    """
+
+    @classmethod
+    def setUp(cls):
+        cls.system = BankingSystemImpl()
+
+
+class ColumnarLevel3Tests(level_3_tests.Level3Tests):
+    """
+    Runs the Level 3 test suit against the columnar implementation.
+    """
+
+    @classmethod
+    def setUp(cls):
+        cls.system = BankingSystemImpl()
+
+
+class ColumnarLevel4Tests(level_4_tests.Level4Tests):
+    """
+    Runs the Level 4 test suit against the columnar implementation.
+    """
+
+    @classmethod
+    def setUp(cls):
+        cls.system = BankingSystemImpl()
+
+
+class LedgerTests(unittest.TestCase):
+    """
+    Tests for the columnar ledger backing every account.
+    """
+
+    failureException = Exception
+
+    def test_ledger_case_01_balance_before_creation_is_none(self):
+        ledger = Ledger(5)
+        self.assertIsNone(ledger.balance_at(4))
+        self.assertEqual(ledger.balance_at(5), 0)
+
+    def test_ledger_case_02_in_order_transactions_are_appended(self):
+        ledger = Ledger(1)
+        ledger.record(2, 100)
+        ledger.record(2, 50)
+        self.assertEqual(ledger.record(3, -30), 120)
+        self.assertEqual(list(ledger.timestamps), [1, 2, 2, 3])
+        self.assertEqual(list(ledger.balances), [0, 100, 150, 120])
+        self.assertEqual(ledger.balance_at(2), 150)
+        self.assertEqual(ledger.balance_at(10), 120)
+
+    def test_ledger_case_03_backdated_transactions_update_later_balances(self):
+        ledger = Ledger(1)
+        ledger.record(10, 100)
+        self.assertEqual(ledger.record(5, 20), 20)
+        self.assertEqual(list(ledger.timestamps), [1, 5, 10])
+        self.assertEqual(ledger.balance_at(7), 20)
+        self.assertEqual(ledger.balance_at(10), 120)
+
+    def test_ledger_case_04_overflowing_transactions_leave_the_ledger_unchanged(self):
+        ledger = Ledger(1)
+        ledger.record(2, 100)
+        ledger.record(3, 1 << 62)
+        for timestamp, amount in [(4, 1 << 62), (2, (1 << 63) - 50), (4, 1 << 63), (4, -(1 << 64))]:
+            with self.assertRaises(OverflowError):
+                ledger.record(timestamp, amount)
+        self.assertEqual(list(ledger.timestamps), [1, 2, 3])
+        self.assertEqual(list(ledger.balances), [0, 100, (1 << 62) + 100])
+        self.assertEqual(len(ledger.amounts), len(ledger.kinds))
+        self.assertEqual(len(ledger), 3)
+
+        system = BankingSystemImpl()
+        for account_id in ('account1', 'account2'):
+            self.assertTrue(system.create_account(1, account_id))
+            self.assertEqual(system.deposit(2, account_id, 1 << 62), 1 << 62)
+        with self.assertRaises(OverflowError):
+            system.transfer(3, 'account1', 'account2', 1 << 62)
+        # the target couldn't take the money, so the source wasn't debited
+        self.assertEqual(system.get_balance(4, 'account1', 4), 1 << 62)
+        self.assertEqual(system.get_balance(4, 'account2', 4), 1 << 62)
+
+
+class ColumnarTests(unittest.TestCase):
+    """
+    Tests for the columnar banking system engine.
+    """
+
+    failureException = Exception
+
+    def test_columnar_case_01_recreated_account_starts_empty(self):
+        system = BankingSystemImpl()
+        self.assertTrue(system.create_account(1, 'account1'))
+        self.assertTrue(system.create_account(2, 'account2'))
+        self.assertEqual(system.deposit(3, 'account2', 500), 500)
+        self.assertTrue(system.merge_accounts(4, 'account1', 'account2'))
+        self.assertIsNone(system.transfer(5, 'account1', 'account2', 100))
+        self.assertTrue(system.create_account(6, 'account2'))
+        self.assertEqual(system.get_balance(7, 'account2', 6), 0)
+        self.assertIsNone(system.get_balance(8, 'account2', 3))
+        self.assertEqual(system.get_balance(9, 'account1', 8), 500)
+
+    def _get_balances_system(self):
+        system = BankingSystemImpl()
+        self.assertTrue(system.create_account(1, 'account1'))
+        self.assertTrue(system.create_account(2, 'account2'))
+        self.assertTrue(system.create_account(3, 'account3'))
+        self.assertEqual(system.deposit(4, 'account1', 1000), 1000)
+        self.assertEqual(system.deposit(5, 'account2', 500), 500)
+        self.assertEqual(system.pay(6, 'account1', 300), 'payment1')
+        self.assertTrue(system.merge_accounts(7, 'account3', 'account2'))
+        return system
+
+    def _assert_get_balances(self, system):
+        account_ids = ['account1', 'account2', 'account3', 'account4']
+        times = [0, 4, 6, 7, 86400006]
+        expected = [[system.get_balance(86400007, account_id, time_at) for time_at in times] for account_id in account_ids]
+        self.assertEqual(expected, [
+            [None, 1000, 700, 700, 706],
+            [None, 0, 500, None, None],
+            [None, 0, 0, 500, 500],
+            [None, None, None, None, None],
+        ])
+        self.assertEqual(system.get_balances(account_ids, times), expected)
+
+    def test_columnar_case_02_get_balances_matches_get_balance(self):
+        self._assert_get_balances(self._get_balances_system())
+
+    def test_columnar_case_03_get_balances_without_numpy(self):
+        with mock.patch.object(banking_system_impl_columnar, 'np', None):
+            self._assert_get_balances(self._get_balances_system())
+
+    def test_columnar_case_04_cashback_is_kept_out_of_ledger_until_due(self):
+        system = BankingSystemImpl()
+        self.assertTrue(system.create_account(1, 'account1'))
+        self.assertTrue(system.create_account(2, 'account2'))
+        self.assertEqual(system.deposit(3, 'account1', 1000), 1000)
+        self.assertEqual(system.pay(4, 'account1', 500), 'payment1')
+        self.assertEqual(len(system.ledgers[system.account_nodes['account1']]), 3)
+        self.assertEqual(len(system.cashback), 1)
+        self.assertTrue(system.merge_accounts(5, 'account2', 'account1'))
+        self.assertEqual(system.deposit(86400004, 'account2', 100), 610)
+        self.assertEqual(len(system.cashback), 0)
+        self.assertEqual(list(system.ledgers[system.account_nodes['account2']].amounts), [0, 500, 10, 100])
+        self.assertEqual(system.get_balance(86400005, 'account2', 86400003), 500)
+
+    def test_columnar_case_05_payments_follow_chained_merges(self):
+        system = BankingSystemImpl()
+        for i in range(1, 4):
+            self.assertTrue(system.create_account(i, f'account{i}'))
+            self.assertEqual(system.deposit(3 + i, f'account{i}', 1000), 1000)
+        self.assertEqual(system.pay(7, 'account3', 500), 'payment1')
+        self.assertTrue(system.merge_accounts(8, 'account2', 'account3'))
+        self.assertTrue(system.merge_accounts(9, 'account1', 'account2'))
+        self.assertTrue(system.create_account(10, 'account3'))
+        self.assertIsNone(system.get_payment_status(11, 'account3', 'payment1'))
+        self.assertIsNone(system.get_payment_status(12, 'account2', 'payment1'))
+        self.assertEqual(system.get_payment_status(13, 'account1', 'payment1'), 'IN_PROGRESS')
+        self.assertEqual(system.get_balance(86400007, 'account1', 86400007), 2510)
+        self.assertEqual(system.get_balance(86400008, 'account3', 86400007), 0)
+        # looking up payment1 compressed the path from account3's old node straight to account1
+        self.assertEqual(list(system.node_parents), [0, 0, 0, 3])
+
+    def test_columnar_case_06_list_payments_includes_merged_accounts(self):
+        system = BankingSystemImpl()
+        for i in range(1, 4):
+            self.assertTrue(system.create_account(i, f'account{i}'))
+            self.assertEqual(system.deposit(3 + i, f'account{i}', 1000), 1000)
+        self.assertEqual(system.pay(7, 'account1', 100), 'payment1')
+        self.assertEqual(system.pay(8, 'account2', 100), 'payment2')
+        self.assertEqual(system.pay(9, 'account3', 100), 'payment3')
+        self.assertEqual(system.pay(10, 'account1', 100), 'payment4')
+        self.assertTrue(system.merge_accounts(11, 'account2', 'account3'))
+        self.assertTrue(system.merge_accounts(12, 'account1', 'account2'))
+        self.assertTrue(system.create_account(13, 'account2'))
+        self.assertEqual(system.list_payments('account1', 0, 20), ['payment1', 'payment2', 'payment3', 'payment4'])
+        self.assertEqual(system.list_payments('account1', 8, 9), ['payment2', 'payment3'])
+        self.assertEqual(system.list_payments('account2', 0, 20), [])
+        self.assertIsNone(system.list_payments('account3', 0, 20))
+        self.assertIsNone(system.list_payments('account4', 0, 20))
+
+    def test_columnar_case_07_execute_batch_matches_sequential_calls(self):
+        rng = random.Random(274)
+        account_ids = [f'account{i}' for i in range(5)]
+        batch = []
+        for timestamp in range(1, 400):
+            timestamp *= rng.choice([1, 50000])
+            account_id = rng.choice(account_ids)
+            batch.append(rng.choice([
+                operations.CreateAccount(timestamp, account_id),
+                operations.Deposit(timestamp, account_id, rng.randrange(1000)),
+                operations.Transfer(timestamp, account_id, rng.choice(account_ids), rng.randrange(500)),
+                operations.Pay(timestamp, account_id, rng.randrange(500)),
+                operations.TopSpenders(timestamp, 3),
+                operations.GetPaymentStatus(timestamp, account_id, f'payment{rng.randrange(1, 10)}'),
+                operations.MergeAccounts(timestamp, account_id, rng.choice(account_ids)),
+                operations.GetBalance(timestamp, account_id, rng.randrange(timestamp)),
+            ]))
+        sequential = BankingSystemImpl()
+        expected = [None] * len(batch)
+        for i in sorted(range(len(batch)), key=lambda i: batch[i].timestamp):
+            expected[i] = operations.apply(sequential, batch[i])
+        batched = BankingSystemImpl()
+        self.assertEqual(batched.execute_batch(batch), expected)
+        self.assertEqual(batched.top_spenders(10 ** 9, 5), sequential.top_spenders(10 ** 9, 5))
+
+    def test_columnar_case_08_get_balances_leaves_cashback_that_is_not_due_pending(self):
+        for numpy in (banking_system_impl_columnar.np, None):
+            with mock.patch.object(banking_system_impl_columnar, 'np', numpy):
+                system = BankingSystemImpl()
+                self.assertTrue(system.create_account(1, 'account1'))
+                self.assertTrue(system.create_account(2, 'account2'))
+                self.assertEqual(system.deposit(3, 'account2', 1000), 1000)
+                self.assertEqual(system.pay(4, 'account2', 500), 'payment1')
+                self.assertEqual(system.get_balances(['account2'], [4, 86400003, 86400004, 864000000]), [[500, 500, 510, 510]])
+                self.assertEqual(len(system.cashback), 1)
+                # the refund is still pending, so it follows the merge to account1
+                self.assertTrue(system.merge_accounts(5, 'account1', 'account2'))
+                self.assertEqual(system.get_balances(['account1', 'account2'], [86400004]), [[510], [None]])
+                self.assertEqual(system.get_balance(172800000, 'account1', 172800000), 510)
+
+    def test_columnar_case_09_execute_batch_reports_where_it_failed(self):
+        class Failing(BankingSystemImpl):
+            def top_spenders(self, timestamp, n):
+                raise RuntimeError('engine failure')
+
+        system = Failing()
+        self.assertTrue(system.create_account(1, 'account1'))
+        batch = [operations.Deposit(4, 'account1', 50), operations.TopSpenders(3, 1), operations.Deposit(2, 'account1', 100)]
+        with self.assertRaises(operations.BatchError) as raised:
+            system.execute_batch(batch)
+        self.assertEqual((raised.exception.results, raised.exception.failed), ([None, None, 100], 1))
+        self.assertIsInstance(raised.exception.__cause__, RuntimeError)
+        # the operation after the failing one was not applied
+        self.assertEqual(system.get_balance(5, 'account1', 5), 100)
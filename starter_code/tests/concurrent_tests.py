@@ -0,0 +1,181 @@
+import unittest
+import os
+import random
+import sys
+import tempfile
+import threading
+sys.path.insert(0, '../')
+import level_1_tests
+import level_2_tests
+import level_3_tests
+import level_4_tests
+import operations
+import wal
+from banking_system_impl_columnar import BankingSystemImpl
+from banking_system_concurrent import ConcurrentBankingSystemImpl
+
+
+class ConcurrentLevel1Tests(level_1_tests.Level1Tests):
+    """
+    Runs the Level 1 test suit against the thread-safe implementation.
+    """
+
+    @classmethod
+    def setUp(cls):
+        cls.system = ConcurrentBankingSystemImpl()
+
+
+class ConcurrentLevel2Tests(level_2_tests.Level2Tests):
+    """
+    Runs the Level 2 test suit against the thread-safe implementation.
+    """
+
+    @classmethod
+    def setUp(cls):
+        cls.system = ConcurrentBankingSystemImpl()
+
+
+class ConcurrentLevel3Tests(level_3_tests.Level3Tests):
+    """
+    Runs the Level 3 test suit against the thread-safe implementation.
+    """
+
+    @classmethod
+    def setUp(cls):
+        cls.system = ConcurrentBankingSystemImpl()
+
+
+class ConcurrentLevel4Tests(level_4_tests.Level4Tests):
+    """
+    Runs the Level 4 test suit against the thread-safe implementation.
+    """
+
+    @classmethod
+    def setUp(cls):
+        cls.system = ConcurrentBankingSystemImpl()
+
+
+class ConcurrentTests(unittest.TestCase):
+    """
+    Tests for calls made from several threads at once.
+    """
+
+    failureException = Exception
+
+    @classmethod
+    def setUp(cls):
+        # few stripes so that threads keep meeting on the same locks
+        cls.system = ConcurrentBankingSystemImpl(4)
+
+    def test_concurrent_case_01_transfers_from_many_threads_keep_money(self):
+        account_ids = [f'account{i}' for i in range(10)]
+        for account_id in account_ids:
+            self.assertTrue(self.system.create_account(1, account_id))
+            self.assertEqual(self.system.deposit(2, account_id, 10000), 10000)
+
+        def work(seed):
+            rng = random.Random(seed)
+            for timestamp in range(3, 2003):
+                source, target = rng.sample(account_ids, 2)
+                self.system.transfer(timestamp, source, target, rng.randrange(1, 50))
+
+        threads = [threading.Thread(target=work, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        balances = [self.system.get_balance(3000, account_id, 3000) for account_id in account_ids]
+        self.assertEqual(sum(balances), 100000)
+        self.assertTrue(all(balance >= 0 for balance in balances))
+        self.assertEqual(self.system.get_balances(account_ids, [3000])[0][0], balances[0])
+
+    def test_concurrent_case_02_payments_from_many_threads_are_unique_and_refunded(self):
+        account_ids = [f'account{i}' for i in range(6)]
+        for account_id in account_ids:
+            self.assertTrue(self.system.create_account(1, account_id))
+            self.assertEqual(self.system.deposit(2, account_id, 100000), 100000)
+
+        payments = [[] for _ in account_ids]
+
+        def work(i):
+            for timestamp in range(3, 503):
+                payments[i].append(self.system.pay(timestamp, account_ids[i], 100))
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(len(account_ids))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        every_payment = [payment for account_payments in payments for payment in account_payments]
+        self.assertEqual(len(set(every_payment)), len(every_payment))
+        self.assertEqual(sorted(self.system.list_payments(account_ids[0], 0, 1000), key=lambda p: int(p[7:])), payments[0])
+        # 500 payments of 100 with 2% cashback each
+        self.assertEqual(self.system.get_balance(86400600, account_ids[0], 86400600), 100000 - 50000 + 1000)
+        self.assertEqual(self.system.top_spenders(86400601, 1), [f'{account_ids[0]}(50000)'])
+
+    def test_concurrent_case_03_single_thread_matches_columnar_engine(self):
+        rng = random.Random(1414)
+        account_ids = [f'account{i}' for i in range(8)]
+        batch = []
+        for timestamp in range(1, 600):
+            timestamp *= rng.choice([1, 30000000])
+            account_id = rng.choice(account_ids)
+            batch.append(rng.choice([
+                operations.CreateAccount(timestamp, account_id),
+                operations.Deposit(timestamp, account_id, rng.randrange(1000)),
+                operations.Transfer(timestamp, account_id, rng.choice(account_ids), rng.randrange(500)),
+                operations.Pay(timestamp, account_id, rng.randrange(500)),
+                operations.TopSpenders(timestamp, 3),
+                operations.GetPaymentStatus(timestamp, account_id, f'payment{rng.randrange(1, 30)}'),
+                operations.MergeAccounts(timestamp, account_id, rng.choice(account_ids)),
+                operations.GetBalance(timestamp, account_id, rng.randrange(timestamp)),
+            ]))
+        single = BankingSystemImpl()
+        self.assertEqual(self.system.execute_batch(batch), single.execute_batch(batch))
+        for account_id in account_ids:
+            self.assertEqual(self.system.list_payments(account_id, 0, 10 ** 12), single.list_payments(account_id, 0, 10 ** 12))
+
+    def test_concurrent_case_04_payments_from_many_threads_recover_from_the_log(self):
+        account_ids = [f'account{i}' for i in range(6)]
+        payments = [[] for _ in account_ids]
+
+        def work(i):
+            for timestamp in range(3, 303):
+                payments[i].append(self.system.pay(timestamp, account_ids[i], 100 + i))
+
+        # threads switch as often as possible, so pays interleave between logging and numbering a payment
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'banking.wal')
+            with wal.recover(self.system, path):
+                for account_id in account_ids:
+                    self.assertTrue(self.system.create_account(1, account_id))
+                    self.assertEqual(self.system.deposit(2, account_id, 100000), 100000)
+                threads = [threading.Thread(target=work, args=(i,)) for i in range(len(account_ids))]
+                try:
+                    for thread in threads:
+                        thread.start()
+                    for thread in threads:
+                        thread.join()
+                finally:
+                    sys.setswitchinterval(switch_interval)
+
+            recovered = ConcurrentBankingSystemImpl(4)
+            with wal.recover(recovered, path):
+                for account_id, account_payments in zip(account_ids, payments):
+                    for payment in account_payments:
+                        self.assertEqual(recovered.get_payment_status(400, account_id, payment), self.system.get_payment_status(400, account_id, payment))
+                        self.assertEqual(recovered.get_payment_status(400, account_id, payment), 'IN_PROGRESS')
+                    self.assertEqual(recovered.list_payments(account_id, 0, 400), self.system.list_payments(account_id, 0, 400))
+
+    def test_concurrent_case_05_get_balances_leaves_cashback_that_is_not_due_pending(self):
+        self.assertTrue(self.system.create_account(1, 'account1'))
+        self.assertTrue(self.system.create_account(2, 'account2'))
+        self.assertEqual(self.system.deposit(3, 'account2', 1000), 1000)
+        self.assertEqual(self.system.pay(4, 'account2', 500), 'payment1')
+        self.assertEqual(self.system.get_balances(['account2'], [4, 86400004]), [[500, 510]])
+        self.assertTrue(self.system.merge_accounts(5, 'account1', 'account2'))
+        self.assertEqual(self.system.get_balance(172800000, 'account1', 172800000), 510)
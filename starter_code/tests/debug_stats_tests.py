@@ -0,0 +1,53 @@
+import unittest
+import sys
+sys.path.insert(0, '../')
+from banking_system_impl_lvl_4 import BankingSystemImpl
+
+
+class DebugStatsTests(unittest.TestCase):
+    """
+    Tests for the internal counters of the level 4 banking system.
+    """
+
+    failureException = Exception
+
+    @classmethod
+    def setUp(cls):
+        cls.system = BankingSystemImpl()
+
+    def test_debug_stats_case_01_empty_system(self):
+        stats = self.system.debug_stats()
+        self.assertEqual(stats['accounts'], {'open': 0, 'merged': 0, 'cold': 0})
+        self.assertEqual(stats['history'], {'entries': 0, 'max_length': 0, 'mean_length': 0.0})
+        self.assertEqual(stats['get_balance']['calls'], 0)
+        self.assertEqual(stats['payments'], 0)
+
+    def test_debug_stats_case_02_counts_the_work_of_every_operation(self):
+        self.assertTrue(self.system.create_account(1, 'account1'))
+        self.assertTrue(self.system.create_account(2, 'account2'))
+        for timestamp in range(3, 10):
+            self.assertEqual(self.system.deposit(timestamp, 'account1', 1000), (timestamp - 2) * 1000)
+        self.assertEqual(self.system.deposit(10, 'account2', 1000), 1000)
+        self.assertEqual(self.system.pay(11, 'account2', 500), 'payment1')
+        self.assertEqual(self.system.pay(12, 'account2', 100), 'payment2')
+
+        stats = self.system.debug_stats()
+        self.assertEqual(stats['history'], {'entries': 12, 'max_length': 8, 'mean_length': 6.0})
+        self.assertEqual(stats['pending_cashback'], {'refunds': 2, 'amount': 12})
+
+        self.assertEqual(self.system.get_balance(13, 'account1', 13), 7000)
+        self.assertEqual(self.system.get_balance(14, 'account1', 5), 3000)
+        self.assertEqual(self.system.top_spenders(15, 1), ['account2(600)'])
+        self.assertEqual(self.system.top_spenders(16, 1), ['account2(600)'])
+        self.assertTrue(self.system.merge_accounts(17, 'account1', 'account2'))
+        self.assertEqual(self.system.get_payment_status(18, 'account1', 'payment1'), 'IN_PROGRESS')
+        self.assertEqual(self.system.get_payment_status(18, 'account1', 'payment2'), 'IN_PROGRESS')
+
+        stats = self.system.debug_stats()
+        self.assertEqual(stats['accounts'], {'open': 1, 'merged': 1, 'cold': 0})
+        self.assertEqual(stats['get_balance'], {'calls': 2, 'index_searches': 1, 'entries_searched': 4, 'entries_searched_per_call': 2.0, 'latest_hit_rate': 0.5})
+        self.assertEqual(stats['top_spenders']['calls'], 2)
+        self.assertEqual(stats['top_spenders']['cache_hit_rate'], 0.5)
+        self.assertEqual(stats['merge_accounts'], {'merges': 1, 'owner_lookups': 2, 'aliases_followed': 2, 'aliases_followed_per_lookup': 1.0})
+        self.assertEqual(stats['pending_cashback'], {'refunds': 2, 'amount': 12})
+        self.assertEqual(stats['payments'], 2)
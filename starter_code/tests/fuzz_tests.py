@@ -0,0 +1,60 @@
+import unittest
+import random
+import sys
+sys.path.insert(0, '../')
+import fuzz
+import operations
+from banking_system_impl_columnar import BankingSystemImpl as ColumnarBankingSystemImpl
+from banking_system_impl_lvl_4 import BankingSystemImpl
+
+
+class _LateCashbackBankingSystemImpl(BankingSystemImpl):
+    """
+    Level 4 banking system that wrongly reports a deposit made at the timestamp cashback is due without the cashback
+    """
+
+    def deposit(self, timestamp: int, account_id: str, amount: int) -> int | None:
+        balance = super().deposit(timestamp, account_id, amount)
+        if balance is None:
+            return None
+        # the row at timestamp holds every transaction at timestamp, the deposit is added back on top of the balance before it
+        account = self.accounts[account_id]
+        return (account.balance_at(timestamp - 1) or 0) + amount
+
+
+class FuzzTests(unittest.TestCase):
+    """
+    Tests for the differential fuzzer.
+    """
+
+    failureException = Exception
+
+    def test_fuzz_case_01_cases_are_seeded(self):
+        case = fuzz.generate(random.Random(7), 300)
+        self.assertEqual(case, fuzz.generate(random.Random(7), 300))
+        self.assertEqual(len(case), 300)
+        self.assertEqual([operation.timestamp for operation in case], sorted(operation.timestamp for operation in case))
+        self.assertEqual({operations.METHODS[type(operation)] for operation in case}, set(fuzz.WEIGHTS))
+
+    def test_fuzz_case_02_columnar_engine_agrees_with_the_reference(self):
+        engines = [BankingSystemImpl, ColumnarBankingSystemImpl]
+        for seed in range(20):
+            case = fuzz.generate(random.Random(seed), 200)
+            self.assertIsNone(fuzz.divergence(engines, case))
+            self.assertIsNone(fuzz.divergence(engines, case, batch_size=16))
+
+    def test_fuzz_case_03_disagreements_are_shrunk(self):
+        engines = [BankingSystemImpl, _LateCashbackBankingSystemImpl]
+        case = next(case for case in (fuzz.generate(random.Random(seed), 300) for seed in range(200)) if fuzz.divergence(engines, case))
+        reduced = fuzz.shrink(engines, case)
+        self.assertEqual([operations.METHODS[type(operation)] for operation in reduced], ['create_account', 'deposit', 'pay', 'deposit'])
+        self.assertEqual(reduced[-1].timestamp, reduced[2].timestamp + fuzz.DAY)
+        index, found = fuzz.divergence(engines, reduced)
+        self.assertEqual(index, 3)
+        self.assertEqual(found[0] - found[1], reduced[2].amount // 50)
+
+    def test_fuzz_case_04_exceptions_are_results(self):
+        case = [operations.CreateAccount(1, 'account1'), operations.Deposit(2, 'account1', 'ten'), operations.Deposit(3, 'account1', 10)]
+        found = fuzz.results(BankingSystemImpl, case)
+        self.assertEqual(len(found), 2)
+        self.assertTrue(found[1].startswith('raised TypeError'))
@@ -0,0 +1,93 @@
+import unittest
+import json
+import os
+import random
+import sys
+import tempfile
+from array import array
+sys.path.insert(0, '../')
+import latency
+from banking_system_impl_lvl_4 import BankingSystemImpl
+
+
+class LatencyTests(unittest.TestCase):
+    """
+    Tests for the latency histograms and instrumenting a banking system.
+    """
+
+    failureException = Exception
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'latency.json')
+        self.system = BankingSystemImpl()
+
+    def tearDown(self):
+        latency.uninstrument(self.system)
+        self.directory.cleanup()
+
+    def test_latency_case_01_buckets_are_within_a_sixteenth_of_their_values(self):
+        rng = random.Random(3)
+        for nanoseconds in list(range(1000)) + [rng.randrange(10 ** 12) for _ in range(5000)]:
+            lowest, highest = latency.bucket_bounds(latency.bucket_index(nanoseconds))
+            self.assertTrue(lowest <= nanoseconds <= highest)
+            self.assertTrue(highest - lowest <= lowest // 16)
+
+    def test_latency_case_02_percentiles_are_read_from_the_histogram(self):
+        histogram = latency.LatencyHistogram()
+        histogram.add(array('q', range(1, 10001)))
+        self.assertEqual(histogram.count, 10000)
+        self.assertEqual(histogram.max, 10000)
+        for percent in (50, 90, 99):
+            self.assertTrue(0 <= histogram.percentile(percent) - percent * 100 <= percent * 100 // 16)
+        summary = histogram.summary()
+        self.assertEqual(summary['mean_us'], 5.0)
+        self.assertEqual(summary['max_us'], 10.0)
+        self.assertEqual(sum(count for lowest, count in summary['buckets']), 10000)
+
+    def test_latency_case_03_histograms_are_the_same_without_numpy(self):
+        latencies = array('q', (random.Random(5).randrange(1, 10 ** 9) for _ in range(2000)))
+        expected = latency.LatencyHistogram()
+        expected.add(latencies)
+        numpy, latency.np = latency.np, None
+        try:
+            histogram = latency.LatencyHistogram()
+            histogram.add(latencies)
+        finally:
+            latency.np = numpy
+        self.assertEqual(histogram.counts, expected.counts)
+        self.assertEqual((histogram.total, histogram.max), (expected.total, expected.max))
+
+    def test_latency_case_04_instrumented_calls_are_counted_and_dumped(self):
+        recorder = latency.instrument(self.system, self.path)
+        self.assertIs(self.system.latency, recorder)
+        self.assertRaises(ValueError, latency.instrument, self.system)
+        self.assertTrue(self.system.create_account(1, 'account1'))
+        for timestamp in range(2, 12):
+            self.assertEqual(self.system.deposit(timestamp, 'account1', 10), (timestamp - 1) * 10)
+        self.assertIsNone(self.system.pay(12, 'account2', 10))
+
+        stats = recorder.stats()
+        self.assertEqual({method: summary['count'] for method, summary in stats.items()}, {'create_account': 1, 'deposit': 10, 'pay': 1})
+        self.assertTrue(stats['deposit']['p50_us'] <= stats['deposit']['p99_us'] <= stats['deposit']['max_us'])
+
+        latency.uninstrument(self.system)
+        self.assertIsNone(self.system.latency)
+        self.assertNotIn('deposit', vars(self.system))
+        with open(self.path) as dump:
+            self.assertEqual(json.load(dump)['methods']['deposit']['count'], 10)
+
+    def test_latency_case_05_every_call_is_counted_and_a_sample_is_timed(self):
+        self.assertRaises(ValueError, latency.LatencyRecorder, sample_every=0)
+        recorder = latency.instrument(self.system, sample_every=4)
+        self.assertTrue(self.system.create_account(1, 'account1'))
+        for timestamp in range(2, 102):
+            self.assertEqual(self.system.deposit(timestamp, 'account1', amount=1), timestamp - 1)
+
+        stats = recorder.stats()
+        self.assertEqual((stats['deposit']['count'], stats['deposit']['timed']), (100, 25))
+        self.assertEqual(sum(count for lowest, count in stats['deposit']['buckets']), 25)
+        # reading the statistics doesn't count as a call
+        self.assertEqual(recorder.stats()['deposit']['count'], 100)
+        self.assertEqual(self.system.deposit(102, 'account1', 1), 101)
+        self.assertEqual(recorder.stats()['deposit']['count'], 101)
@@ -0,0 +1,109 @@
+import unittest
+import random
+import sys
+sys.path.insert(0, '../')
+from leaderboard import SpendLeaderboard
+
+
+class LeaderboardTests(unittest.TestCase):
+    """
+    Tests for the leaderboard used by top_spenders.
+    """
+
+    failureException = Exception
+
+    @classmethod
+    def setUp(cls):
+        cls.leaderboard = SpendLeaderboard(load=2)
+
+    def test_leaderboard_case_01_orders_by_spend_then_account_id(self):
+        self.leaderboard.insert('account2', 0)
+        self.leaderboard.insert('account1', 0)
+        self.leaderboard.insert('account3', 0)
+        self.leaderboard.update('account3', 0, 300)
+        self.leaderboard.update('account2', 0, 300)
+        self.assertEqual(self.leaderboard.top(2), ['account2(300)', 'account3(300)'])
+        self.assertEqual(self.leaderboard.top(5), ['account2(300)', 'account3(300)', 'account1(0)'])
+        self.assertEqual(self.leaderboard.top(0), [])
+
+    def test_leaderboard_case_02_cached_result_is_refreshed_after_update(self):
+        self.leaderboard.insert('account1', 0)
+        self.leaderboard.insert('account2', 0)
+        top = self.leaderboard.top(1)
+        self.assertEqual(top, ['account1(0)'])
+        top.append('changed')
+        self.assertEqual(self.leaderboard.top(1), ['account1(0)'])
+        self.leaderboard.update('account2', 0, 10)
+        self.assertEqual(self.leaderboard.top(1), ['account2(10)'])
+        self.leaderboard.remove('account2', 10)
+        self.assertEqual(self.leaderboard.top(2), ['account1(0)'])
+        self.assertEqual(len(self.leaderboard), 1)
+
+    def test_leaderboard_case_03_matches_full_sort(self):
+        rng = random.Random(274)
+        total_spend = {}
+        for step in range(2000):
+            account_id = f"account{rng.randrange(60)}"
+            if account_id not in total_spend:
+                total_spend[account_id] = 0
+                self.leaderboard.insert(account_id, 0)
+            elif rng.random() < 0.1:
+                self.leaderboard.remove(account_id, total_spend.pop(account_id))
+            else:
+                amount = rng.randrange(100)
+                self.leaderboard.update(account_id, total_spend[account_id], total_spend[account_id] + amount)
+                total_spend[account_id] += amount
+            n = rng.randrange(1, 70)
+            expected = sorted(total_spend.items(), key=lambda item: (-item[1], item[0]))[:n]
+            self.assertEqual(self.leaderboard.top(n), [f"{key}({val})" for key, val in expected])
+
+    def test_leaderboard_case_04_counts_reads_and_moves(self):
+        self.leaderboard.insert('account1', 0)
+        self.leaderboard.insert('account2', 0)
+        self.leaderboard.update('account1', 0, 100)
+        self.leaderboard.update('account1', 100, 200)
+        self.assertEqual(self.leaderboard.top(2), ['account1(200)', 'account2(0)'])
+        self.assertEqual(self.leaderboard.top(2), ['account1(200)', 'account2(0)'])
+        self.assertEqual(self.leaderboard.top(1), ['account1(200)'])
+        self.assertEqual((self.leaderboard.reads, self.leaderboard.cache_hits), (3, 1))
+        self.assertEqual((self.leaderboard.entries_listed, self.leaderboard.entries_moved), (3, 1))
+
+    def test_leaderboard_case_05_frozen_copy_keeps_its_ranking(self):
+        rng = random.Random(505)
+        total_spend = {}
+        frozen = []
+        for step in range(400):
+            account_id = f"account{rng.randrange(30)}"
+            if account_id not in total_spend:
+                self.leaderboard.insert(account_id, 0)
+                total_spend[account_id] = 0
+            elif rng.random() < 0.1:
+                self.leaderboard.remove(account_id, total_spend.pop(account_id))
+            else:
+                amount = rng.randrange(100)
+                self.leaderboard.update(account_id, total_spend[account_id], total_spend[account_id] + amount)
+                total_spend[account_id] += amount
+            if step % 50 == 0:
+                expected = sorted(total_spend.items(), key=lambda item: (-item[1], item[0]))
+                frozen.append((self.leaderboard.frozen(), [f"{key}({val})" for key, val in expected]))
+
+        # buckets are shared until they change, the copies still see the ranking they were taken with
+        for copy, expected in frozen:
+            self.assertEqual(copy.top(len(expected) + 1), expected)
+        expected = sorted(total_spend.items(), key=lambda item: (-item[1], item[0]))
+        self.assertEqual(self.leaderboard.top(100), [f"{key}({val})" for key, val in expected])
+
+    def test_leaderboard_case_06_negative_n_and_stale_removals(self):
+        for account_id, total_spend in (('account1', 30), ('account2', 20), ('account3', 10)):
+            self.leaderboard.insert(account_id, 0)
+            self.leaderboard.update(account_id, 0, total_spend)
+        expected = ['account1(30)', 'account2(20)', 'account3(10)']
+        for n in (-1, -2, -3, -5):
+            self.assertEqual(self.leaderboard.top(n), expected[:n])
+
+        # a removal with a total spend the account doesn't have fails and leaves the ranking as it was
+        with self.assertRaises(KeyError):
+            self.leaderboard.remove('account2', 25)
+        with self.assertRaises(KeyError):
+            self.leaderboard.remove('account4', 0)
+        self.assertEqual(self.leaderboard.top(3), expected)
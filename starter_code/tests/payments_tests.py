@@ -0,0 +1,41 @@
+import unittest
+import sys
+sys.path.insert(0, '../')
+from payments import PaymentRegistry
+
+
+class PaymentRegistryTests(unittest.TestCase):
+    """
+    Tests for the compact payment registry.
+    """
+
+    failureException = Exception
+
+    @classmethod
+    def setUp(cls):
+        cls.registry = PaymentRegistry()
+
+    def test_payments_case_01_ordinals_are_parsed_from_payment_ids(self):
+        self.assertEqual(self.registry.add(5, 0), 1)
+        self.assertEqual(self.registry.add(6, 1), 2)
+        self.assertEqual(self.registry.ordinal('payment2'), 2)
+        self.assertIsNone(self.registry.ordinal('payment3'))
+        self.assertIsNone(self.registry.ordinal('payment0'))
+        self.assertIsNone(self.registry.ordinal('payment01'))
+        self.assertIsNone(self.registry.ordinal('payment-1'))
+        self.assertIsNone(self.registry.ordinal('payment'))
+        self.assertIsNone(self.registry.ordinal('transfer1'))
+        self.assertIsNone(self.registry.ordinal('payment¹'))
+
+    def test_payments_case_02_status_depends_on_cashback_due_time(self):
+        ordinal = self.registry.add(10, 0)
+        self.assertEqual(self.registry.status(ordinal, 86400009), 'IN_PROGRESS')
+        self.assertEqual(self.registry.status(ordinal, 86400010), 'CASHBACK_RECEIVED')
+
+    def test_payments_case_03_node_payments_are_listed_by_timestamp(self):
+        for timestamp in range(1, 11):
+            self.registry.add(timestamp, timestamp % 2)
+        self.assertEqual(list(self.registry.node_payments(0, 3, 8)), [4, 6, 8])
+        self.assertEqual(list(self.registry.node_payments(1, 3, 8)), [3, 5, 7])
+        self.assertEqual(list(self.registry.node_payments(1, 11, 20)), [])
+        self.assertEqual(list(self.registry.node_payments(2, 0, 20)), [])
@@ -0,0 +1,94 @@
+import unittest
+from unittest import mock
+import gzip
+import io
+import os
+import sys
+import tempfile
+sys.path.insert(0, '../')
+import operations
+import replay
+from banking_system_impl_columnar import BankingSystemImpl
+
+
+class ReplayTests(unittest.TestCase):
+    """
+    Tests for replaying operation logs.
+    """
+
+    failureException = Exception
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        if name.endswith('.gz'):
+            with gzip.open(path, 'wt') as trace:
+                trace.write(text)
+        else:
+            with open(path, 'w') as trace:
+                trace.write(text)
+        return path
+
+    def test_replay_case_01_jsonl_lists_and_objects(self):
+        path = self._write('trace.jsonl', '\n'.join([
+            '["CREATE_ACCOUNT", "1", "account1"]',
+            '# comments and blank lines are skipped',
+            '',
+            '{"operation": "deposit", "timestamp": 2, "account_id": "account1", "amount": 500}',
+            '["pay", 3, "account1", 100]',
+        ]))
+        self.assertEqual(list(replay.read_operations(path)), [
+            operations.CreateAccount(1, 'account1'),
+            operations.Deposit(2, 'account1', 500),
+            operations.Pay(3, 'account1', 100),
+        ])
+
+    def test_replay_case_02_csv_gzip(self):
+        path = self._write('trace.csv.gz', 'CREATE_ACCOUNT,1,account1\nDEPOSIT,2,account1,500\nTOP_SPENDERS,3,1\n')
+        self.assertEqual(list(replay.read_operations(path)), [
+            operations.CreateAccount(1, 'account1'),
+            operations.Deposit(2, 'account1', 500),
+            operations.TopSpenders(3, 1),
+        ])
+
+    def test_replay_case_03_invalid_lines_are_reported(self):
+        path = self._write('trace.jsonl', '["create_account", 1, "account1"]\n["withdraw", 2, "account1", 5]\n')
+        with self.assertRaisesRegex(ValueError, 'line 2: unknown operation'):
+            list(replay.read_operations(path))
+        path = self._write('trace.csv', 'DEPOSIT,1,account1\n')
+        with self.assertRaisesRegex(ValueError, 'line 1: DEPOSIT takes 3 arguments'):
+            list(replay.read_operations(path))
+
+    def test_replay_case_04_results_match_with_and_without_batches(self):
+        stream = [
+            operations.CreateAccount(1, 'account1'),
+            operations.CreateAccount(2, 'account2'),
+            operations.Deposit(3, 'account1', 1000),
+            operations.Transfer(4, 'account1', 'account2', 300),
+            operations.Pay(5, 'account2', 100),
+            operations.TopSpenders(6, 2),
+            operations.GetPaymentStatus(7, 'account2', 'payment1'),
+            operations.Deposit(8, 'account3', 10),
+        ]
+        expected = 'true\ntrue\n1000\n700\n"payment1"\n["account1(300)", "account2(100)"]\n"IN_PROGRESS"\nnull\n'
+        for batch_size in (0, 3):
+            output = io.StringIO()
+            stats = replay.replay(BankingSystemImpl(), iter(stream), output, batch_size)
+            self.assertEqual(output.getvalue(), expected)
+            self.assertEqual(stats.operations, 8)
+            self.assertEqual(stats.counts['deposit'], 2)
+            self.assertIn('deposit', stats.report())
+
+    def test_replay_case_05_command_line(self):
+        path = self._write('trace.csv', 'CREATE_ACCOUNT,1,account1\nDEPOSIT,2,account1,500\n')
+        output = os.path.join(self.directory.name, 'results.jsonl')
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            self.assertEqual(replay.main([path, '--output', output, '--engine', 'banking_system_impl_lvl_4']), 0)
+        self.assertIn('replayed 2 operations', stdout.getvalue())
+        with open(output) as results:
+            self.assertEqual(results.read(), 'true\n500\n')
@@ -0,0 +1,123 @@
+import unittest
+import asyncio
+import os
+import random
+import sys
+import tempfile
+sys.path.insert(0, '../')
+import operations
+import protocol
+from banking_system_impl_columnar import BankingSystemImpl
+from client import BankingClient
+from protocol import RemoteError
+from server import BankingServer
+
+
+class ServerTests(unittest.TestCase):
+    """
+    Tests for serving a banking system over a socket.
+    """
+
+    failureException = Exception
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'bank.sock')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_server_case_01_requests_and_responses_round_trip(self):
+        for operation in [
+            operations.CreateAccount(1, 'account1'),
+            operations.Transfer(2, 'accöunt1', '', -5),
+            operations.TopSpenders(3, 10),
+            operations.GetBalance(4, 'account1', 1 << 62),
+        ]:
+            self.assertEqual(protocol.decode_request(protocol.encode_request(operation)), operation)
+        for value in [None, True, False, 0, -1 << 63, 'payment1', [], ['account1(100)', 'account2(0)']]:
+            self.assertEqual(protocol.decode_response(protocol.encode_response(value)), value)
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode_request(b'\x09')
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode_request(protocol.encode_request(operations.CreateAccount(1, 'account1'))[:-1])
+
+    def test_server_case_02_pipelined_calls_match_the_engine(self):
+        rng = random.Random(1515)
+        account_ids = [f'account{i}' for i in range(6)]
+        stream = []
+        for timestamp in range(1, 400):
+            account_id = rng.choice(account_ids)
+            stream.append(rng.choice([
+                operations.CreateAccount(timestamp, account_id),
+                operations.Deposit(timestamp, account_id, rng.randrange(1000)),
+                operations.Transfer(timestamp, account_id, rng.choice(account_ids), rng.randrange(500)),
+                operations.Pay(timestamp, account_id, rng.randrange(500)),
+                operations.TopSpenders(timestamp, 3),
+                operations.GetPaymentStatus(timestamp, account_id, f'payment{rng.randrange(1, 30)}'),
+                operations.MergeAccounts(timestamp, account_id, rng.choice(account_ids)),
+                operations.GetBalance(timestamp, account_id, rng.randrange(timestamp)),
+            ]))
+        single = BankingSystemImpl()
+        expected = [operations.apply(single, operation) for operation in stream]
+
+        async def run():
+            server = await BankingServer(BankingSystemImpl(), max_in_flight=16).start(path=self.path)
+            async with server:
+                async with await BankingClient.connect(path=self.path) as client:
+                    results = await asyncio.gather(*(client.call(operation) for operation in stream))
+                    self.assertEqual(await client.get_balance(10 ** 9, 'account1', 10 ** 9), single.get_balance(10 ** 9, 'account1', 10 ** 9))
+            return results, server.batches
+
+        results, batches = asyncio.run(run())
+        self.assertEqual(results, expected)
+        self.assertLess(batches, len(stream))
+
+    def test_server_case_03_engine_errors_are_sent_back(self):
+        class Failing(BankingSystemImpl):
+            def top_spenders(self, timestamp, n):
+                raise RuntimeError('engine failure')
+
+        class Broken(BankingSystemImpl):
+            def execute_batch(self, batch):
+                if any(isinstance(operation, operations.TopSpenders) for operation in batch):
+                    raise RuntimeError('engine failure')
+                return super().execute_batch(batch)
+
+        async def run(engine):
+            async with await BankingServer(engine).start(path=self.path):
+                async with await BankingClient.connect(path=self.path) as client:
+                    self.assertTrue(await client.create_account(1, 'account1'))
+                    # pipelined, so the failing request shares a batch with requests that succeed
+                    results = await asyncio.gather(
+                        client.deposit(2, 'account1', 100),
+                        client.top_spenders(3, 1),
+                        client.deposit(4, 'account1', 50),
+                        return_exceptions=True,
+                    )
+                    self.assertIsInstance(results[1], RemoteError)
+                    return results, await client.deposit(5, 'account1', 10)
+
+        # execute_batch raises BatchError, the deposit before the failure is not applied a second time
+        results, balance = asyncio.run(run(Failing()))
+        self.assertEqual((results[0], results[2], balance), (100, 150, 160))
+
+        # an engine that doesn't say what it applied has every request answered with its error
+        results, balance = asyncio.run(run(Broken()))
+        self.assertTrue(all(isinstance(result, RemoteError) for result in results))
+        self.assertEqual(balance, 10)
+
+    def test_server_case_04_unencodable_results_are_sent_back_as_errors(self):
+        class Overflowing(BankingSystemImpl):
+            def execute_batch(self, batch):
+                return [1 << 70 if isinstance(operation, operations.GetBalance) else result for operation, result in zip(batch, super().execute_batch(batch))]
+
+        async def run():
+            async with await BankingServer(Overflowing()).start(path=self.path):
+                async with await BankingClient.connect(path=self.path) as client:
+                    self.assertTrue(await client.create_account(1, 'account1'))
+                    with self.assertRaises(RemoteError):
+                        await client.get_balance(2, 'account1', 1)
+                    self.assertEqual(await client.deposit(3, 'account1', 100), 100)
+
+        asyncio.run(run())
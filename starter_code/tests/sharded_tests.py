@@ -0,0 +1,122 @@
+import unittest
+import random
+import sys
+sys.path.insert(0, '../')
+import level_1_tests
+import level_2_tests
+import level_3_tests
+import level_4_tests
+import operations
+from banking_system_impl_columnar import BankingSystemImpl
+from banking_system_sharded import ShardedBankingSystem
+
+
+class ShardedLevel1Tests(level_1_tests.Level1Tests):
+    """
+    Runs the Level 1 test suit against the sharded implementation.
+    """
+
+    @classmethod
+    def setUp(cls):
+        cls.system = ShardedBankingSystem(2)
+
+    def tearDown(self):
+        self.system.close()
+
+
+class ShardedLevel2Tests(level_2_tests.Level2Tests):
+    """
+    Runs the Level 2 test suit against the sharded implementation.
+    """
+
+    @classmethod
+    def setUp(cls):
+        cls.system = ShardedBankingSystem(2)
+
+    def tearDown(self):
+        self.system.close()
+
+
+class ShardedLevel3Tests(level_3_tests.Level3Tests):
+    """
+    Runs the Level 3 test suit against the sharded implementation.
+    """
+
+    @classmethod
+    def setUp(cls):
+        cls.system = ShardedBankingSystem(2)
+
+    def tearDown(self):
+        self.system.close()
+
+
+class ShardedLevel4Tests(level_4_tests.Level4Tests):
+    """
+    Runs the Level 4 test suit against the sharded implementation.
+    """
+
+    @classmethod
+    def setUp(cls):
+        cls.system = ShardedBankingSystem(2)
+
+    def tearDown(self):
+        self.system.close()
+
+
+class ShardedTests(unittest.TestCase):
+    """
+    Tests for operations spanning several shards.
+    """
+
+    failureException = Exception
+
+    @classmethod
+    def setUp(cls):
+        cls.system = ShardedBankingSystem(3)
+
+    def tearDown(self):
+        self.system.close()
+
+    def test_sharded_case_01_cross_shard_merge_moves_pending_cashback(self):
+        account_1, account_2 = 'account1', next(f'account{i}' for i in range(2, 100) if self.system.shard(f'account{i}') != self.system.shard('account1'))
+        self.assertTrue(self.system.create_account(1, account_1))
+        self.assertTrue(self.system.create_account(2, account_2))
+        self.assertEqual(self.system.deposit(3, account_2, 1000), 1000)
+        self.assertEqual(self.system.pay(4, account_2, 500), 'payment1')
+        self.assertEqual(self.system.transfer(5, account_2, account_1, 100), 400)
+        self.assertEqual(self.system.transfer(6, account_1, account_2, 200), None)
+        self.assertTrue(self.system.merge_accounts(7, account_1, account_2))
+
+        self.assertEqual(self.system.get_payment_status(8, account_1, 'payment1'), 'IN_PROGRESS')
+        self.assertIsNone(self.system.get_payment_status(8, account_2, 'payment1'))
+        self.assertEqual(self.system.get_balance(86400004, account_1, 86400004), 510)
+        self.assertEqual(self.system.get_balance(86400005, account_2, 6), 400)
+        self.assertIsNone(self.system.get_balance(86400006, account_2, 7))
+        self.assertEqual(self.system.top_spenders(86400007, 1), [f'{account_1}(600)'])
+        self.assertEqual(self.system.list_payments(account_1, 0, 10), ['payment1'])
+        self.assertTrue(self.system.create_account(86400008, account_2))
+
+    def test_sharded_case_02_batches_match_a_single_engine(self):
+        rng = random.Random(1313)
+        account_ids = [f'account{i}' for i in range(8)]
+        batch = []
+        for timestamp in range(1, 600):
+            timestamp *= rng.choice([1, 30000000])
+            account_id = rng.choice(account_ids)
+            batch.append(rng.choice([
+                operations.CreateAccount(timestamp, account_id),
+                operations.Deposit(timestamp, account_id, rng.randrange(1000)),
+                operations.Transfer(timestamp, account_id, rng.choice(account_ids), rng.randrange(500)),
+                operations.Pay(timestamp, account_id, rng.randrange(500)),
+                operations.TopSpenders(timestamp, 3),
+                operations.GetPaymentStatus(timestamp, account_id, f'payment{rng.randrange(1, 30)}'),
+                operations.MergeAccounts(timestamp, account_id, rng.choice(account_ids)),
+                operations.GetBalance(timestamp, account_id, rng.randrange(timestamp)),
+            ]))
+        single = BankingSystemImpl()
+        expected = [None] * len(batch)
+        for i in sorted(range(len(batch)), key=lambda i: batch[i].timestamp):
+            expected[i] = operations.apply(single, batch[i])
+        self.assertEqual(self.system.execute_batch(batch), expected)
+        for account_id in account_ids:
+            self.assertEqual(self.system.list_payments(account_id, 0, 10 ** 12), single.list_payments(account_id, 0, 10 ** 12))
@@ -0,0 +1,94 @@
+import unittest
+import os
+import random
+import sys
+import tempfile
+sys.path.insert(0, '../')
+import operations
+from banking_system_impl_columnar import BankingSystemImpl
+from ledger import MappedLedger
+
+
+class SnapshotTests(unittest.TestCase):
+    """
+    Tests for saving and loading binary snapshots of the columnar implementation.
+    """
+
+    failureException = Exception
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'banking.snapshot')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _random_operations(self, rng, first_timestamp, count):
+        account_ids = [f'account{i}' for i in range(6)] + ['kontø']
+        stream = []
+        for timestamp in range(first_timestamp, first_timestamp + count):
+            timestamp *= 10000000
+            account_id = rng.choice(account_ids)
+            stream.append(rng.choice([
+                operations.CreateAccount(timestamp, account_id),
+                operations.Deposit(timestamp, account_id, rng.randrange(1000)),
+                operations.Deposit(timestamp, account_id, rng.randrange(1000)),
+                operations.Transfer(timestamp, account_id, rng.choice(account_ids), rng.randrange(500)),
+                operations.Pay(timestamp, account_id, rng.randrange(500)),
+                operations.TopSpenders(timestamp, 4),
+                operations.GetPaymentStatus(timestamp, account_id, f'payment{rng.randrange(1, 20)}'),
+                operations.MergeAccounts(timestamp, account_id, rng.choice(account_ids)),
+                operations.GetBalance(timestamp, account_id, rng.randrange(timestamp)),
+            ]))
+        return stream
+
+    def test_snapshot_case_01_loaded_system_behaves_like_the_original(self):
+        rng = random.Random(12)
+        original = BankingSystemImpl()
+        for operation in self._random_operations(rng, 1, 300):
+            operations.apply(original, operation)
+
+        original.save_snapshot(self.path)
+        loaded = BankingSystemImpl()
+        loaded.load_snapshot(self.path)
+        for operation in self._random_operations(rng, 301, 300):
+            self.assertEqual(operations.apply(loaded, operation), operations.apply(original, operation))
+        for account_id in original.account_nodes:
+            self.assertEqual(loaded.list_payments(account_id, 0, 10 ** 12), original.list_payments(account_id, 0, 10 ** 12))
+
+    def test_snapshot_case_02_ledgers_are_decoded_on_first_use(self):
+        original = BankingSystemImpl()
+        original.create_account(1, 'account1')
+        original.create_account(2, 'account2')
+        original.deposit(3, 'account1', 500)
+        original.pay(4, 'account1', 100)
+        original.save_snapshot(self.path)
+
+        loaded = BankingSystemImpl()
+        loaded.load_snapshot(self.path)
+        self.assertNotIn('timestamps', vars(loaded.ledgers[loaded.account_nodes['account1']]))
+        self.assertEqual(loaded.get_balance(5, 'account1', 3), 500)
+        self.assertEqual(list(loaded.ledgers[loaded.account_nodes['account1']].balances), [0, 500, 400])
+        self.assertNotIn('timestamps', vars(loaded.ledgers[loaded.account_nodes['account2']]))
+
+        # accounts that were never used are copied into the next snapshot as they are
+        loaded.save_snapshot(self.path)
+        reloaded = BankingSystemImpl()
+        reloaded.load_snapshot(self.path)
+        self.assertIsInstance(reloaded.ledgers[reloaded.account_nodes['account2']], MappedLedger)
+        self.assertEqual(reloaded.get_balance(86400004, 'account1', 86400004), 402)
+        self.assertEqual(reloaded.deposit(86400005, 'account2', 10), 10)
+        self.assertEqual(reloaded.top_spenders(86400006, 2), ['account1(100)', 'account2(0)'])
+
+    def test_snapshot_case_03_invalid_files_are_rejected(self):
+        with open(self.path, 'wb') as snapshot:
+            snapshot.write(b'not a snapshot')
+        with self.assertRaisesRegex(ValueError, 'is not a snapshot'):
+            BankingSystemImpl().load_snapshot(self.path)
+
+        BankingSystemImpl().save_snapshot(self.path)
+        with open(self.path, 'r+b') as snapshot:
+            snapshot.seek(8)
+            snapshot.write(b'\x63\x00\x00\x00')
+        with self.assertRaisesRegex(ValueError, 'version 99'):
+            BankingSystemImpl().load_snapshot(self.path)
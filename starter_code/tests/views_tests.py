@@ -0,0 +1,112 @@
+import unittest
+import random
+import sys
+sys.path.insert(0, '../')
+import operations
+import views
+from banking_system_impl_columnar import BankingSystemImpl
+from banking_system_concurrent import ConcurrentBankingSystemImpl
+
+
+class ViewsTests(unittest.TestCase):
+    """
+    Tests for point-in-time read views of the columnar implementation.
+    """
+
+    failureException = Exception
+
+    @classmethod
+    def setUp(cls):
+        cls.system = BankingSystemImpl()
+
+    def test_views_case_01_view_ignores_later_writes(self):
+        self.assertTrue(self.system.create_account(1, 'account1'))
+        self.assertTrue(self.system.create_account(2, 'account2'))
+        self.assertEqual(self.system.deposit(3, 'account1', 1000), 1000)
+        self.assertEqual(self.system.deposit(4, 'account2', 500), 500)
+        self.assertEqual(self.system.pay(5, 'account2', 300), 'payment1')
+        view = self.system.snapshot(6)
+
+        self.assertEqual(self.system.transfer(7, 'account1', 'account2', 400), 600)
+        self.assertTrue(self.system.merge_accounts(8, 'account1', 'account2'))
+        self.assertTrue(self.system.create_account(9, 'account2'))
+        self.assertTrue(self.system.create_account(10, 'account3'))
+        self.assertEqual(self.system.pay(11, 'account1', 100), 'payment2')
+        self.assertEqual(self.system.get_balance(86400005, 'account1', 86400005), 1106)
+
+        self.assertEqual(view.timestamp, 6)
+        self.assertEqual(sorted(view.account_ids()), ['account1', 'account2'])
+        self.assertEqual(view.get_balance('account1', 100), 1000)
+        self.assertEqual(view.get_balance('account2', 100), 200)
+        self.assertEqual(view.get_balance('account2', 86400005), 200)
+        self.assertIsNone(view.get_balance('account3', 100))
+        self.assertEqual(view.total_spend('account2'), 300)
+        self.assertEqual(view.top_spenders(2), ['account2(300)', 'account1(0)'])
+        self.assertEqual(view.get_payment_status('account2', 'payment1'), 'IN_PROGRESS')
+        self.assertIsNone(view.get_payment_status('account1', 'payment1'))
+        self.assertIsNone(view.get_payment_status('account1', 'payment2'))
+        self.assertEqual(view.list_payments('account1', 0, 100), [])
+        self.assertEqual(view.list_payments('account2', 0, 100), ['payment1'])
+
+    def test_views_case_02_transactions_before_the_last_row_keep_the_view(self):
+        self.assertTrue(self.system.create_account(1, 'account1'))
+        self.assertEqual(self.system.deposit(10, 'account1', 100), 100)
+        self.assertEqual(self.system.deposit(20, 'account1', 100), 200)
+        view = self.system.snapshot(20)
+        self.assertEqual(self.system.deposit(15, 'account1', 50), 150)
+        self.assertEqual(self.system.get_balance(30, 'account1', 20), 250)
+        self.assertEqual([view.get_balance('account1', time_at) for time_at in (10, 15, 20, 30)], [100, 100, 200, 200])
+
+        self.assertEqual(len(self.system._views), 1)
+        del view
+        self.assertEqual(self.system._views, [])
+
+    def test_views_case_03_views_match_the_system_when_they_were_taken(self):
+        for system in (self.system, ConcurrentBankingSystemImpl(4)):
+            rng = random.Random(1616)
+            account_ids = [f'account{i}' for i in range(6)]
+            views = []
+            timestamp = 100000000
+            for step in range(600):
+                timestamp += rng.choice([1, 1, 1, 30000000])
+                # some deposits, transfers and payments arrive late and land before existing rows
+                late = timestamp - rng.choice([0, 0, 0, 5, 40000000])
+                account_id = rng.choice(account_ids)
+                operations.apply(system, rng.choice([
+                    operations.CreateAccount(timestamp, account_id),
+                    operations.Deposit(late, account_id, rng.randrange(1000)),
+                    operations.Transfer(late, account_id, rng.choice(account_ids), rng.randrange(500)),
+                    operations.Pay(late, account_id, rng.randrange(500)),
+                    operations.MergeAccounts(timestamp, account_id, rng.choice(account_ids)),
+                ]))
+                if step % 40 == 0:
+                    expected = {
+                        'balances': [[system.get_balance(timestamp, account_id, time_at) for time_at in (0, timestamp // 2, timestamp, timestamp * 2)] for account_id in account_ids],
+                        'top': system.top_spenders(timestamp, 4),
+                        'payments': [system.list_payments(account_id, 0, timestamp * 2) for account_id in account_ids],
+                        'status': [[system.get_payment_status(timestamp, account_id, f'payment{i}') for i in range(1, 40)] for account_id in account_ids],
+                    }
+                    views.append((system.snapshot(timestamp), expected))
+
+            for view, expected in views:
+                timestamp = view.timestamp
+                self.assertEqual([[view.get_balance(account_id, time_at) for time_at in (0, timestamp // 2, timestamp, timestamp * 2)] for account_id in account_ids], expected['balances'])
+                self.assertEqual(view.top_spenders(4), expected['top'])
+                self.assertEqual([view.list_payments(account_id, 0, timestamp * 2) for account_id in account_ids], expected['payments'])
+                self.assertEqual([[view.get_payment_status(account_id, f'payment{i}') for i in range(1, 40)] for account_id in account_ids], expected['status'])
+
+    def test_views_case_04_scans_dont_copy_the_system(self):
+        self.assertTrue(self.system.create_account(1, 'account1'))
+        self.assertTrue(self.system.create_account(2, 'account2'))
+        self.assertEqual(self.system.deposit(3, 'account2', 500), 500)
+        self.assertEqual(self.system.pay(4, 'account2', 300), 'payment1')
+        view = self.system.snapshot(5)
+        self.assertTrue(self.system.merge_accounts(6, 'account1', 'account2'))
+        self.assertTrue(self.system.create_account(7, 'account2'))
+        self.assertTrue(self.system.create_account(8, 'account3'))
+        self.assertEqual(self.system.top_spenders(9, 3), ['account1(300)', 'account2(0)', 'account3(0)'])
+
+        # only the entries written since the view was taken are saved, the scans read the live structures
+        self.assertEqual(view._saved['account_nodes'], {'account2': 1, 'account3': views.MISSING})
+        self.assertEqual(view.account_ids(), ['account1', 'account2'])
+        self.assertEqual(view.top_spenders(3), ['account2(300)', 'account1(0)'])
@@ -0,0 +1,127 @@
+import unittest
+import os
+import random
+import struct
+import sys
+import tempfile
+import zlib
+sys.path.insert(0, '../')
+import operations
+import wal
+from banking_system_impl_columnar import BankingSystemImpl
+
+
+class WriteAheadLogTests(unittest.TestCase):
+    """
+    Tests for the write-ahead log and recovering a banking system from it.
+    """
+
+    failureException = Exception
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'banking.wal')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _random_operations(self, seed, count):
+        rng = random.Random(seed)
+        account_ids = [f'account{i}' for i in range(5)]
+        stream = []
+        for timestamp in range(1, count + 1):
+            timestamp *= 100000
+            account_id = rng.choice(account_ids)
+            stream.append(rng.choice([
+                operations.CreateAccount(timestamp, account_id),
+                operations.Deposit(timestamp, account_id, rng.randrange(1000)),
+                operations.Transfer(timestamp, account_id, rng.choice(account_ids), rng.randrange(500)),
+                operations.Pay(timestamp, account_id, rng.randrange(500)),
+                operations.MergeAccounts(timestamp, account_id, rng.choice(account_ids)),
+                operations.GetBalance(timestamp, account_id, rng.randrange(timestamp)),
+            ]))
+        return stream
+
+    def test_wal_case_01_recover_rebuilds_the_system(self):
+        stream = self._random_operations(11, 600)
+        expected = BankingSystemImpl()
+        system = BankingSystemImpl()
+        with wal.recover(system, self.path):
+            for operation in stream[:300]:
+                self.assertEqual(operations.apply(system, operation), operations.apply(expected, operation))
+            self.assertEqual(system.execute_batch(stream[300:]), [operations.apply(expected, operation) for operation in stream[300:]])
+
+        recovered = BankingSystemImpl()
+        with wal.recover(recovered, self.path):
+            # cashback that was pending at shutdown is paid out after recovery
+            timestamp = 10 ** 9
+            self.assertEqual(recovered.top_spenders(timestamp, 5), expected.top_spenders(timestamp, 5))
+            for i in range(5):
+                account_id = f'account{i}'
+                self.assertEqual(recovered.get_balance(timestamp, account_id, timestamp), expected.get_balance(timestamp, account_id, timestamp))
+                self.assertEqual(recovered.list_payments(account_id, 0, timestamp), expected.list_payments(account_id, 0, timestamp))
+            self.assertEqual(recovered.deposit(timestamp, 'account0', 1), expected.deposit(timestamp, 'account0', 1))
+
+        # calls that are rejected up front and read-only calls are not logged
+        logged = list(wal.WriteAheadLog.read(self.path))
+        self.assertNotIn(operations.GetBalance, {type(operation) for operation in logged})
+        self.assertLess(len(logged), len(stream))
+
+    def test_wal_case_02_torn_tail_is_cut_off(self):
+        system = BankingSystemImpl()
+        with wal.recover(system, self.path, sync_interval=0):
+            system.create_account(1, 'account1')
+            system.deposit(2, 'account1', 100)
+        valid = os.path.getsize(self.path)
+        with open(self.path, 'ab') as log:
+            log.write(b'\x40\x00\x00\x00torn')
+
+        recovered = BankingSystemImpl()
+        with wal.recover(recovered, self.path, sync_interval=0):
+            self.assertEqual(os.path.getsize(self.path), valid)
+            self.assertEqual(recovered.deposit(3, 'account1', 50), 150)
+        self.assertEqual(list(wal.WriteAheadLog.read(self.path)), [
+            operations.CreateAccount(1, 'account1'),
+            operations.Deposit(2, 'account1', 100),
+            operations.Deposit(3, 'account1', 50),
+        ])
+
+    def test_wal_case_03_records_are_committed_per_window(self):
+        system = BankingSystemImpl()
+        log = wal.recover(system, self.path, sync_interval=3600)
+        system.create_account(1, 'account1')
+        system.deposit(2, 'account1', 100)
+        self.assertEqual(os.path.getsize(self.path), 0)
+        log.flush()
+        self.assertEqual(len(list(wal.WriteAheadLog.read(self.path))), 2)
+        system.deposit(3, 'account1', 100)
+        log.close()
+        self.assertEqual(len(list(wal.WriteAheadLog.read(self.path))), 3)
+
+    def test_wal_case_04_failed_background_commit_is_raised(self):
+        system = BankingSystemImpl()
+        log = wal.recover(system, self.path, sync_interval=0.001)
+        system.create_account(1, 'account1')
+        log.flush()
+        # a handle that can't be written to makes the next commit of the flusher thread fail
+        writable, log._file = log._file, open(self.path, 'rb')
+        writable.close()
+        system.deposit(2, 'account1', 100)
+        log._flusher.join(5)
+        self.assertFalse(log._flusher.is_alive())
+        with self.assertRaises(OSError):
+            system.deposit(3, 'account1', 100)
+        with self.assertRaises(OSError):
+            log.flush()
+        with self.assertRaises(OSError):
+            log.close()
+        self.assertEqual(list(wal.WriteAheadLog.read(self.path)), [operations.CreateAccount(1, 'account1')])
+
+    def test_wal_case_05_valid_length_only_checks_checksums(self):
+        system = BankingSystemImpl()
+        with wal.recover(system, self.path, sync_interval=0):
+            system.create_account(1, 'account1')
+        payload = b'not a pickle'
+        with open(self.path, 'ab') as log:
+            log.write(struct.pack('<II', len(payload), zlib.crc32(payload)) + payload)
+        self.assertEqual(wal.WriteAheadLog.valid_length(self.path), os.path.getsize(self.path))
@@ -0,0 +1,168 @@
+import heapq
+from ledger import Ledger, LedgerVersion
+from snapshot import NOT_MERGED
+
+# saved value of an entry that didn't exist when the view was taken
+MISSING = object()
+
+# name of every versioned mapping or node column of the banking system, see BankingSystemImpl._preserve
+VERSIONED = ('account_nodes', 'total_spend', 'merged_at', 'node_parents', 'node_children')
+
+class ReadView:
+    """
+    Immutable point-in-time view of a columnar banking system, see BankingSystemImpl.snapshot
+
+    A view doesn't copy any account state when it is taken. It reads the live structures of the system, and the
+    system saves the old value of an entry into every open view before it changes it for the first time, so a
+    view only ever holds the entries written since it was taken. Ledgers are saved as a LedgerVersion, which
+    keeps sharing the columns of the live ledger while rows are only appended to it. The view keeps a frozen
+    copy of the leaderboard, which shares the buckets of the live leaderboard until they change.
+
+    Reads check the live structure first and the saved value second, and the system saves before it writes, so
+    a view stays consistent while the system is written to from another thread.
+
+    Attributes
+    ----------
+    timestamp : int
+        Stores the time the view was taken at, cashback due by then has been received and later cashback has not
+    """
+
+    def __init__(self, system, timestamp: int):
+        self.timestamp = timestamp
+        self._live = {name: getattr(system, name) for name in VERSIONED}
+        self._saved = {name: {} for name in VERSIONED} # name : {key : value before the first write since the view was taken}
+        self._ledgers = {} # Ledger : LedgerVersion
+        # nodes are only ever appended and the ledger of a node is never replaced, so neither is versioned
+        self._node_ledgers = system.ledgers
+        self._node_accounts = system.node_accounts
+        self._payments = system.payments
+        self._payment_count = len(system.payments) # payments are only ever appended
+        self._node_count = len(system.node_accounts)
+        self._leaderboard = system.leaderboard.frozen()
+
+    def preserve(self, name: str, key, value):
+        '''
+        saves the value an entry of a versioned mapping had before its first write since the view was taken
+
+        Parameters:
+        ----------
+        name (str): one of VERSIONED
+        key: key of the entry, the node for node columns
+        value: the value before the write, MISSING if there was no entry, the length of the list (0 if there was none) for node_children
+        '''
+        self._saved[name].setdefault(key, value)
+
+    def preserve_ledger(self, ledger: Ledger, timestamp: int):
+        '''
+        saves the version of a ledger before a transaction at timestamp is recorded in it
+        '''
+        version = self._ledgers.get(ledger)
+        if version is None:
+            version = self._ledgers.setdefault(ledger, LedgerVersion(ledger, len(ledger)))
+        # a transaction before the last row shifts the rows of the version, so they are copied first
+        if version.ledger is ledger and timestamp < ledger.timestamps[-1]:
+            self._ledgers[ledger] = version.detached()
+
+    def account_ids(self) -> list[str]:
+        '''
+        returns every account id that existed when the view was taken, including merged accounts
+        '''
+        # an account id is listed at the node of the account that had it when the view was taken, so the scan
+        # only reads nodes that already existed and never copies account_nodes
+        node_accounts = self._node_accounts
+        return [node_accounts[node] for node in range(self._node_count) if self._node(node_accounts[node]) == node]
+
+    def get_balance(self, account_id: str, time_at: int) -> int | None:
+        '''
+        returns the total amount of money in the account account_id at time_at, see BankingSystem.get_balance
+
+        Returns:
+        ---------
+        (int): total money in the account_id at timestamp time_at
+        None: the account did not exist at time_at, or it was merged away by then
+        '''
+        node = self._node(account_id)
+        if node is None:
+            return None
+
+        merged_at = self._at('merged_at', node)
+        if merged_at != NOT_MERGED and time_at >= merged_at:
+            return None
+
+        # ledgers that were not written since the view was taken are pinned at their current length
+        ledger = self._node_ledgers[node]
+        return self._ledgers.setdefault(ledger, LedgerVersion(ledger, len(ledger))).balance_at(time_at)
+
+    def total_spend(self, account_id: str) -> int | None:
+        '''
+        returns the total outgoing amount of an account, None if it doesn't exist or was merged away
+        '''
+        node = self._node(account_id)
+        if node is None or self._at('merged_at', node) != NOT_MERGED:
+            return None
+        return self._at('total_spend', node)
+
+    def top_spenders(self, n: int) -> list[str]:
+        '''
+        returns the top n accounts by outgoing transactions, in the format of BankingSystem.top_spenders
+        '''
+        return self._leaderboard.top(n)
+
+    def get_payment_status(self, account_id: str, payment: str) -> str | None:
+        '''
+        returns the status of a payment when the view was taken, see BankingSystem.get_payment_status
+        '''
+        node = self._node(account_id)
+        if node is None:
+            return None
+
+        ordinal = self._payments.ordinal(payment)
+        if ordinal is None or ordinal > self._payment_count or self._find(self._payments.nodes[ordinal - 1]) != node:
+            return None
+        return self._payments.status(ordinal, self.timestamp)
+
+    def list_payments(self, account_id: str, since: int, until: int) -> list[str] | None:
+        '''
+        returns the payments of an account between two timestamps, see BankingSystemImpl.list_payments
+        '''
+        node = self._node(account_id)
+        if node is None or self._at('merged_at', node) != NOT_MERGED:
+            return None
+
+        nodes = [node]
+        for node in nodes:
+            children = self._live['node_children'].get(node, ())
+            nodes.extend(children[:self._saved_value('node_children', node, len(children))])
+
+        ordinals = heapq.merge(*(self._payments.node_payments(node, since, until) for node in nodes))
+        return [f"payment{ordinal}" for ordinal in ordinals if ordinal <= self._payment_count]
+
+    def _saved_value(self, name: str, key, live):
+        '''
+        returns the value of an entry when the view was taken given its live value, which has to be read first
+        '''
+        value = self._saved[name].get(key, live)
+        return None if value is MISSING else value
+
+    def _node(self, account_id: str) -> int | None:
+        '''
+        returns the node of an account when the view was taken, None if there was no account with that id
+        '''
+        return self._saved_value('account_nodes', account_id, self._live['account_nodes'].get(account_id))
+
+    def _at(self, name: str, node: int) -> int:
+        '''
+        returns the value of a node column when the view was taken
+        '''
+        live = self._live[name][node]
+        return self._saved[name].get(node, live)
+
+    def _find(self, node: int) -> int:
+        '''
+        returns the node of the account that node had been merged into when the view was taken
+        '''
+        while True:
+            parent = self._at('node_parents', node)
+            if parent == node:
+                return node
+            node = parent
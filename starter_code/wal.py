@@ -0,0 +1,242 @@
+import io
+import os
+import pickle
+import struct
+import threading
+import zlib
+import operations
+from operations import apply
+
+# operation type : code of the operation in the log, the order of this tuple is part of the log format
+CODES = (
+    operations.CreateAccount,
+    operations.Deposit,
+    operations.Transfer,
+    operations.TopSpenders,
+    operations.Pay,
+    operations.GetPaymentStatus,
+    operations.MergeAccounts,
+    operations.GetBalance,
+)
+CODE_OF = {operation: code for code, operation in enumerate(CODES)}
+
+_FRAME = struct.Struct('<II') # length of the frame payload, crc32 of the frame payload
+
+class WriteAheadLog:
+    """
+    Append-only binary log of operations, made durable with group commit
+
+    Appended records are (code, *fields) tuples collected in memory, and once per commit window the whole
+    group is encoded into one frame and written with a single write and fsync. The cost of the fsync and of
+    encoding is shared by every record of the window instead of being paid by every call. A background thread
+    commits when the window ends even if no more records arrive, so at most sync_interval seconds of records
+    can be lost in a crash. A sync_interval of 0 commits every record as it is appended. If a commit of the
+    background thread fails, the log stops committing and the error is raised by the next append, flush or
+    close, so a call that changes the system can't go on as if it had been logged.
+
+    A frame is a header with the length and crc32 of its payload followed by the pickled list of records. A
+    frame cut off by a crash fails its checksum, so replay stops at the last complete group. The log is only
+    ever read back by the process that owns it, it must not be loaded from an untrusted source.
+
+    Attributes
+    ----------
+    path : str
+        Path of the log file
+    sync_interval : float
+        Length of the commit window in seconds
+    """
+
+    def __init__(self, path: str, sync_interval: float = 0.01):
+        self.path = path
+        self.sync_interval = sync_interval
+        self._records = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._error = None # exception a commit of the flusher thread failed with
+
+        # frames after a torn or corrupt tail can't be read back, so the tail is cut off before appending
+        valid = self.valid_length(path)
+        self._file = open(path, 'ab')
+        if self._file.tell() > valid:
+            self._file.truncate(valid)
+
+        self._flusher = None
+        if sync_interval > 0:
+            # appending is on the hot path of every mutating call, so with group commit it is a bare list append,
+            # which is atomic, and only commits take the lock
+            self.append = self._records.append
+            self._flusher = threading.Thread(target=self._flush_periodically, name='wal-flusher', daemon=True)
+            self._flusher.start()
+
+    def append(self, record: tuple):
+        '''
+        appends a record to the log, it is durable once the current commit window is committed
+
+        Parameters:
+        ----------
+        record (tuple): (code of the operation, *fields of the operation), e.g. (CODE_OF[Deposit], 3, 'account1', 100)
+        '''
+        self._records.append(record)
+        self.flush()
+
+    def flush(self):
+        '''
+        writes and fsyncs every buffered record
+        '''
+        with self._lock:
+            self._raise_error()
+            self._commit()
+
+    def close(self):
+        '''
+        commits the buffered records and closes the log
+        '''
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            try:
+                self._raise_error()
+                self._commit()
+            finally:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def read(path: str):
+        '''
+        streams the operations of a log, stopping at a torn or corrupt tail
+
+        Parameters:
+        ----------
+        path (str): path of the log file
+
+        Returns:
+        ---------
+        generator of operations in the order they were appended
+        '''
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as log:
+            while True:
+                records = WriteAheadLog._read_frame(log)
+                if records is None:
+                    return
+                for code, *fields in records:
+                    yield CODES[code]._make(fields)
+
+    @staticmethod
+    def valid_length(path: str) -> int:
+        '''
+        returns the length of the readable part of a log, 0 if the log doesn't exist
+        '''
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'rb') as log:
+            valid = 0
+            # a frame that passes its checksum can be read back, so frames are checked without decoding them
+            while WriteAheadLog._read_payload(log) is not None:
+                valid = log.tell()
+            return valid
+
+    @staticmethod
+    def _read_frame(log) -> list | None:
+        '''
+        reads the records of the next frame of an open log, None at the end of the log or at a torn or corrupt frame
+        '''
+        payload = WriteAheadLog._read_payload(log)
+        if payload is None:
+            return None
+        return pickle.loads(payload)
+
+    @staticmethod
+    def _read_payload(log) -> bytes | None:
+        '''
+        reads the payload of the next frame of an open log and checks it, None at the end of the log or at a torn or corrupt frame
+        '''
+        header = log.read(_FRAME.size)
+        if len(header) < _FRAME.size:
+            return None
+        length, checksum = _FRAME.unpack(header)
+        payload = log.read(length)
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return None
+        return payload
+
+    def _commit(self):
+        '''
+        writes the buffered records as one frame and fsyncs it, the lock has to be held
+        '''
+        # records appended while the frame is written stay in the buffer for the next commit
+        count = len(self._records)
+        if not count:
+            return
+        buffer = io.BytesIO()
+        pickler = pickle.Pickler(buffer, protocol=5)
+        # records are flat tuples with nothing shared to deduplicate, so the memo is turned off which makes encoding a lot cheaper
+        pickler.fast = True
+        pickler.dump(self._records[:count])
+
+        payload = buffer.getvalue()
+        self._file.write(_FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        del self._records[:count]
+
+    def _flush_periodically(self):
+        '''
+        commits the buffered records at the end of every commit window until the log is closed
+        '''
+        while not self._closed.wait(self.sync_interval):
+            with self._lock:
+                try:
+                    self._commit()
+                except Exception as error:
+                    # nothing is committed after a failed commit, appending fails from now on instead of buffering records that are never written
+                    self._error = error
+                    self.append = self._append_after_error
+                    return
+
+    def _append_after_error(self, record: tuple):
+        '''
+        append once a commit of the flusher thread failed, raises the error of that commit
+        '''
+        raise self._error
+
+    def _raise_error(self):
+        '''
+        raises the error a commit of the flusher thread failed with, if any, the lock has to be held
+        '''
+        if self._error is not None:
+            raise self._error
+
+def recover(system, path: str, sync_interval: float = 0.01) -> WriteAheadLog:
+    '''
+    rebuilds a banking system from its write-ahead log and makes it durable, every call that changes the
+    system from then on is appended to the log
+
+    Accounts, payments and pending cashback are rebuilt exactly by replaying the logged calls, since the
+    banking system is deterministic.
+
+    Parameters:
+    ----------
+    system (BankingSystem): a new banking system supporting a log attribute, e.g. banking_system_impl_columnar.BankingSystemImpl
+    path (str): path of the log file, it is created if it doesn't exist
+    sync_interval (float): length of the commit window in seconds, 0 to commit every call on its own
+
+    Returns:
+    ---------
+    (WriteAheadLog): the log, close it to commit the last window when the system is shut down
+    '''
+    for operation in WriteAheadLog.read(path):
+        apply(system, operation)
+
+    system.log = WriteAheadLog(path, sync_interval)
+    return system.log